@@ -32,39 +32,12 @@ if [ ! -d $working_folder"/yearly_node_files" ]; then
     mkdir $working_folder"/yearly_node_files"
 fi
 
-echo -e "==============================\n 01 Creating population. \n==============================" | tee -a $log_file $error_file
-/c/mambaforge/envs/9629/python.exe src/01_nodes_merged_nodelist.py $start_year $end_year $working_folder >>$log_file 2>>$error_file
-
-for year in `seq $start_year $end_year`
-do
-    echo -e "==============================\n YEAR $year \n==============================" | tee -a $log_file $error_file
-
-    echo -e "==============================\n 02 Yearly base populations. \n==============================" | tee -a $log_file $error_file
-    /c/mambaforge/envs/9629/python.exe src/02_nodes_base_files.py $start_year $end_year $year $working_folder >>$log_file 2>>$error_file
-    
-    echo -e "==============================\n 03 Income (after 2011). \n==============================" | tee -a $log_file $error_file
-    if [ "$year" -gt 2010 ]; then
-        /c/mambaforge/envs/9629/python.exe src/03_nodes_income.py $start_year $end_year $year $working_folder >>$log_file 2>>$error_file
-    else
-        echo -e "Year $year has no income data." | tee -a $log_file $error_file
-    fi
-    
-    echo -e "==============================\n 04 Education. \n==============================" | tee -a $log_file $error_file
-    /c/mambaforge/envs/9629/python.exe src/04_nodes_education.py $year $working_folder >>$log_file 2>>$error_file
-    
-    echo -e "==============================\n 05 Location of address up to buurt. \n==============================" | tee -a $log_file $error_file
-    /c/mambaforge/envs/9629/python.exe src/05_nodes_location.py $year $working_folder >>$log_file 2>>$error_file
-    
-    echo -e "==============================\n 06 Buurt info. \n==============================" | tee -a $log_file $error_file
-    /c/mambaforge/envs/9629/python.exe src/06_buurt_metadata.py $year $working_folder >>$log_file 2>>$error_file
-    
-    echo -e "==============================\n 07 Gemeente info. \n==============================" | tee -a $log_file $error_file
-    /c/mambaforge/envs/9629/python.exe src/07_gemeente_metadata.py $year $working_folder >>$log_file 2>>$error_file
-    
-    echo -e "==============================\n 08 Joining all the above files. \n==============================" | tee -a $log_file $error_file
-    /c/mambaforge/envs/9629/python.exe src/08_combined_nodelists.py $start_year $end_year $year $working_folder >>$log_file 2>>$error_file
-done
-
-echo -e "==============================\n 08 Deleting temporary files. \n==============================" | tee -a $log_file $error_file
-rm -rf $working_folder"/temp"  >>$log_file 2>>$error_file
+echo -e "==============================\n 01-11 Running all stages for all years in a single process. \n==============================" | tee -a $log_file $error_file
+# the per-stage scripts in src/ can still be run one by one, see their usage notes
+PYTHONPATH=src /c/mambaforge/envs/9629/python.exe -m nodefiles run $start_year $end_year $working_folder >>$log_file 2>>$error_file
+
+# Intermediate files in temp/ are kept as a build cache: on a rerun, stages whose inputs, code and
+# parameters did not change are skipped, and a failed run resumes from the last finished stage.
+# Evict them explicitly once they are not needed anymore:
+#   PYTHONPATH=src /c/mambaforge/envs/9629/python.exe -m nodefiles cache clear $working_folder
 echo -e "==============================\n Done. See results in ./yearly_node_files and ./codebook. \n==============================" | tee -a $log_file $error_file
\ No newline at end of file
@@ -0,0 +1,47 @@
+"""
+Author: Eszter Bokanyi, e.bokanyi@liacs.leidenuniv.nl
+Last modified: 2026.10.18
+
+This script computes neighbourhood context features per buurt, wijk and gemeente
+from the combined node file of a year.
+
+Prerequisites: "{working_folder}/yearly_node_files/nodes_start_{start_year}_end_{end_year}_year_{year}.csv.gz",
+the output of 08_combined_nodelists.py.
+
+Output:
+-------
+    * "{working_folder}\\yearly_node_files\\context_start_{start_year}_end_{end_year}_year_{year}.csv.gz"
+        * level (buurt, wijk or gemeente) and region_code
+        * population (active people registered in the region)
+        * share of women, median age, shares of age groups
+        * median household income
+        * weighted shares of education levels (weights from HOOGSTEOPLTAB)
+
+Usage:
+------
+    /c/mambaforge/envs/9629/python.exe 09_context_features.py 2009 2023 2015 /h/ODISSEI_portal_C
+
+Bash script:
+------------
+
+for year in `seq 2009 2023`
+do
+    /c/mambaforge/envs/9629/python.exe 09_context_features.py 2009 2023 $year /h/ODISSEI_portal_C
+done
+
+This script is a thin wrapper around `nodefiles.context`, see `python -m nodefiles run`
+for running all stages for a range of years in a single process.
+"""
+
+import sys
+sys.stdout.reconfigure(encoding="utf-8")
+
+from nodefiles.pipeline import Pipeline
+
+if __name__ == "__main__":
+    start_year = int(sys.argv[1])
+    end_year = int(sys.argv[2])
+    year = int(sys.argv[3])
+    output_folder = sys.argv[4]
+
+    Pipeline(output_folder, start_year, end_year).run_stage("context", year)
@@ -0,0 +1,48 @@
+"""
+Author: Eszter Bokanyi, e.bokanyi@liacs.leidenuniv.nl
+Last modified: 2026.10.18
+
+This script converts the network files of a year (household, family, neighbor, colleague and
+school networks) to one sparse adjacency matrix per layer of layers.csv, in the id space of the
+node files, and counts the edges of every node per layer.
+
+Prerequisites: "{working_folder}/temp/merged_node_mapping_{start_year}_{end_year}.csv.gz",
+the output of 01_nodes_merged_nodelist.py.
+
+Output:
+-------
+    * "{working_folder}\\yearly_node_files\\network_start_{start_year}_end_{end_year}_year_{year}\\layer_{layer}.npz"
+        * scipy CSR matrix of N x N, row and column `id` are the node with that id in the node files
+    * "{working_folder}\\yearly_node_files\\network_degrees_start_{start_year}_end_{end_year}_year_{year}.csv.gz"
+        * label, id
+        * degree_{layer}: number of edges of the node in each layer
+        * layers_present: sum of the `binary` codes of the layers the node has edges in
+
+Usage:
+------
+    /c/mambaforge/envs/9629/python.exe 10_network_layers.py 2009 2023 2015 /h/ODISSEI_portal_C
+
+Bash script:
+------------
+
+for year in `seq 2009 2023`
+do
+    /c/mambaforge/envs/9629/python.exe 10_network_layers.py 2009 2023 $year /h/ODISSEI_portal_C
+done
+
+This script is a thin wrapper around `nodefiles.network`, see `python -m nodefiles run`
+for running all stages for a range of years in a single process.
+"""
+
+import sys
+sys.stdout.reconfigure(encoding="utf-8")
+
+from nodefiles.pipeline import Pipeline
+
+if __name__ == "__main__":
+    start_year = int(sys.argv[1])
+    end_year = int(sys.argv[2])
+    year = int(sys.argv[3])
+    output_folder = sys.argv[4]
+
+    Pipeline(output_folder, start_year, end_year).run_stage("network", year)
@@ -0,0 +1,52 @@
+"""
+Author: Eszter Bokanyi, e.bokanyi@liacs.leidenuniv.nl
+Last modified: 2026.10.18
+
+This script links every node of a year to its mother and father from KINDOUDERTAB, and collects
+the education level, household income percentile and buurt of the parents from the combined node
+file of the same year.
+
+Prerequisites: "{working_folder}/temp/merged_node_mapping_{start_year}_{end_year}.csv.gz",
+the output of 01_nodes_merged_nodelist.py, and
+"{working_folder}/yearly_node_files/nodes_start_{start_year}_end_{end_year}_year_{year}.csv.gz",
+the output of 08_combined_nodelists.py.
+
+Output:
+-------
+    * "{working_folder}\\yearly_node_files\\parents_start_{start_year}_end_{end_year}_year_{year}.csv.gz"
+        * label, id
+        * mother_id, father_id
+        * mother_educ_level, father_educ_level
+        * mother_household_income_percentile, father_household_income_percentile
+        * mother_buurt_code, father_buurt_code
+        * max_parent_income_percentile: highest individual income percentile of the parents
+
+Usage:
+------
+    /c/mambaforge/envs/9629/python.exe 11_parent_attributes.py 2009 2023 2015 /h/ODISSEI_portal_C
+
+Bash script:
+------------
+
+for year in `seq 2009 2023`
+do
+    /c/mambaforge/envs/9629/python.exe 11_parent_attributes.py 2009 2023 $year /h/ODISSEI_portal_C
+done
+
+This script is a thin wrapper around `nodefiles.parents`, see `python -m nodefiles run`
+for running all stages for a range of years in a single process.
+"""
+
+import sys
+sys.stdout.reconfigure(encoding="utf-8")
+
+from nodefiles.pipeline import Pipeline
+
+# decoding large SPSS files starts worker processes, which import this script again on Windows
+if __name__ == "__main__":
+    start_year = int(sys.argv[1])
+    end_year = int(sys.argv[2])
+    year = int(sys.argv[3])
+    output_folder = sys.argv[4]
+
+    Pipeline(output_folder, start_year, end_year).run_stage("parents", year)
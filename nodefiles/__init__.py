@@ -0,0 +1,14 @@
+"""
+Author: Eszter Bokanyi, e.bokanyi@liacs.leidenuniv.nl
+Last modified: 2026.10.18
+
+Importable stage library of the node file pipeline.
+
+Each stage of the numbered scripts is a module of this package with plain functions
+taking explicit inputs and returning DataFrames, and a `run(pipeline, year)` entry point
+used by the driver in `nodefiles.pipeline`. The numbered scripts are thin CLI wrappers
+around single stages; `python -m nodefiles run` runs a whole year range in one process.
+
+Heavy dependencies are imported by the stage modules themselves, importing this package
+does not load them.
+"""
@@ -0,0 +1,300 @@
+"""
+Author: Eszter Bokanyi, e.bokanyi@liacs.leidenuniv.nl
+Last modified: 2026.10.18
+
+Command line entry point of the single-process driver.
+
+Usage (bash, from the working folder):
+--------------------------------------
+    PYTHONPATH=src /c/mambaforge/envs/9629/python.exe -m nodefiles run 2009 2023 /h/ODISSEI_portal_C
+    PYTHONPATH=src /c/mambaforge/envs/9629/python.exe -m nodefiles run 2009 2023 /h/ODISSEI_portal_C --max-memory 16G
+    PYTHONPATH=src /c/mambaforge/envs/9629/python.exe -m nodefiles worker 2009 2023 /h/ODISSEI_portal_C
+    PYTHONPATH=src /c/mambaforge/envs/9629/python.exe -m nodefiles queue status /h/ODISSEI_portal_C
+    PYTHONPATH=src /c/mambaforge/envs/9629/python.exe -m nodefiles plan 2009 2023 /h/ODISSEI_portal_C --memory 64G
+    PYTHONPATH=src /c/mambaforge/envs/9629/python.exe -m nodefiles cache list /h/ODISSEI_portal_C
+    PYTHONPATH=src /c/mambaforge/envs/9629/python.exe -m nodefiles cache clear /h/ODISSEI_portal_C --stage income --year 2015
+    PYTHONPATH=src /c/mambaforge/envs/9629/python.exe -m nodefiles metrics /h/ODISSEI_portal_C --last 2
+    PYTHONPATH=src /c/mambaforge/envs/9629/python.exe -m nodefiles digest /h/run_a /h/run_b
+    PYTHONPATH=src /c/mambaforge/envs/9629/python.exe -m nodefiles records 2009 2023 /h/ODISSEI_portal_C
+    PYTHONPATH=src /c/mambaforge/envs/9629/python.exe -m nodefiles delta 2009 2023 /h/ODISSEI_portal_C --base-year 2009
+    PYTHONPATH=src /c/mambaforge/envs/9629/python.exe -m nodefiles subrange 2009 2023 /h/ODISSEI_portal_C 2012 2020
+    PYTHONPATH=src /c/mambaforge/envs/9629/python.exe -m nodefiles cube 2009 2023 /h/ODISSEI_portal_C --levels gemeente provincie
+
+Outside of the RA, on synthetic data:
+    python -m nodefiles synth /data/synthetic 1000000 2019 2021
+    python -m nodefiles benchmark /data/benchmark --persons 100000 1000000 --start-year 2019 --end-year 2021
+    python -m nodefiles microbench /data/benchmark --persons 1000000 --save-baseline
+"""
+
+import argparse
+import json
+import os
+import sys
+
+from . import config, metrics, tableio
+from .cache import BuildCache
+from .pipeline import STAGES_BY_NAME, Pipeline
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="nodefiles")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = subparsers.add_parser("run", help="run all stages for a range of years in one process")
+    run_parser.add_argument("start_year", type=int)
+    run_parser.add_argument("end_year", type=int)
+    run_parser.add_argument("working_folder")
+    run_parser.add_argument("--years", type=int, nargs="+", help="only process these years (default: start_year-end_year)")
+    run_parser.add_argument("--force", action="store_true", help="rerun stages even if their cached output is up to date")
+    run_parser.add_argument("--run-id", help="name of the metrics file of the run (default: time, host and process id)")
+    run_parser.add_argument("--read-processes", type=int, help="processes decoding large SPSS files (default: NODEFILES_READ_PROCESSES or up to 8 cores)")
+    run_parser.add_argument("--write-threads", type=int, help="threads compressing the gzipped CSV outputs (default: NODEFILES_WRITE_THREADS or up to 8 cores)")
+    run_parser.add_argument("--staging-size", help="prefetch the sources of the next stages into a local folder of this size, e.g. 50G (default: NODEFILES_STAGING_SIZE)")
+    run_parser.add_argument("--staging-folder", help="local folder for prefetched sources (default: NODEFILES_STAGING_FOLDER or the system temp folder)")
+    run_parser.add_argument("--income-fallback", action="store_true", help="resolve the income of households without a main earner from the INHATAB of the adjacent years (default: NODEFILES_INCOME_FALLBACK)")
+    run_parser.add_argument("--max-memory", help="memory budget such as 16G, large sources are then read in chunks (default: NODEFILES_MAX_MEMORY)")
+
+    worker_parser = subparsers.add_parser("worker", help="run stages from the work queue shared by several machines")
+    worker_parser.add_argument("start_year", type=int)
+    worker_parser.add_argument("end_year", type=int)
+    worker_parser.add_argument("working_folder", help="working folder shared by all workers")
+    worker_parser.add_argument("--years", type=int, nargs="+", help="only process these years (default: start_year-end_year), the same on all workers")
+    worker_parser.add_argument("--worker-id", help="name of the worker in claims and metrics (default: host and process id)")
+    worker_parser.add_argument("--timeout", type=int, default=600, help="seconds without heartbeat after which a task of another worker is taken over")
+    worker_parser.add_argument("--read-processes", type=int, help="processes decoding large SPSS files (default: NODEFILES_READ_PROCESSES or up to 8 cores)")
+    worker_parser.add_argument("--write-threads", type=int, help="threads compressing the gzipped CSV outputs (default: NODEFILES_WRITE_THREADS or up to 8 cores)")
+    worker_parser.add_argument("--income-fallback", action="store_true", help="resolve the income of households without a main earner from the INHATAB of the adjacent years (default: NODEFILES_INCOME_FALLBACK)")
+    worker_parser.add_argument("--max-memory", help="memory budget such as 16G, large sources are then read in chunks (default: NODEFILES_MAX_MEMORY)")
+
+    queue_parser = subparsers.add_parser("queue", help="inspect the work queue, or reset its failed tasks")
+    queue_parser.add_argument("action", choices=["status", "reset"])
+    queue_parser.add_argument("working_folder")
+
+    plan_parser = subparsers.add_parser("plan", help="estimate the runtime and peak memory of every stage of a run")
+    plan_parser.add_argument("start_year", type=int)
+    plan_parser.add_argument("end_year", type=int)
+    plan_parser.add_argument("working_folder")
+    plan_parser.add_argument("--years", type=int, nargs="+", help="only plan these years (default: start_year-end_year)")
+    plan_parser.add_argument("--memory", help="memory available to the run such as 64G (default: physical memory of this machine)")
+    plan_parser.add_argument("--force", action="store_true", help="plan a run with --force, including stages with an up to date cached output")
+    plan_parser.add_argument("--json", help="also write the schedule to this JSON file")
+
+    cache_parser = subparsers.add_parser("cache", help="inspect or evict cached stage outputs")
+    cache_parser.add_argument("action", choices=["list", "clear"])
+    cache_parser.add_argument("working_folder")
+    cache_parser.add_argument("--stage", nargs="+", choices=list(STAGES_BY_NAME), help="only these stages (default: all)")
+    cache_parser.add_argument("--year", type=int, nargs="+", help="only these years (default: all)")
+
+    metrics_parser = subparsers.add_parser("metrics", help="compare the per-step metrics of runs")
+    metrics_parser.add_argument("working_folder")
+    metrics_parser.add_argument("--files", nargs="+", help="metrics files to compare (default: all runs in the working folder)")
+    metrics_parser.add_argument("--last", type=int, help="only compare the last N runs")
+    metrics_parser.add_argument("--metric", default="wall_s", choices=["wall_s", "cpu_s", "peak_rss_bytes", "bytes_read", "bytes_written", "rows_out"])
+    metrics_parser.add_argument("--by", nargs="+", default=["stage", "step"], help="fields to group by, e.g. stage step year")
+
+    digest_parser = subparsers.add_parser("digest", help="order-independent digests of tables, or compare two tables or working folders")
+    digest_parser.add_argument("paths", nargs="+", help="a table, two tables or saved digests (.json), or two working folders")
+    digest_parser.add_argument("--key", nargs="+", help="key columns (default: id, label, level region_code, buurt_code or gemeente_code)")
+    digest_parser.add_argument("--bin-width", type=int, help="width of the id ranges differences are localized to (default: about 256 ranges)")
+    digest_parser.add_argument("--save", help="save the digest of a single table as JSON")
+    digest_parser.add_argument("--show", type=int, default=10, help="differing keys listed per column")
+
+    records_parser = subparsers.add_parser("records", help="write the node files as memory-mapped fixed-width records for lookups by id or label")
+    records_parser.add_argument("start_year", type=int)
+    records_parser.add_argument("end_year", type=int)
+    records_parser.add_argument("working_folder")
+    records_parser.add_argument("--years", type=int, nargs="+", help="only these years (default: all years with parquet node files)")
+
+    delta_parser = subparsers.add_parser("delta", help="write the node files as a base year and year-over-year deltas")
+    delta_parser.add_argument("start_year", type=int)
+    delta_parser.add_argument("end_year", type=int)
+    delta_parser.add_argument("working_folder")
+    delta_parser.add_argument("--base-year", type=int, help="year stored in full (default: the first year)")
+    delta_parser.add_argument("--years", type=int, nargs="+", help="consecutive years to store (default: all years with parquet node files)")
+
+    subrange_parser = subparsers.add_parser("subrange", help="derive the node files of a sub-range of years from an existing run")
+    subrange_parser.add_argument("start_year", type=int, help="first year of the existing run")
+    subrange_parser.add_argument("end_year", type=int, help="last year of the existing run")
+    subrange_parser.add_argument("working_folder")
+    subrange_parser.add_argument("sub_start", type=int, help="first year of the sub-range")
+    subrange_parser.add_argument("sub_end", type=int, help="last year of the sub-range")
+    subrange_parser.add_argument("--active-only", action="store_true", help="only keep people active in the sub-range, without reading GBAPERSOONTAB")
+
+    cube_parser = subparsers.add_parser("cube", help="export a disclosure-controlled count cube of the node files")
+    cube_parser.add_argument("start_year", type=int)
+    cube_parser.add_argument("end_year", type=int)
+    cube_parser.add_argument("working_folder")
+    cube_parser.add_argument("--years", type=int, nargs="+", help="only these years (default: all years with parquet node files)")
+    cube_parser.add_argument("--dimensions", nargs="+", help="dimensions of the cube (default: all), see nodefiles.cube.DIMENSIONS")
+    cube_parser.add_argument("--levels", nargs="+", choices=["gemeente", "coropgebied", "provincie", "landsdeel"], help="geography levels (default: all)")
+    cube_parser.add_argument("--min-count", type=int, default=10, help="suppress cells with fewer people")
+    cube_parser.add_argument("--cohort-width", type=int, default=5, help="birth years per birth cohort")
+    cube_parser.add_argument("--output", help="output file (default: working_folder/export/cube_start_{start_year}_end_{end_year}.csv.gz)")
+
+    synth_parser = subparsers.add_parser("synth", help="write synthetic versions of all source files")
+    synth_parser.add_argument("root", help="folder the G: and K: drives are mapped to as root/G and root/K")
+    synth_parser.add_argument("n_persons", type=int)
+    synth_parser.add_argument("start_year", type=int)
+    synth_parser.add_argument("end_year", type=int)
+    synth_parser.add_argument("--seed", type=int, default=0)
+
+    benchmark_parser = subparsers.add_parser("benchmark", help="run all stages on synthetic data at several scales")
+    benchmark_parser.add_argument("root", help="folder for the synthetic sources, working folders and results")
+    benchmark_parser.add_argument("--persons", type=int, nargs="+", default=[100000, 1000000])
+    benchmark_parser.add_argument("--start-year", type=int, default=2019)
+    benchmark_parser.add_argument("--end-year", type=int, default=2021)
+    benchmark_parser.add_argument("--seed", type=int, default=0)
+
+    microbench_parser = subparsers.add_parser("microbench", help="time the hot kernels and compare them to a stored baseline")
+    microbench_parser.add_argument("root", help="folder for the synthetic sources and the baseline")
+    microbench_parser.add_argument("--persons", type=int, default=1000000)
+    microbench_parser.add_argument("--year", type=int, default=2021)
+    microbench_parser.add_argument("--kernels", nargs="+", help="only these kernels (default: all), see nodefiles.microbench")
+    microbench_parser.add_argument("--repeat", type=int, default=3)
+    microbench_parser.add_argument("--threshold", type=float, default=1.25, help="fail if a kernel is this many times slower than its baseline")
+    microbench_parser.add_argument("--baseline", help="baseline file (default: root/microbench_baseline_{persons}_{year}.json)")
+    microbench_parser.add_argument("--save-baseline", action="store_true", help="store the timings as the new baseline")
+    microbench_parser.add_argument("--seed", type=int, default=0)
+
+    args = parser.parse_args(argv)
+
+    if args.command == "run":
+        if args.read_processes is not None:
+            tableio.READ_PROCESSES = args.read_processes
+        if args.write_threads is not None:
+            tableio.WRITE_THREADS = args.write_threads
+        with metrics.run(args.working_folder, args.run_id):
+            Pipeline(
+                args.working_folder, args.start_year, args.end_year, force=args.force, max_memory=args.max_memory,
+                staging_size=args.staging_size, staging_folder=args.staging_folder,
+                income_fallback=args.income_fallback or None
+            ).run(args.years)
+
+    elif args.command == "worker":
+        from . import workqueue
+
+        if args.read_processes is not None:
+            tableio.READ_PROCESSES = args.read_processes
+        if args.write_threads is not None:
+            tableio.WRITE_THREADS = args.write_threads
+        workqueue.work(
+            args.working_folder, args.start_year, args.end_year, args.years, args.timeout, args.worker_id,
+            max_memory=args.max_memory, income_fallback=args.income_fallback or None
+        )
+
+    elif args.command == "queue":
+        from . import workqueue
+
+        if args.action == "status":
+            print(metrics.format_table(*workqueue.status(args.working_folder)))
+        else:
+            for task in workqueue.reset(args.working_folder):
+                print("Reset", task)
+
+    elif args.command == "plan":
+        from . import plan
+
+        plan.run(args.working_folder, args.start_year, args.end_year, args.years, args.memory, args.json, args.force)
+
+    elif args.command == "cache":
+        cache = BuildCache(args.working_folder)
+        if args.action == "list":
+            for entry in cache.entries():
+                if (args.stage is None or entry["stage"] in args.stage) and (args.year is None or entry["year"] in args.year):
+                    print(entry["stage"], entry["year"], entry["key"], entry["created"], *entry["outputs"])
+        else:
+            for entry in cache.evict(args.stage, args.year):
+                print("Evicted", entry["stage"], entry["year"], *entry["outputs"])
+
+    elif args.command == "metrics":
+        files = args.files if args.files else metrics.runs(args.working_folder)
+        if args.last:
+            files = files[-args.last:]
+        print(metrics.format_table(*metrics.summary(files, metric=args.metric, by=args.by)))
+
+    elif args.command == "digest":
+        from . import digest
+
+        if len(args.paths) > 2:
+            parser.error("digest takes one or two paths")
+        if len(args.paths) == 1:
+            result = digest.digest(args.paths[0], args.key, args.bin_width)
+            print(f"{result['table']}  {args.paths[0]} ({result['rows']} rows, key {', '.join(result['key'])})")
+            for c, d in result["columns"].items():
+                if c != digest.KEY_COLUMN:
+                    print(f"\t{d['digest']}  {c}")
+            if args.save:
+                digest.save(result, args.save)
+        elif all(os.path.isdir(p) for p in args.paths):
+            same = digest.compare_folders(*args.paths, show=args.show)
+        else:
+            same = digest.compare_files(*args.paths, key=args.key, width=args.bin_width, show=args.show)
+        if len(args.paths) == 2 and not same:
+            sys.exit(1)
+
+    elif args.command == "records":
+        from . import records
+
+        with metrics.run(args.working_folder), metrics.context(stage="records"):
+            sizes = records.build(args.working_folder, args.start_year, args.end_year, args.years)
+        for fn, size in sizes.items():
+            print(metrics.human_bytes(size), fn)
+
+    elif args.command == "delta":
+        from . import delta
+
+        with metrics.run(args.working_folder), metrics.context(stage="delta"):
+            sizes = delta.write_deltas(args.working_folder, args.start_year, args.end_year, args.base_year, args.years)
+        for fn, size in sizes.items():
+            print(metrics.human_bytes(size), fn)
+        print(f"Total {metrics.human_bytes(sum(sizes.values()))} in {config.delta_folder(args.working_folder, args.start_year, args.end_year)}")
+
+    elif args.command == "subrange":
+        from . import subrange
+
+        with metrics.run(args.working_folder), metrics.context(stage="subrange"):
+            written = subrange.derive(
+                args.working_folder, args.start_year, args.end_year, args.sub_start, args.sub_end, args.active_only
+            )
+        for fn in written:
+            print("Written", fn)
+
+    elif args.command == "cube":
+        from . import cube
+
+        with metrics.run(args.working_folder), metrics.context(stage="cube"):
+            table = cube.export(
+                args.working_folder, args.start_year, args.end_year, args.years, args.dimensions, args.levels,
+                args.min_count, args.cohort_width
+            )
+            fn = args.output if args.output else config.cube_file(args.working_folder, args.start_year, args.end_year)
+            with metrics.step("write output", rows_in=table.height):
+                tableio.write_csv_gz(table, fn)
+        print(f"Cube written to {fn}")
+
+    elif args.command == "synth":
+        from . import synthetic
+
+        with open(os.path.join(config.SRC_FOLDER, "files_per_year.json")) as f:
+            files_per_year = json.load(f)
+        synthetic.generate(args.root, args.n_persons, args.start_year, args.end_year, files_per_year, args.seed)
+
+    elif args.command == "benchmark":
+        from . import benchmark
+
+        benchmark.run(args.root, args.persons, args.start_year, args.end_year, args.seed)
+
+    elif args.command == "microbench":
+        from . import microbench
+
+        rows = microbench.run(
+            args.root, args.persons, args.year, args.kernels, args.repeat, args.threshold,
+            args.baseline, args.save_baseline, args.seed
+        )
+        if any(status == "slower" for _, _, _, status in rows):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    sys.stdout.reconfigure(encoding="utf-8")
+    main()
@@ -0,0 +1,188 @@
+"""
+Author: Eszter Bokanyi, e.bokanyi@liacs.leidenuniv.nl
+Last modified: 2026.10.18
+
+Stage 02: yearly base node dataframes from GBAPERSOONTAB, GBAADRESOBJECTBUS, KINDOUDERTAB and GBAOVERLIJDENTAB.
+
+For each year, it selects people active in the GBA on 01-01-JJJJ based on whether they were
+registered at any address on this date and were not deceased. It creates a flag stored in the
+"active" column that is True if the person is present in year JJJJ, along with gender, number of
+parents from abroad, birth year, migrant generation, missing_mother and missing_father.
+"""
+
+import polars as pl
+
+from . import config, metrics, schema
+from .tableio import read_sav
+
+# columns from the GBAPERSOONTAB
+PERSOONTAB_COLUMNS = ["RINPERSOON", "GBAGENERATIE", "GBAGESLACHT", "GBAAANTALOUDERSBUITENLAND", "GBAGEBOORTEJAAR"]
+# columns from the GBAADRESOBJECTBUS
+ADDRESS_COLUMNS = ["RINPERSOON", "GBADATUMAANVANGADRESHOUDING", "GBADATUMEINDEADRESHOUDING"]
+
+OUTPUT_COLUMNS = [
+    "label",
+    "id",
+    "active",
+    "gender",
+    "birth_year",
+    "migrant_generation",
+    "number_of_parents_from_abroad",
+    "missing_mother",
+    "missing_father"
+]
+
+
+def read_persons(year, population=None, budget=None):
+    """
+    Demographic columns of GBAPERSOONTAB of `year`, renamed to human readable names.
+
+    Only the people in `population` are kept if it is given. With a `tableio.MemoryBudget`,
+    the file is read in chunks.
+    """
+    fn = config.persoontab_file(year)
+    print("Reading GBAPERSOONTAB...")
+    print(f"\t... from file {fn}")
+
+    def transform(nodes):
+        # rename columns to human readable
+        nodes.columns = ["label", "gender", "number_of_parents_from_abroad", "migrant_generation", "birth_year"]
+        nodes = nodes.with_columns(pl.col("label").cast(schema.LABEL))
+        return nodes if population is None else nodes.filter(pl.col("label").is_in(population))
+
+    with metrics.step("read GBAPERSOONTAB") as s:
+        nodes = read_sav(fn, usecols=PERSOONTAB_COLUMNS, transform=transform, budget=budget)
+        s["rows_out"] = nodes.height
+    return nodes
+
+
+def read_addresses(year, budget=None):
+    """
+    GBAADRESOBJECTBUS of the previous year, it is used to decide who was registered on JJJJ-01-01.
+
+    With a `tableio.MemoryBudget`, the file is read in chunks, and only the registrations
+    that include Dec 31 of the previous year are kept of each chunk.
+    """
+    fn = config.objectbus_file(year - 1)
+    print(f"\tReading GBAADRESBUS from {fn}...")
+    with metrics.step("read ADRESBUS") as s:
+        addresses = read_sav(
+            fn, usecols=ADDRESS_COLUMNS,
+            transform=(lambda df: registered_on_dec31(df, year)) if budget is not None else None,
+            budget=budget
+        )
+        s["rows_out"] = addresses.height
+    return addresses
+
+
+def registered_on_dec31(addresses, year):
+    """Address registrations that include Dec 31 of the previous year."""
+    return addresses.filter(
+        (pl.col("GBADATUMEINDEADRESHOUDING") >= f"{year-1}1231") &
+        (pl.col("GBADATUMAANVANGADRESHOUDING") <= f"{year-1}1231")
+    )
+
+
+def active_population(addresses, deaths, year):
+    """
+    Labels of people registered at an address on Dec 31 of the previous year and alive on Jan 1.
+
+    Parameters
+    ----------
+    addresses : polars DataFrame
+        GBAADRESOBJECTBUS of year - 1.
+    deaths : polars DataFrame
+        GBAOVERLIJDENTAB with RINPERSOON and GBADatumOverlijden.
+    year : int
+
+    Returns
+    -------
+    polars Series of unique labels
+    """
+    print("\tFiltering population on previous year's dec 31 from ADRESBUS...")
+    population_jan1_tentative = (
+        registered_on_dec31(addresses, year)
+            .select(pl.col("RINPERSOON").cast(schema.LABEL))
+            .unique()
+    )
+    print("\tSelecting those who died up until the given year's 1 Jan...")
+    # dead before 0101
+    dead = (
+        deaths
+            .filter(pl.col("GBADatumOverlijden") <= f"{year}0101")
+            .get_column("RINPERSOON")
+    )
+    print("\tDeducting dead people from the tentative population...")
+    population_jan1 = population_jan1_tentative.filter(~pl.col("RINPERSOON").is_in(dead))
+    print(f"\tRemoved {population_jan1_tentative.height-population_jan1.height} people based on the death tab.")
+    return population_jan1.get_column("RINPERSOON").alias("label")
+
+
+def base_nodes(merged_nodes, persons, population, parent_flags):
+    """
+    Combine demographics, active flags and missing parent flags for all nodes of the merged mapping.
+
+    Parameters
+    ----------
+    merged_nodes : polars DataFrame
+        Merged node mapping with `id` and `label`.
+    persons : polars DataFrame
+        Output of `read_persons`.
+    population : polars Series
+        Output of `active_population`.
+    parent_flags : polars DataFrame
+        `label`, `missing_mother`, `missing_father` derived from KINDOUDERTAB.
+
+    Returns
+    -------
+    polars DataFrame with OUTPUT_COLUMNS, one row per node of the merged mapping
+    """
+    print("\tCreating active column in dataframes...")
+    # people in the address list but not in the merged node list based on GBAPERSOONTAB files
+    print("\tPeople in population not in merged_nodes:", (~population.is_in(merged_nodes["label"])).sum())
+    merged_nodes = merged_nodes.with_columns(
+        pl.col("label").is_in(population).alias("active")
+    )
+    # nodes only contains active nodes, we'll merge data, then merge this back to the merged_nodes to contain everyone
+    nodes = persons.filter(pl.col("label").is_in(population))
+
+    # adding missing parent info to node dataframe, dtypes are set by `schema.enforce`
+    nodes = (nodes
+        .join(parent_flags, on="label", how="left")
+        .with_columns(
+            pl.col("missing_mother").fill_null(0),
+            pl.col("missing_father").fill_null(0)
+        )
+    )
+
+    print("Writing all info back to merged node dataframe...")
+    return (merged_nodes
+        .join(nodes, on="label", how="left")
+        .select([pl.col(c) for c in OUTPUT_COLUMNS])
+    )
+
+
+def sources(pipeline, year):
+    return [config.persoontab_file(year), config.objectbus_file(year - 1), config.overlijdentab_file(), config.kindoudertab_file()]
+
+
+def run(pipeline, year):
+    print("========================================")
+    print(f"YEAR: {year}")
+    print("========================================")
+    inputs = pipeline.inputs
+    addresses = read_addresses(year, pipeline.budget)
+    deaths = inputs.deaths()
+    with metrics.step("active population", rows_in=addresses.height) as s:
+        population = active_population(addresses, deaths, year)
+        s["rows_out"] = len(population)
+    del addresses
+    persons = read_persons(year, population, pipeline.budget)
+    merged_nodes = inputs.merged_mapping()
+    parent_flags = inputs.parent_flags()
+    with metrics.step("join base", rows_in=persons.height) as s:
+        nodes = base_nodes(merged_nodes, persons, population, parent_flags)
+        s["rows_out"] = nodes.height
+    with pl.Config(tbl_cols = -1):
+        print(nodes.head())
+    return nodes
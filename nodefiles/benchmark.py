@@ -0,0 +1,148 @@
+"""
+Author: Eszter Bokanyi, e.bokanyi@liacs.leidenuniv.nl
+Last modified: 2026.10.18
+
+End-to-end benchmark of the pipeline on synthetic data, runs on any machine with the Python dependencies.
+
+For each scale (number of persons), `run`
+    * generates synthetic source files below {root}/persons_{n}/sources with `nodefiles.synthetic`,
+      or reuses them if they were generated with the same parameters,
+    * runs stages 01-11 for start_year-end_year in a separate process, in the working folder
+      {root}/persons_{n}/working_folder, with the G: and K: drives mapped to the synthetic sources,
+    * collects wall time, CPU time and peak memory of every stage from the metrics of the run.
+The results of all scales are written to {root}/benchmark_{timestamp}.csv and printed as a table.
+
+Every scale runs in a fresh process, so memory is not carried over between scales. Peak memory is
+measured per stage on Linux (see `metrics.reset_peak`), elsewhere it is the peak of the run so far.
+
+Usage
+-----
+    python -m nodefiles benchmark /data/benchmark --persons 100000 1000000 10000000 --start-year 2019 --end-year 2021
+"""
+
+import csv
+import json
+import os
+import shutil
+import subprocess
+import sys
+from datetime import datetime
+
+from . import config, metrics, synthetic
+from .pipeline import STAGES
+
+RESULT_COLUMNS = ["persons", "stage", "years", "wall_s", "cpu_s", "peak_rss_bytes", "rows_out"]
+
+
+def prepare(root, n_persons, start_year, end_year, seed=0):
+    """
+    Synthetic sources and a working folder for one scale.
+
+    Returns
+    -------
+    (source root, working folder)
+    """
+    folder = os.path.join(root, f"persons_{n_persons}")
+    sources = os.path.join(folder, "sources")
+    working_folder = os.path.join(folder, "working_folder")
+    os.makedirs(os.path.join(working_folder, "src"), exist_ok=True)
+    for fn in ("files_per_year.json", "layers.csv"):
+        shutil.copy(os.path.join(config.SRC_FOLDER, fn), os.path.join(working_folder, "src", fn))
+
+    params = dict(n_persons=n_persons, start_year=start_year, end_year=end_year, seed=seed)
+    existing = None
+    if os.path.exists(synthetic.parameters_file(sources)):
+        with open(synthetic.parameters_file(sources)) as f:
+            existing = {k: v for k, v in json.load(f).items() if k in params}
+    if existing == params:
+        print(f"Reusing synthetic sources in {sources}.")
+    else:
+        shutil.rmtree(sources, ignore_errors=True)
+        synthetic.generate(sources, n_persons, start_year, end_year, config.load_files_per_year(working_folder), seed)
+    return sources, working_folder
+
+
+def run_pipeline(sources, working_folder, start_year, end_year, run_id):
+    """Run all stages in a separate process on the sources, return the metrics file of the run."""
+    env = dict(os.environ)
+    env.update({f"NODEFILES_{drive}_ROOT": folder for drive, folder in synthetic.source_roots(sources).items()})
+    env["PYTHONPATH"] = os.pathsep.join([config.SRC_FOLDER] + ([env["PYTHONPATH"]] if env.get("PYTHONPATH") else []))
+    log = os.path.join(working_folder, f"{run_id}.log")
+    print(f"Running stages 01-11 for {start_year}-{end_year}, log in {log}...")
+    with open(log, "w") as f:
+        subprocess.run(
+            [sys.executable, "-m", "nodefiles", "run", str(start_year), str(end_year), working_folder, "--force", "--run-id", run_id],
+            env=env, stdout=f, stderr=subprocess.STDOUT, check=True
+        )
+    return os.path.join(metrics.metrics_folder(working_folder), f"metrics_{run_id}.jsonl")
+
+
+def stage_summary(fn):
+    """Wall time, CPU time and rows summed over years, and the maximum peak memory of every stage of a run."""
+    stages = {}
+    for record in metrics.load(fn):
+        if record["step"] != "stage total":
+            continue
+        s = stages.setdefault(record["stage"], dict(years=0, wall_s=0.0, cpu_s=0.0, peak_rss_bytes=None, rows_out=0))
+        s["years"] += 1
+        s["wall_s"] += record["wall_s"]
+        s["cpu_s"] += record["cpu_s"]
+        s["rows_out"] += record.get("rows_out") or 0
+        if record.get("peak_rss_bytes") is not None:
+            s["peak_rss_bytes"] = max(s["peak_rss_bytes"] or 0, record["peak_rss_bytes"])
+    return stages
+
+
+def run(root, scales, start_year, end_year, seed=0):
+    """
+    Benchmark all stages at every scale.
+
+    Parameters
+    ----------
+    root : str
+        Folder for the synthetic sources, working folders and results.
+    scales : list of int
+        Numbers of persons.
+    start_year, end_year : int
+    seed : int
+
+    Returns
+    -------
+    list of dicts with RESULT_COLUMNS, one per scale and stage
+    """
+    stamp = datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
+    results = []
+    for n_persons in scales:
+        print(f"==============================\n {n_persons} persons \n==============================")
+        sources, working_folder = prepare(root, n_persons, start_year, end_year, seed)
+        fn = run_pipeline(sources, working_folder, start_year, end_year, f"benchmark_{n_persons}_{stamp}")
+        stages = stage_summary(fn)
+        for stage in STAGES:
+            if stage.name in stages:
+                results.append(dict(persons=n_persons, stage=stage.name, **stages[stage.name]))
+
+    fn = os.path.join(root, f"benchmark_{stamp}.csv")
+    with open(fn, "w", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=RESULT_COLUMNS)
+        writer.writeheader()
+        writer.writerows(results)
+    print(f"Results written to {fn}")
+    print(format_results(results))
+    return results
+
+
+def format_results(results):
+    """Table of wall time, CPU time and peak memory, one row per stage and three columns per scale."""
+    scales = list(dict.fromkeys(r["persons"] for r in results))
+    header = ["stage"] + [f"{n} {m}" for n in scales for m in ("wall_s", "cpu_s", "peak")]
+    by_stage = {}
+    for r in results:
+        by_stage.setdefault(r["stage"], {})[r["persons"]] = r
+    rows = []
+    for stage, per_scale in by_stage.items():
+        row = [stage]
+        for n in scales:
+            r = per_scale.get(n)
+            row += ["-"] * 3 if r is None else [f"{r['wall_s']:.1f}", f"{r['cpu_s']:.1f}", metrics.human_bytes(r["peak_rss_bytes"])]
+        rows.append(row)
+    return metrics.format_table(header, rows)
@@ -0,0 +1,94 @@
+"""
+Author: Eszter Bokanyi, e.bokanyi@liacs.leidenuniv.nl
+Last modified: 2026.10.18
+
+Stage 06: geographic metadata (centroids, effective radius) of the buurten of a given year.
+It can be later joined to the location data.
+"""
+
+from . import config, metrics, staging
+
+# variables to save in simple dataframe
+OUTPUT_COLUMNS = ["buurt_code", "buurt_name", "buurt_centroid_x", "buurt_centroid_y", "buurt_centroid_lat", "buurt_centroid_lon", "buurt_eff_r"]
+
+
+def read_buurten(year):
+    """Buurt shapefile of `year` as a GeoDataFrame."""
+    import geopandas as gpd
+
+    fn = config.buurt_shapefile(year)
+    with metrics.step("read shapefile") as s:
+        # the attributes and geometries in the files next to the .shp are read with it
+        gdf = gpd.read_file(staging.local(fn, companions=[fn[:-len(".shp")] + ext for ext in (".shx", ".dbf", ".prj")]))
+        s["rows_out"] = len(gdf)
+    # look into file
+    print(gdf.head())
+    return gdf
+
+
+def buurt_metadata(gdf):
+    """
+    Centroids in Amersfoort (EPSG:28992) and WGS84 (EPSG:4326) coordinates and effective radius of each buurt.
+
+    Parameters
+    ----------
+    gdf : GeoDataFrame
+        Output of `read_buurten`.
+
+    Returns
+    -------
+    pandas DataFrame with OUTPUT_COLUMNS
+    """
+    import numpy as np
+    import pandas as pd
+
+    # renaming
+    gdf = gdf.rename(
+        columns = dict(
+            STATCODE="buurt_code",
+            BU_NAAM="buurt_name",
+            BU_CODE="buurt_code"
+        )
+    )
+
+    # repairing geometries, dropping strange entries
+    gdf = gdf\
+        .set_index("buurt_name")\
+        .drop(["Buitenland"], errors="ignore")\
+        .reset_index()\
+        .dissolve(by="buurt_code")\
+        .dropna(subset="buurt_name")\
+        .reset_index()\
+        .sort_values(by="buurt_code")\
+        .reset_index(drop=True)
+    gdf["geometry"] = gdf["geometry"].buffer(0)
+
+    # calculating Amersfoort and lon/lat centroid coordinates
+    gdf["centroid"] = gdf["geometry"].centroid
+    gdf["buurt_centroid_x"] = gdf["centroid"].map(lambda p: p.x)
+    gdf["buurt_centroid_y"] = gdf["centroid"].map(lambda p: p.y)
+    gdf.set_geometry("centroid", inplace=True)
+    gdf.set_crs("epsg:28992", inplace=True)
+    gdf.to_crs("epsg:4326", inplace=True)
+    gdf["buurt_centroid_lon"] = gdf["centroid"].map(lambda p: p.x)
+    gdf["buurt_centroid_lat"] = gdf["centroid"].map(lambda p: p.y)
+
+    # effective radius: sqrt(area/pi) - error metric for buurt centroid coord in meters
+    gdf["buurt_eff_r"] = np.sqrt(gdf["geometry"].area / np.pi)
+
+    return pd.DataFrame(gdf[OUTPUT_COLUMNS])
+
+
+def sources(pipeline, year):
+    shp = config.buurt_shapefile(year)
+    # attributes and geometries are spread over several files next to the .shp
+    return [shp[:-len(".shp")] + ext for ext in (".shp", ".shx", ".dbf", ".prj")]
+
+
+def run(pipeline, year):
+    print(f"==================== YEAR {year} ===============================")
+    gdf = read_buurten(year)
+    with metrics.step("centroids", rows_in=len(gdf)) as s:
+        df = buurt_metadata(gdf)
+        s["rows_out"] = len(df)
+    return df
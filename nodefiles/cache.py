@@ -0,0 +1,184 @@
+"""
+Author: Eszter Bokanyi, e.bokanyi@liacs.leidenuniv.nl
+Last modified: 2026.10.18
+
+Input-keyed build cache of the stage outputs.
+
+Every stage output gets a manifest in {working_folder}/temp/cache/ recording the key it was
+built with and the fingerprints of the files it wrote. The key is a hash of
+    * the stage name,
+    * the stage code version (hash of the stage module, the shared modules, and all nodefiles
+      modules they import, directly or not),
+    * the parameters the output depends on (start_year, end_year, year),
+    * the fingerprints (size and modification time) of the source files it reads, and
+    * the keys of the upstream stages it reads.
+A stage whose key and outputs are unchanged is skipped. Since upstream keys are part of the
+key, changing the code of one stage only invalidates that stage and the stages downstream of it,
+and a failed run resumes from the last stage that finished.
+
+Nothing is deleted implicitly, outputs are evicted with `python -m nodefiles cache clear`.
+"""
+
+import ast
+import hashlib
+import inspect
+import json
+import os
+from datetime import datetime
+
+from . import config
+
+# modules every stage relies on, a change in these invalidates all stages
+SHARED_MODULES = ("config", "inputs", "schema", "tableio")
+
+
+def fingerprint(fn):
+    """Cheap fingerprint of a file: size and modification time, or None if it does not exist."""
+    try:
+        st = os.stat(fn)
+    except OSError:
+        return None
+    return [st.st_size, st.st_mtime_ns]
+
+
+def imported_modules(module):
+    """Names of the nodefiles modules `module` imports, at module level or inside functions."""
+    names = set()
+    for node in ast.walk(ast.parse(inspect.getsource(module))):
+        if isinstance(node, ast.ImportFrom) and node.level == 1:
+            if node.module is not None:
+                names.add(node.module.split(".")[0])
+            else:
+                # from . import a, b
+                names.update(alias.name for alias in node.names)
+        elif isinstance(node, ast.ImportFrom) and node.level == 0 and (node.module or "").startswith(f"{__package__}."):
+            names.add(node.module.split(".")[1])
+        elif isinstance(node, ast.Import):
+            names.update(a.name.split(".")[1] for a in node.names if a.name.startswith(f"{__package__}."))
+    return names
+
+
+def _is_stage(module):
+    return hasattr(module, "run") and hasattr(module, "sources")
+
+
+def code_version(module):
+    """Hash of the source code of a stage module, the shared modules and the nodefiles modules they import."""
+    import importlib
+
+    modules = {}
+    # (module, whether it is imported by the stage module rather than by a shared module)
+    pending = [(module, True)] + [(importlib.import_module(f".{name}", __package__), False) for name in SHARED_MODULES]
+    while pending:
+        m, from_stage = pending.pop()
+        # readers of other stage modules the shared inputs import (e.g. `income.read_household_incomes`
+        # in `inputs`) are versioned with their own stage, which is upstream where it matters
+        if m.__name__ in modules or (not from_stage and _is_stage(m)):
+            continue
+        modules[m.__name__] = m
+        pending += [(importlib.import_module(f".{name}", __package__), from_stage) for name in imported_modules(m)]
+    h = hashlib.sha256()
+    for name in sorted(modules):
+        h.update(inspect.getsource(modules[name]).encode("utf-8"))
+    return h.hexdigest()[:16]
+
+
+def stage_key(name, code, params, sources, upstream):
+    """Hash all ingredients of a stage output into a single key."""
+    ingredients = {
+        "stage": name,
+        "code": code,
+        "params": params,
+        "sources": {fn: fingerprint(fn) for fn in sources},
+        "upstream": upstream,
+    }
+    return hashlib.sha256(json.dumps(ingredients, sort_keys=True).encode("utf-8")).hexdigest()[:16]
+
+
+def cache_folder(working_folder):
+    return os.path.join(config.temp_folder(working_folder), "cache")
+
+
+def _write_json(obj, fn):
+    # write to a temporary file and rename, so that a crash never leaves a half-written manifest
+    tmp = config.temporary_file(fn)
+    with open(tmp, "w") as f:
+        json.dump(obj, f, indent=4)
+    os.replace(tmp, fn)
+
+
+class BuildCache:
+    """Manifests of the stage outputs in a working folder."""
+
+    def __init__(self, working_folder):
+        self.folder = cache_folder(working_folder)
+
+    def manifest_file(self, output):
+        return os.path.join(self.folder, os.path.basename(output) + ".json")
+
+    def manifest(self, output):
+        fn = self.manifest_file(output)
+        if not os.path.exists(fn):
+            return None
+        with open(fn) as f:
+            return json.load(f)
+
+    def is_fresh(self, key, outputs):
+        """True if `outputs` were built with `key` and have not changed since."""
+        manifest = self.manifest(outputs[0])
+        if manifest is None or manifest["key"] != key:
+            return False
+        return all(fingerprint(fn) is not None and fingerprint(fn) == manifest["outputs"].get(fn) for fn in outputs)
+
+    def record(self, stage, year, key, outputs):
+        """Store the manifest of freshly written outputs."""
+        os.makedirs(self.folder, exist_ok=True)
+        _write_json(
+            {
+                "stage": stage,
+                "year": year,
+                "key": key,
+                "created": datetime.now().isoformat(timespec="seconds"),
+                "outputs": {fn: fingerprint(fn) for fn in outputs},
+            },
+            self.manifest_file(outputs[0])
+        )
+
+    def entries(self):
+        """All manifests in the cache."""
+        if not os.path.isdir(self.folder):
+            return []
+        entries = []
+        for fn in sorted(os.listdir(self.folder)):
+            if fn.endswith(".json"):
+                with open(os.path.join(self.folder, fn)) as f:
+                    entries.append(json.load(f))
+        return entries
+
+    def evict(self, stages=None, years=None):
+        """
+        Delete cached outputs and their manifests.
+
+        Parameters
+        ----------
+        stages : list of str, optional
+            Only evict these stages, default all.
+        years : list of int, optional
+            Only evict these years, default all (including the merged mapping).
+
+        Returns
+        -------
+        list of evicted manifests
+        """
+        evicted = []
+        for entry in self.entries():
+            if stages is not None and entry["stage"] not in stages:
+                continue
+            if years is not None and entry["year"] not in years:
+                continue
+            for fn in entry["outputs"]:
+                if os.path.exists(fn):
+                    os.remove(fn)
+            os.remove(self.manifest_file(next(iter(entry["outputs"]))))
+            evicted.append(entry)
+        return evicted
@@ -0,0 +1,93 @@
+"""
+Author: Eszter Bokanyi, e.bokanyi@liacs.leidenuniv.nl
+Last modified: 2026.10.18
+
+Stage 08: merge all node attribute tables of a year into a single node table.
+
+Next to the gzipped CSV, the table is written as parquet, in id order, for `nodefiles.store`.
+"""
+
+import polars as pl
+
+from . import config, household, metrics, schema
+from .tableio import to_polars, write_parquet
+
+# rows per parquet row group, the unit a reader can skip based on min/max statistics
+ROW_GROUP_SIZE = 500_000
+
+
+def combined_nodes(nodes, nodes_income, nodes_education, nodes_location, buurt_metadata, gemeente_metadata):
+    """
+    Left join all attribute tables to the base nodes, so that all nodes of the merged mapping are present.
+
+    With income, the highest education level of every household is added, see `household.max_educ_level`.
+
+    Parameters
+    ----------
+    nodes : polars DataFrame
+        Base nodes (stage 02).
+    nodes_income : polars DataFrame or None
+        Income (stage 03), None for years without income data.
+    nodes_education, nodes_location : polars DataFrame
+        Education (stage 04) and location (stage 05), keyed by `label`.
+    buurt_metadata, gemeente_metadata : DataFrame
+        Buurt (stage 06) and gemeente (stage 07) metadata, keyed by `buurt_code` and `gemeente_code`.
+
+    Returns
+    -------
+    polars DataFrame sorted by id
+    """
+    if nodes_income is not None:
+        nodes = nodes.join(nodes_income, on="label", how="left")
+
+    # all tables already have the dtypes of `schema.DTYPES`
+    nodes = (nodes
+        .join(nodes_education, on="label", how="left")
+        .join(nodes_location, on="label", how="left")
+        .sort(by="id")
+        .join(to_polars(buurt_metadata).select(pl.exclude("buurt_name")), how="left", on="buurt_code")
+        .join(to_polars(gemeente_metadata), how="left", on="gemeente_code")
+    )
+    if "household_id" in nodes.columns:
+        nodes = nodes.with_columns(household.max_educ_level(nodes["household_id"], nodes["educ_level"]))
+    return nodes
+
+
+def sources(pipeline, year):
+    # combined only reads the outputs of upstream stages
+    return []
+
+
+def extra_outputs(pipeline, year):
+    return [config.nodes_parquet_file(pipeline.output_folder, pipeline.start_year, pipeline.end_year, year)]
+
+
+def run(pipeline, year):
+    print(f"YEAR {year}", "start year", pipeline.start_year, "end_year", pipeline.end_year)
+
+    has_income = year >= config.FIRST_INCOME_YEAR
+    if has_income:
+        print(f"Year {year} has income data.")
+    else:
+        print(f"Year {year} does NOT have income data.")
+
+    print("Reading node attribute files...")
+    tables = [
+        pipeline.result("base", year),
+        pipeline.result("income", year) if has_income else None,
+        pipeline.result("education", year),
+        pipeline.result("location", year),
+        pipeline.result("buurt", year),
+        pipeline.result("gemeente", year),
+    ]
+    with metrics.step("join attributes", rows_in=len(tables[0])) as s:
+        nodes = schema.enforce(combined_nodes(*tables), "combined")
+        s["rows_out"] = nodes.height
+    fn = extra_outputs(pipeline, year)[0]
+    print(f"Saving parquet copy to {fn}...")
+    with metrics.step("write parquet", rows_in=nodes.height):
+        write_parquet(nodes, fn, ROW_GROUP_SIZE)
+    with pl.Config(tbl_cols=-1):
+        print(nodes.head())
+    print("Done.")
+    return nodes
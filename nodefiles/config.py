@@ -0,0 +1,458 @@
+"""
+Author: Eszter Bokanyi, e.bokanyi@liacs.leidenuniv.nl
+Last modified: 2026.10.18
+
+Source file locations within the CBS Microdata RA environment and output file names of the pipeline.
+
+All file paths that were hard-coded in the stage scripts are collected here, so that the stage
+functions, the single-process driver and the thin CLI wrappers agree on where inputs are read from
+and where outputs are written to.
+
+Source paths are given as they are in the RA, on the G: and K: drives. Outside of the RA, e.g. to run the
+pipeline on synthetic data (see `nodefiles.synthetic`), the drives can be mapped to local folders
+with `set_source_roots(G=..., K=...)` or the environment variables NODEFILES_G_ROOT and NODEFILES_K_ROOT.
+"""
+
+import json
+import os
+import re
+import socket
+import tempfile
+
+# ============================================================
+# Source files (G: and K: drives of the CBS Microdata RA)
+# ============================================================
+
+# some years of GBAPERSOONTAB do not follow the file naming convention
+PERSOONTAB_FILES = {
+    2008 : "G:\\Bevolking\\GBAPERSOONTAB\\2009\\GBAPERSOON2009TABV1.sav",
+    2016 : "G:\\Bevolking\\GBAPERSOONTAB\\2016\\GBAPERSOONTAB2016V1.sav",
+    2018 : "G:\\Bevolking\\GBAPERSOONTAB\\2018\\GBAPERSOON2018TABV2.sav",
+    2020 : "G:\\Bevolking\\GBAPERSOONTAB\\2020\\GBAPERSOON2020TABV3.sav",
+    2022 : "G:\\Bevolking\\GBAPERSOONTAB\\2022\\GBAPERSOON2022TABV2.sav",
+}
+
+OVERLIJDENTAB_FILES = {
+    2008: "G:\\Bevolking\\GBAOVERLIJDENTAB\\2022\\GBAOVERLIJDEN2022TABV1.sav",
+    2009: "G:\\Bevolking\\GBAOVERLIJDENTAB\\2022\\GBAOVERLIJDEN2022TABV1.sav",
+    2010: "G:\\Bevolking\\GBAOVERLIJDENTAB\\2022\\GBAOVERLIJDEN2022TABV1.sav",
+    2011: "G:\\Bevolking\\GBAOVERLIJDENTAB\\2022\\GBAOVERLIJDEN2022TABV1.sav",
+    2012: "G:\\Bevolking\\GBAOVERLIJDENTAB\\2022\\GBAOVERLIJDEN2022TABV1.sav",
+    2013: "G:\\Bevolking\\GBAOVERLIJDENTAB\\2022\\GBAOVERLIJDEN2022TABV1.sav",
+    2014: "G:\\Bevolking\\GBAOVERLIJDENTAB\\2022\\GBAOVERLIJDEN2022TABV1.sav",
+    2015: "G:\\Bevolking\\GBAOVERLIJDENTAB\\2022\\GBAOVERLIJDEN2022TABV1.sav",
+    2016: "G:\\Bevolking\\GBAOVERLIJDENTAB\\2022\\GBAOVERLIJDEN2022TABV1.sav",
+    2017: "G:\\Bevolking\\GBAOVERLIJDENTAB\\2022\\GBAOVERLIJDEN2022TABV1.sav",
+    2018: "G:\\Bevolking\\GBAOVERLIJDENTAB\\2022\\GBAOVERLIJDEN2022TABV1.sav",
+    2019: "G:\\Bevolking\\GBAOVERLIJDENTAB\\2022\\GBAOVERLIJDEN2022TABV1.sav",
+    2020: "G:\\Bevolking\\GBAOVERLIJDENTAB\\2022\\GBAOVERLIJDEN2022TABV1.sav",
+    2021: "G:\\Bevolking\\GBAOVERLIJDENTAB\\2022\\GBAOVERLIJDEN2022TABV1.sav",
+    2022: "G:\\Bevolking\\GBAOVERLIJDENTAB\\2022\\GBAOVERLIJDEN2022TABV1.sav",
+    2023: "G:\\Bevolking\\GBAOVERLIJDENTAB\\2023\\GBAOVERLIJDEN2023TABV1.sav",
+    2024: "G:\\Bevolking\\GBAOVERLIJDENTAB\\2024\\GBAOVERLIJDEN2024TABV1.sav"
+}
+
+OBJECTBUS_FILES = {
+    2008 : "G:\\Bevolking\\GBAADRESOBJECTBUS\\GBAADRESOBJECT2009BUSV1.sav"
+}
+
+# most recent version contains all historical parent-child data
+KINDOUDERTAB_FILE = "G:\\Bevolking\\KINDOUDERTAB\\KINDOUDER2024TABV1.sav"
+
+# most recent converted address file contains historical address data for all years
+ADDRESS_HISTORY_FILE = "G:\\Bevolking\\GBAADRESOBJECTBUS\\GBAADRESOBJECT2024BUSV1.csv"
+
+# address object to buurt code lookup, one bc{year} column per year
+VSLGWBTAB_FILE = "G:\\BouwenWonen\\VSLGWBTAB\\VSLGWB2023TAB03V1.sav"
+
+INPATAB_FOLDER = "G:\\InkomenBestedingen\\INPATAB\\"
+INHATAB_FOLDER = "G:\\InkomenBestedingen\\INHATAB\\"
+
+# income data starts in 2011
+FIRST_INCOME_YEAR = 2011
+# the income fallback of stage 03 looks for main earners in INHATAB at most this many years away
+INCOME_FALLBACK_YEARS = 1
+
+# education code conversion tables for years 2009-2012
+EDUCATION_REFERENCE_FOLDER = "K:\\Utilities\\Code_Listings\\SSBreferentiebestanden\\"
+EDUCATION_REFERENCE_FILES = ("OPLEIDINGSNRREFV34.SAV", "CTOREFV13.sav")
+
+EDUCATION_FILES = {
+    2009: r"G:\Onderwijs\HOOGSTEOPLTAB\2009\120619 HOOGSTEOPLTAB 2009V1.csv",
+    2010: r"G:\Onderwijs\HOOGSTEOPLTAB\2010\120918 HOOGSTEOPLTAB 2010V1.csv",
+    2011: r"G:\Onderwijs\HOOGSTEOPLTAB\2011\130924 HOOGSTEOPLTAB 2011V1.csv",
+    2012: r"G:\Onderwijs\HOOGSTEOPLTAB\2012\141020 HOOGSTEOPLTAB 2012V1.csv",
+    2013: r"G:\Onderwijs\HOOGSTEOPLTAB\2013\HOOGSTEOPL2013TABV3.csv",
+    2014: r"G:\Onderwijs\HOOGSTEOPLTAB\2014\HOOGSTEOPL2014TABV3.csv",
+    2015: r"G:\Onderwijs\HOOGSTEOPLTAB\2015\HOOGSTEOPL2015TABV3.csv",
+    2016: r"G:\Onderwijs\HOOGSTEOPLTAB\2016\HOOGSTEOPL2016TABV2.csv",
+    2017: r"G:\Onderwijs\HOOGSTEOPLTAB\2017\HOOGSTEOPL2017TABV3.csv",
+    2018: r"G:\Onderwijs\HOOGSTEOPLTAB\2018\HOOGSTEOPL2018TABV3.csv",
+    2019: r"G:\Onderwijs\HOOGSTEOPLTAB\2019\HOOGSTEOPL2019TABV2.csv",
+    2020: r"G:\Onderwijs\HOOGSTEOPLTAB\2020\HOOGSTEOPL2020TABV2.csv",
+    2021: r"G:\Onderwijs\HOOGSTEOPLTAB\2021\HOOGSTEOPL2021TABV2.csv",
+    2022: r"G:\Onderwijs\HOOGSTEOPLTAB\2022\HOOGSTEOPL2022TABV2.csv",
+    2023: r"G:\Onderwijs\HOOGSTEOPLTAB\2023\HOOGSTEOPL2023TABV2.csv",
+    2024: r"G:\Onderwijs\HOOGSTEOPLTAB\2024\HOOGSTEOPL2024TABV1.csv"
+}
+
+EDUCATION_COLUMN = {
+    2009: "OPLNRHB",
+    2010: "OPLNRHB",
+    2011: "OPLNRHB",
+    2012: "OPLNRHB",
+    2013: "OPLNIVSOI2016AGG4HBMETNIRWO",
+    2014: "OPLNIVSOI2016AGG4HBMETNIRWO",
+    2015: "OPLNIVSOI2016AGG4HBMETNIRWO",
+    2016: "OPLNIVSOI2016AGG4HBMETNIRWO",
+    2017: "OPLNIVSOI2016AGG4HBMETNIRWO",
+    2018: "OPLNIVSOI2016AGG4HBMETNIRWO",
+    2019: "OPLNIVSOI2021AGG4HBmetNIRWO",
+    2020: "OPLNIVSOI2021AGG4HBmetNIRWO",
+    2021: "OPLNIVSOI2021AGG4HBmetNIRWO",
+    2022: "OPLNIVSOI2021AGG4HBmetNIRWO",
+    2023: "OPLNIVSOI2021AGG4HBmetNIRWO",
+    2024: "OPLNIVSOI2021AGG4HBmetNIRWO"
+}
+
+CONVERSION_COLUMN = {
+    2009: "OPLNIVSOI2016AGG4HB",
+    2010: "OPLNIVSOI2016AGG4HB",
+    2011: "OPLNIVSOI2016AGG4HB",
+    2012: "OPLNIVSOI2016AGG4HB",
+    2013: "OPLNIVSOI2016AGG4HBMETNIRWO",
+    2014: "OPLNIVSOI2016AGG4HBMETNIRWO",
+    2015: "OPLNIVSOI2016AGG4HBMETNIRWO",
+    2016: "OPLNIVSOI2016AGG4HBMETNIRWO",
+    2017: "OPLNIVSOI2016AGG4HBMETNIRWO",
+    2018: "OPLNIVSOI2016AGG4HBMETNIRWO",
+    2019: "OPLNIVSOI2021AGG4HBmetNIRWO",
+    2020: "OPLNIVSOI2021AGG4HBmetNIRWO",
+    2021: "OPLNIVSOI2021AGG4HBmetNIRWO",
+    2022: "OPLNIVSOI2021AGG4HBmetNIRWO",
+    2023: "OPLNIVSOI2021AGG4HBmetNIRWO",
+    2024: "OPLNIVSOI2021AGG4HBmetNIRWO"
+}
+
+# Shapefile names for each year (naming conventions vary)
+BUURT_SHAPEFILE_FOLDER = "K:\\Utilities\\Tools\\GISHulpbestanden\\Gemeentewijkbuurt\\"
+BUURT_SHAPEFILES = {
+    2009 : "bu_2009.shp",
+    2010 : "bu_2010.shp",
+    2011 : "bu_2011.shp",
+    2012 : "bu_2012.shp",
+    2013 : "buurt_2013.shp",
+    2014 : "buurt_2014.shp",
+    2015 : "buurt_2015.shp",
+    2016 : "buurt_2016.shp",
+    2017 : "buurt_2017.shp",
+    2018 : "buurt2018.shp",
+    2019 : "buurt_2019_v1.shp",
+    2020 : "bu_2020.shp",
+    2021 : "bu_2021.shp",
+    2022 : "bu_2022.shp",
+    2023 : "bu_2023.shp",
+    2024 : "bu_2024.shp"
+}
+
+# GIN (Gebieden in Nederland) file paths for each year
+# File format changes over time: SAV (2009-2018), DTA (2019-2020), XLSX (2021+)
+GIN_FILES = {
+    2009:"K:\\Utilities\\HULPbestanden\\GebiedeninNederland\\GIN2009V2.sav",
+    2010:"K:\\Utilities\\HULPbestanden\\GebiedeninNederland\\GIN2010V1.sav",
+    2011:"K:\\Utilities\\HULPbestanden\\GebiedeninNederland\\GIN2011V1.sav",
+    2012:"K:\\Utilities\\HULPbestanden\\GebiedeninNederland\\GIN2012V1.sav",
+    2013:"K:\\Utilities\\HULPbestanden\\GebiedeninNederland\\GIN2013V1.sav",
+    2014:"K:\\Utilities\\HULPbestanden\\GebiedeninNederland\\GIN2014V1.sav",
+    2015:"K:\\Utilities\\HULPbestanden\\GebiedeninNederland\\GIN2015V1.sav",
+    2016:"K:\\Utilities\\HULPbestanden\\GebiedeninNederland\\GIN2016V1.sav",
+    2017:"K:\\Utilities\\HULPbestanden\\GebiedeninNederland\\GIN2017V1.sav",
+    2018:"K:\\Utilities\\HULPbestanden\\GebiedeninNederland\\GIN2018V1.sav",
+    2019:"K:\\Utilities\\HULPbestanden\\GebiedeninNederland\\geconverteerde bestanden\\GIN2019V1.dta",
+    2020:"K:\\Utilities\\HULPbestanden\\GebiedeninNederland\\geconverteerde bestanden\\GIN2020V1.dta",
+    2021:"K:\\Utilities\\HULPbestanden\\GebiedeninNederland\\GIN2021.xlsx",
+    2022:"K:\\Utilities\\HULPbestanden\\GebiedeninNederland\\GIN2022.xlsx",
+    2023:"K:\\Utilities\\HULPbestanden\\GebiedeninNederland\\GIN2023.xlsx",
+    2024:"K:\\Utilities\\HULPbestanden\\GebiedeninNederland\\GIN2024.xlsx"
+}
+
+
+# ============================================================
+# Source file paths
+# ============================================================
+
+# drive letter -> local folder, filled by set_source_roots
+SOURCE_ROOTS = {}
+
+
+def set_source_roots(**roots):
+    """Map drives of the RA to local folders, e.g. set_source_roots(G="/data/G", K="/data/K")."""
+    SOURCE_ROOTS.update({drive.upper(): root for drive, root in roots.items()})
+
+
+def source(fn):
+    """
+    Location of the RA path `fn` on this machine.
+
+    If the drive of `fn` is mapped to a local folder, the path is rebuilt below that folder with the
+    separators of the current platform, otherwise `fn` is returned unchanged.
+    """
+    if len(fn) < 2 or fn[1] != ":":
+        return fn
+    drive = fn[0].upper()
+    root = SOURCE_ROOTS.get(drive, os.environ.get(f"NODEFILES_{drive}_ROOT"))
+    if root is None:
+        return fn
+    return os.path.join(root, *[part for part in re.split(r"[\\/]", fn[2:]) if part])
+
+
+def persoontab_csv_default_file(year):
+    """Default CSV file name of GBAPERSOONTAB for `year`."""
+    return source(f"G:\\Bevolking\\GBAPERSOONTAB\\{year}\\geconverteerde data\\GBAPERSOON{year}TABV1_csv.csv")
+
+
+def persoontab_csv_file(year, files_per_year):
+    """CSV version of GBAPERSOONTAB for `year` and the polars read_csv kwargs it needs."""
+    fn = persoontab_csv_default_file(year)
+    # if default name does not exist, read filepath from config file
+    if not os.path.exists(fn):
+        fn = source(files_per_year["node_files"][str(year)][0])
+    kwargs = dict(
+        has_header = True,
+        separator = files_per_year["node_sep"][str(year)]
+    )
+    # some files have a different encoding
+    if str(year) in files_per_year["node_encoding"]:
+        kwargs["encoding"] = files_per_year["node_encoding"][str(year)]
+    return fn, kwargs
+
+
+def persoontab_file(year):
+    """SAV version of GBAPERSOONTAB for `year`."""
+    if year not in PERSOONTAB_FILES:
+        return source(f"G:\\Bevolking\\GBAPERSOONTAB\\{year}\\GBAPERSOON{year}TABV1.sav")
+    return source(PERSOONTAB_FILES[year])
+
+
+def objectbus_file(year):
+    """GBAADRESOBJECTBUS file of `year`."""
+    if year not in OBJECTBUS_FILES:
+        return source(f"G:\\Bevolking\\GBAADRESOBJECTBUS\\GBAADRESOBJECT{year}BUSV1.sav")
+    return source(OBJECTBUS_FILES[year])
+
+
+def overlijdentab_file():
+    """Latest GBAOVERLIJDENTAB, it contains the data from the earlier years."""
+    return source(OVERLIJDENTAB_FILES[max(OVERLIJDENTAB_FILES)])
+
+
+def kindoudertab_file():
+    return source(KINDOUDERTAB_FILE)
+
+
+def address_history_file():
+    return source(ADDRESS_HISTORY_FILE)
+
+
+def vslgwbtab_file():
+    return source(VSLGWBTAB_FILE)
+
+
+# network file of every group of layers.csv ("colleauge" as spelled there)
+NETWORK_FILES = {
+    "household": "HUISGENOTENNETWERK",
+    "family": "FAMILIENETWERK",
+    "neighbor": "BURENNETWERK",
+    "colleauge": "COLLEGANETWERK",
+    "school": "KLASGENOTENNETWERK",
+}
+
+
+def network_source_file(group, year):
+    """Network file of the layers of `group` (a group of layers.csv) of `year`."""
+    name = NETWORK_FILES[group]
+    return source(f"G:\\BEVOLKING\\{name}TAB\\{name}{year}TABV1.csv")
+
+
+def household_network_file(year):
+    """HUISGENOTENNETWERK file of `year` and its separator."""
+    fn = network_source_file("household", year)
+    # for two files, there's a different separator
+    sep = ";"
+    if year == 2021 or year == 2023:
+        sep = ","
+    return fn, sep
+
+
+def income_files(folder, prefix):
+    """Scan an income folder (INPATAB/INHATAB) and map each year to its file."""
+    folder = source(folder)
+    files = {}
+    for f in os.listdir(folder):
+        year_match = re.findall("[0-9]{4,4}", f)
+        if len(year_match) == 1 and prefix in f:
+            files[int(year_match[0])] = os.path.join(folder, f)
+    return files
+
+
+def education_file(year):
+    """HOOGSTEOPLTAB file of `year` and its separator (2023 uses semicolons)."""
+    sep = ";" if year == 2023 else ","
+    return source(EDUCATION_FILES[year]), sep
+
+
+def education_reference_files():
+    """Paths of the OPLNR -> CTO and CTO -> education level conversion tables."""
+    return tuple(source(os.path.join(EDUCATION_REFERENCE_FOLDER, f)) for f in EDUCATION_REFERENCE_FILES)
+
+
+def buurt_shapefile(year):
+    """Buurt shapefile of `year`."""
+    return source(os.path.join(BUURT_SHAPEFILE_FOLDER, str(year), BUURT_SHAPEFILES[year]))
+
+
+def gin_file(year):
+    """GIN file of `year`."""
+    return source(GIN_FILES[year])
+
+
+# ============================================================
+# Working folder layout
+# ============================================================
+
+# folder of this package, {working_folder}/src, with the shipped files_per_year.json and layers.csv
+SRC_FOLDER = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def files_per_year_file(working_folder):
+    return os.path.join(working_folder, "src", "files_per_year.json")
+
+
+def load_files_per_year(working_folder):
+    """Read the files_per_year.json configuration shipped in {working_folder}/src."""
+    with open(files_per_year_file(working_folder)) as f:
+        return json.load(f)
+
+
+def layers_file(working_folder):
+    return os.path.join(working_folder, "src", "layers.csv")
+
+
+def staging_folder():
+    """Default folder for the staged copies of the sources, on the local disk of this machine."""
+    return os.path.join(tempfile.gettempdir(), f"nodefiles_staging_{os.getpid()}")
+
+
+def quality_thresholds_file(working_folder):
+    return os.path.join(working_folder, "src", "quality_thresholds.json")
+
+
+def quality_folder(working_folder):
+    return os.path.join(working_folder, "quality")
+
+
+def temp_folder(working_folder):
+    return os.path.join(working_folder, "temp")
+
+
+def queue_folder(working_folder):
+    """Task states of distributed runs, see `nodefiles.workqueue`."""
+    return os.path.join(working_folder, "queue")
+
+
+def temporary_file(fn):
+    """
+    File `fn` is written to before it is renamed into place, unique per host and process, so that
+    workers on several machines sharing the working folder never write to the same temporary file.
+    """
+    return f"{fn}.{socket.gethostname()}-{os.getpid()}.tmp"
+
+
+def spill_folder(working_folder):
+    """Chunks of sources read in the bounded-memory mode, see `tableio.MemoryBudget`."""
+    return os.path.join(temp_folder(working_folder), "spill")
+
+
+def codebook_folder(working_folder):
+    return os.path.join(working_folder, "codebook")
+
+
+def yearly_node_folder(working_folder):
+    return os.path.join(working_folder, "yearly_node_files")
+
+
+def merged_mapping_file(working_folder, start_year, end_year):
+    return os.path.join(temp_folder(working_folder), f"merged_node_mapping_{start_year}_{end_year}.csv.gz")
+
+
+def base_file(working_folder, start_year, end_year, year):
+    return os.path.join(temp_folder(working_folder), f"base_start_{start_year}_end_{end_year}_year_{year}.csv.gz")
+
+
+def income_file(working_folder, year):
+    return os.path.join(temp_folder(working_folder), f"income_{year}.csv.gz")
+
+
+def education_output_file(working_folder, year):
+    return os.path.join(temp_folder(working_folder), f"education_{year}.csv.gz")
+
+
+def location_file(working_folder, year):
+    return os.path.join(temp_folder(working_folder), f"location_{year}.csv.gz")
+
+
+def buurt_metadata_file(working_folder, year):
+    return os.path.join(temp_folder(working_folder), f"buurt_metadata_{year}.csv.gz")
+
+
+def gemeente_metadata_file(working_folder, year):
+    return os.path.join(temp_folder(working_folder), f"gemeente_metadata_{year}.csv.gz")
+
+
+def gemeente_codebook_file(working_folder, year):
+    return os.path.join(codebook_folder(working_folder), f"gemeente_metadata_codebook_{year}.json")
+
+
+def nodes_file(working_folder, start_year, end_year, year):
+    return os.path.join(yearly_node_folder(working_folder), f"nodes_start_{start_year}_end_{end_year}_year_{year}.csv.gz")
+
+
+def context_file(working_folder, start_year, end_year, year):
+    return os.path.join(yearly_node_folder(working_folder), f"context_start_{start_year}_end_{end_year}_year_{year}.csv.gz")
+
+
+def network_degree_file(working_folder, start_year, end_year, year):
+    return os.path.join(yearly_node_folder(working_folder), f"network_degrees_start_{start_year}_end_{end_year}_year_{year}.csv.gz")
+
+
+def parents_file(working_folder, start_year, end_year, year):
+    """Attributes of the parents of every node, see `nodefiles.parents`."""
+    return os.path.join(yearly_node_folder(working_folder), f"parents_start_{start_year}_end_{end_year}_year_{year}.csv.gz")
+
+
+def network_layer_file(working_folder, start_year, end_year, year, layer):
+    """Sparse adjacency matrix of a layer in the id space of the node files, see `nodefiles.network`."""
+    folder = os.path.join(yearly_node_folder(working_folder), f"network_start_{start_year}_end_{end_year}_year_{year}")
+    return os.path.join(folder, f"layer_{layer}.npz")
+
+
+def cube_file(working_folder, start_year, end_year):
+    return os.path.join(working_folder, "export", f"cube_start_{start_year}_end_{end_year}.csv.gz")
+
+
+def nodes_parquet_folder(working_folder, start_year, end_year):
+    """Parquet copies of the yearly node files, partitioned by year, see `nodefiles.store`."""
+    return os.path.join(yearly_node_folder(working_folder), f"parquet_start_{start_year}_end_{end_year}")
+
+
+def nodes_parquet_file(working_folder, start_year, end_year, year):
+    return os.path.join(nodes_parquet_folder(working_folder, start_year, end_year), f"year={year}", "nodes.parquet")
+
+
+def record_folder(working_folder, start_year, end_year):
+    """Memory-mapped fixed-width records of the node files, see `nodefiles.records`."""
+    return os.path.join(yearly_node_folder(working_folder), f"records_start_{start_year}_end_{end_year}")
+
+
+def delta_folder(working_folder, start_year, end_year):
+    """Base year and year-over-year delta files of the node files, see `nodefiles.delta`."""
+    return os.path.join(yearly_node_folder(working_folder), f"delta_start_{start_year}_end_{end_year}")
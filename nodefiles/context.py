@@ -0,0 +1,131 @@
+"""
+Author: Eszter Bokanyi, e.bokanyi@liacs.leidenuniv.nl
+Last modified: 2026.10.18
+
+Stage 09: neighbourhood context of the active population of a year, per buurt, wijk and gemeente.
+
+For every region, the features are computed from the combined node table (stage 08) in a single
+grouped pass per regional level:
+    * population: number of active people registered in the region,
+    * share of women and median age, shares of the age groups in AGE_GROUPS,
+    * median household income of the residents (people in households without a known income are left out),
+    * weighted shares of the education levels in EDUCATION_LEVELS, weighted by `educ_weight`
+      (the HOOGSTEOPLTAB survey weights), among the people with a known education level.
+
+The features of all levels are written as one long table with a `level` and a `region_code` column,
+and can be joined to the node table with `node_context`.
+"""
+
+import polars as pl
+
+from . import metrics
+
+# regional level -> column of the node table with the code of the region
+LEVELS = {"buurt": "buurt_code", "wijk": "wijk_code", "gemeente": "gemeente_code"}
+
+# (first age, last age) of each age group, None for open ended
+AGE_GROUPS = [(0, 14), (15, 24), (25, 44), (45, 64), (65, None)]
+
+# first digit of OPLNIVSOI2016AGG4HB: low, middle and high, 9 is unknown
+EDUCATION_LEVELS = ["1", "2", "3"]
+
+FEATURE_COLUMNS = (
+    ["population", "share_women", "median_age"]
+    + [f"share_age_{a}_{'plus' if b is None else b}" for a, b in AGE_GROUPS]
+    + ["median_household_income", "educ_weighted_count"]
+    + [f"share_educ_level_{level}" for level in EDUCATION_LEVELS]
+)
+OUTPUT_COLUMNS = ["level", "region_code"] + FEATURE_COLUMNS
+
+
+def feature_expressions(year, has_income):
+    """Aggregations computing FEATURE_COLUMNS of a group of active nodes."""
+    age = year - pl.col("birth_year").cast(pl.Int32)
+    known_educ = pl.col("educ_level").is_in(EDUCATION_LEVELS)
+    weight = pl.when(known_educ).then(pl.col("educ_weight")).otherwise(0.0)
+    total_weight = weight.sum()
+
+    expressions = [
+        pl.len().alias("population"),
+        (pl.col("gender") == 2).mean().alias("share_women"),
+        age.median().alias("median_age"),
+    ]
+    for a, b in AGE_GROUPS:
+        in_group = (age >= a) if b is None else age.is_between(a, b)
+        expressions.append(in_group.mean().alias(f"share_age_{a}_{'plus' if b is None else b}"))
+    if has_income:
+        income = pl.col("household_income")
+        # -1 marks households without a main earner
+        expressions.append(income.filter(income >= 0).median().alias("median_household_income"))
+    else:
+        expressions.append(pl.lit(None, dtype=pl.Float64).alias("median_household_income"))
+    expressions.append(total_weight.alias("educ_weighted_count"))
+    for level in EDUCATION_LEVELS:
+        expressions.append(
+            pl.when(total_weight > 0)
+            .then((weight * (pl.col("educ_level") == level)).sum() / total_weight)
+            .alias(f"share_educ_level_{level}")
+        )
+    return expressions
+
+
+def context_features(nodes, year):
+    """
+    Context features of every buurt, wijk and gemeente.
+
+    Parameters
+    ----------
+    nodes : polars DataFrame
+        Combined node table of `year` (stage 08).
+    year : int
+
+    Returns
+    -------
+    polars DataFrame with OUTPUT_COLUMNS, one row per region and level
+    """
+    active = nodes.filter(pl.col("active"))
+    expressions = feature_expressions(year, "household_income" in nodes.columns)
+    tables = []
+    for level, column in LEVELS.items():
+        tables.append(
+            active
+            .filter(pl.col(column).is_not_null())
+            .group_by(column)
+            .agg(expressions)
+            .rename({column: "region_code"})
+            .with_columns(pl.lit(level).alias("level"))
+            .select(OUTPUT_COLUMNS)
+            .sort("region_code")
+        )
+    return pl.concat(tables, how="vertical")
+
+
+def node_context(nodes, context, level="buurt"):
+    """
+    Join the context features of the `level` region of each node to the node table.
+
+    Feature columns are prefixed with the level, e.g. `buurt_median_household_income`.
+    """
+    features = (
+        context
+        .filter(pl.col("level") == level)
+        .drop("level")
+        .rename({"region_code": LEVELS[level], **{c: f"{level}_{c}" for c in FEATURE_COLUMNS}})
+    )
+    return nodes.join(features, on=LEVELS[level], how="left")
+
+
+def sources(pipeline, year):
+    # context only reads the combined node table
+    return []
+
+
+def run(pipeline, year):
+    print(f"YEAR {year}")
+    nodes = pipeline.result("combined", year)
+    with metrics.step("context features", rows_in=nodes.height) as s:
+        context = context_features(nodes, year)
+        s["rows_out"] = context.height
+    with pl.Config(tbl_cols=-1):
+        print(context.head())
+    return context
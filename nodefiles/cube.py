@@ -0,0 +1,179 @@
+"""
+Author: Eszter Bokanyi, e.bokanyi@liacs.leidenuniv.nl
+Last modified: 2026.10.18
+
+Disclosure-controlled count cube of the active population over the years of the node files.
+
+Everything leaving the RA has to be aggregated with a minimum cell size. The cube counts active
+people per year, per combination of the DIMENSIONS and per region of the geography hierarchy from
+GIN (gemeente -> coropgebied -> provincie -> landsdeel):
+    * the finest cube is computed in a single grouped pass over the parquet node files of all years
+      (`nodefiles.store`), reading only the columns of the requested dimensions. The coarser
+      geography columns depend on gemeente_code within a year, so grouping by all of them does not
+      add cells,
+    * every requested geography level is a rollup of that cube, a sum over its (much smaller) rows,
+    * cells with fewer than `min_count` people are suppressed in one vectorized pass: their count
+      is set to null and `suppressed` is True.
+
+Years without income data (before 2011) have a null income_decile.
+
+Only non-empty cells are listed. Suppression is primary only: a suppressed cell can still be
+recovered from its rollup and its unsuppressed siblings, which the output checker has to look at
+when several levels or dimensions are exported together.
+
+Usage
+-----
+    python -m nodefiles cube 2009 2023 /h/ODISSEI_portal_C --levels gemeente provincie --min-count 10
+    python -m nodefiles cube 2009 2023 /h/ODISSEI_portal_C --dimensions gender birth_cohort --cohort-width 10
+"""
+
+import polars as pl
+
+from . import metrics
+from .store import NodeStore
+
+# dimension -> node table columns it is computed from
+DIMENSIONS = {
+    "gender": ["gender"],
+    "birth_cohort": ["birth_year"],
+    "migrant_generation": ["migrant_generation"],
+    "educ_level": ["educ_level"],
+    "income_decile": ["household_income_percentile"],
+}
+
+# geography level -> column of the node table, from fine to coarse
+GEOGRAPHY = {
+    "gemeente": "gemeente_code",
+    "coropgebied": "coropgebied",
+    "provincie": "provincie",
+    "landsdeel": "landsdeel",
+}
+
+
+def dimension_expressions(dimensions, cohort_width=5):
+    """Expressions computing the `dimensions` from the node table columns."""
+    expressions = {
+        "gender": pl.col("gender"),
+        "birth_cohort": (pl.col("birth_year") // cohort_width * cohort_width).alias("birth_cohort"),
+        "migrant_generation": pl.col("migrant_generation"),
+        "educ_level": pl.col("educ_level"),
+        # percentiles are 1-100, deciles 1-10
+        "income_decile": ((pl.col("household_income_percentile") - 1) // 10 + 1).alias("income_decile"),
+    }
+    unknown = [d for d in dimensions if d not in expressions]
+    if unknown:
+        raise ValueError(f"Unknown cube dimensions {unknown}, choose from {list(DIMENSIONS)}.")
+    return [expressions[d] for d in dimensions]
+
+
+def count_cube(nodes, dimensions, cohort_width=5):
+    """
+    Number of active people per year, dimension values and gemeente.
+
+    Parameters
+    ----------
+    nodes : polars LazyFrame or DataFrame
+        Node tables with a `year` column, e.g. `NodeStore.scan`.
+    dimensions : list of str
+        Keys of DIMENSIONS.
+    cohort_width : int
+        Number of birth years per birth cohort.
+
+    Returns
+    -------
+    polars DataFrame with year, the dimensions, all GEOGRAPHY columns and count
+    """
+    geography = list(GEOGRAPHY.values())
+    return (
+        nodes.lazy()
+        .filter(pl.col("active"))
+        .group_by(["year"] + dimension_expressions(dimensions, cohort_width) + geography)
+        .agg(pl.len().alias("count"))
+        .collect()
+    )
+
+
+def rollup(cube, dimensions, levels):
+    """
+    Sum the cube of `count_cube` to every geography level in `levels`.
+
+    Returns
+    -------
+    polars DataFrame with year, level, region_code, the dimensions and count
+    """
+    tables = []
+    for level in levels:
+        column = GEOGRAPHY[level]
+        tables.append(
+            cube
+            .group_by(["year", column] + dimensions)
+            .agg(pl.col("count").sum())
+            .select(
+                "year",
+                pl.lit(level).alias("level"),
+                pl.col(column).cast(pl.String).alias("region_code"),
+                *dimensions,
+                "count"
+            )
+        )
+    return pl.concat(tables, how="vertical").sort(["year", "level", "region_code"] + dimensions, nulls_last=True)
+
+
+def suppress(cube, min_count):
+    """Null the count of every cell with fewer than `min_count` people, flagged in `suppressed`."""
+    small = pl.col("count") < min_count
+    return cube.with_columns(
+        pl.when(small).then(None).otherwise(pl.col("count")).alias("count"),
+        small.alias("suppressed"),
+    )
+
+
+def export(working_folder, start_year, end_year, years=None, dimensions=None, levels=None, min_count=10, cohort_width=5):
+    """
+    Disclosure-controlled count cube of the node files of a start_year-end_year node mapping.
+
+    Parameters
+    ----------
+    working_folder : str
+    start_year, end_year : int
+        Year range of the merged node mapping.
+    years : iterable of int, optional
+        Years in the cube, all years with parquet node files by default.
+    dimensions : list of str, optional
+        Keys of DIMENSIONS, all by default.
+    levels : list of str, optional
+        Keys of GEOGRAPHY, all by default.
+    min_count : int
+        Smallest count that is published.
+    cohort_width : int
+        Number of birth years per birth cohort.
+
+    Returns
+    -------
+    polars DataFrame with year, level, region_code, the dimensions, count and suppressed
+
+    Raises
+    ------
+    ValueError
+        If a dimension or level is unknown.
+    """
+    dimensions = list(DIMENSIONS) if dimensions is None else list(dimensions)
+    levels = list(GEOGRAPHY) if levels is None else list(levels)
+    # before scanning, so that a typo fails fast and not with a KeyError
+    unknown = [d for d in dimensions if d not in DIMENSIONS]
+    if unknown:
+        raise ValueError(f"Unknown cube dimensions {unknown}, choose from {list(DIMENSIONS)}.")
+    unknown = [l for l in levels if l not in GEOGRAPHY]
+    if unknown:
+        raise ValueError(f"Unknown geography levels {unknown}, choose from {list(GEOGRAPHY)}.")
+    columns = ["active"] + [c for d in dimensions for c in DIMENSIONS[d]] + list(GEOGRAPHY.values())
+    nodes = NodeStore(working_folder, start_year, end_year).scan(years, columns)
+
+    with metrics.step("count cube") as s:
+        cube = count_cube(nodes, dimensions, cohort_width)
+        s["rows_out"] = cube.height
+    with metrics.step("rollup and suppress", rows_in=cube.height) as s:
+        cube = suppress(rollup(cube, dimensions, levels), min_count)
+        s["rows_out"] = cube.height
+    print(f"{cube.height} cells, {cube['suppressed'].sum()} suppressed (count < {min_count})")
+    return cube
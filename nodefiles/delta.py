@@ -0,0 +1,208 @@
+"""
+Author: Eszter Bokanyi, e.bokanyi@liacs.leidenuniv.nl
+Last modified: 2026.10.18
+
+Year-over-year delta files of the yearly node tables.
+
+Consecutive node tables have the same ids (the merged node mapping) and mostly the same values:
+static columns never change, and location, education and income change for a minority of people.
+`write_deltas` stores one full base year and, for every other year, only the rows and columns that
+differ from the neighbouring year towards the base year (year - 1 after the base year, year + 1
+before it), keyed by `id`, in
+    {working_folder}/yearly_node_files/delta_start_{start_year}_end_{end_year}/
+        manifest.json           base year and the columns of every year
+        base_{year}.parquet     full node table of the base year
+        delta_{year}.parquet    id, delta_mask and the changed values of every other year
+
+Changes are found with one null-aware comparison per column over the whole table. Bit i of
+`delta_mask` is set if column i (in the column order of the year in the manifest) changed, and the
+changed values are stored in their columns, with nulls where the column did not change. A value
+that changed to null is recorded by its bit.
+
+`DeltaStore.read(year)` rebuilds the node table of any year from the base year by applying the
+deltas in between, and `DeltaStore.changes(year)` returns the changed rows of a year with a
+boolean {column}_changed column per column, e.g. to study who moved.
+
+Usage
+-----
+    python -m nodefiles delta 2009 2023 /h/ODISSEI_portal_C --base-year 2009
+
+    from nodefiles.delta import DeltaStore
+    nodes = DeltaStore("/h/ODISSEI_portal_C", 2009, 2023).read(2015)
+"""
+
+import json
+import os
+
+import polars as pl
+
+from . import config, metrics, schema
+from .store import NodeStore
+from .tableio import write_parquet
+
+# delta_mask is an Int64 bitmask
+MAX_COLUMNS = 63
+
+
+def delta(previous, current):
+    """
+    Rows and columns of `current` that differ from `previous`, two node tables of the same ids.
+
+    Columns of `current` that are missing from `previous` count as null in `previous`.
+
+    Returns
+    -------
+    polars DataFrame with `id`, `delta_mask` and the columns of `current` that changed in any row
+    """
+    columns = [c for c in current.columns if c != "id"]
+    if len(columns) > MAX_COLUMNS:
+        raise ValueError(f"Node tables with more than {MAX_COLUMNS} columns besides id do not fit delta_mask.")
+    if previous.height != current.height or not previous["id"].equals(current["id"]):
+        raise ValueError("Node tables of consecutive years do not have the same ids, rerun stage 08 with one node mapping.")
+
+    changed = {}
+    for c in columns:
+        old = previous[c] if c in previous.columns else pl.Series(c, [None] * previous.height, dtype=current[c].dtype)
+        changed[c] = current[c].ne_missing(old)
+    # the bits are distinct powers of two, so their sum is their bitwise OR
+    mask = pl.DataFrame(changed).select(
+        pl.sum_horizontal([pl.col(c).cast(pl.Int64) * (1 << i) for i, c in enumerate(columns)]).alias("delta_mask")
+    )["delta_mask"]
+
+    # values of the changed cells, null elsewhere
+    kept = [c for c in columns if changed[c].any()]
+    values = (
+        pl.DataFrame([current[c] for c in kept] + [changed[c].alias(f"{c}__changed") for c in kept])
+        .select([pl.when(pl.col(f"{c}__changed")).then(pl.col(c)).alias(c) for c in kept])
+    )
+    return pl.DataFrame([current["id"], mask]).hstack(values).filter(mask != 0)
+
+
+def apply_delta(previous, changes, columns):
+    """
+    Node table with the `columns` (in this order) from a delta of `previous`, the inverse of `delta`.
+    """
+    bits = {c: i for i, c in enumerate(c for c in columns if c != "id")}
+    joined = previous.join(changes, on="id", how="left", suffix="__new")
+    mask = pl.col("delta_mask").fill_null(0)
+    selected = []
+    for c in columns:
+        if c == "id":
+            selected.append(pl.col("id"))
+            continue
+        new = f"{c}__new" if c in previous.columns else c
+        if c not in changes.columns:
+            # the column did not change, or it is new and null in every row
+            selected.append(pl.col(c) if c in previous.columns else pl.lit(None, dtype=schema.DTYPES[c]).alias(c))
+        elif c not in previous.columns:
+            selected.append(pl.col(c))
+        else:
+            changed = (mask & (1 << bits[c])) != 0
+            selected.append(pl.when(changed).then(pl.col(new)).otherwise(pl.col(c)).alias(c))
+    return joined.select(selected).sort("id")
+
+
+class DeltaStore:
+    """
+    Delta files of a start_year-end_year node mapping, see `write_deltas`.
+
+    Parameters
+    ----------
+    working_folder : str
+    start_year, end_year : int
+        Year range of the merged node mapping.
+    """
+
+    def __init__(self, working_folder, start_year, end_year):
+        self.folder = config.delta_folder(working_folder, start_year, end_year)
+        with open(os.path.join(self.folder, "manifest.json")) as f:
+            self.manifest = json.load(f)
+        self.base_year = self.manifest["base_year"]
+
+    def columns(self, year):
+        return self.manifest["columns"][str(year)]
+
+    def years(self):
+        return sorted(int(y) for y in self.manifest["columns"])
+
+    def changes(self, year):
+        """Rows of `year` that differ from the neighbouring year towards the base year, with a {column}_changed flag per column."""
+        changes = pl.read_parquet(os.path.join(self.folder, f"delta_{year}.parquet"))
+        columns = [c for c in self.columns(year) if c != "id"]
+        return changes.with_columns(
+            [((pl.col("delta_mask") & (1 << i)) != 0).alias(f"{c}_changed") for i, c in enumerate(columns)]
+        )
+
+    def read(self, year):
+        """Node table of `year`, rebuilt from the base year and the deltas in between."""
+        if str(year) not in self.manifest["columns"]:
+            raise FileNotFoundError(f"No delta of {year} in {self.folder}, years are {self.years()}.")
+        nodes = pl.read_parquet(os.path.join(self.folder, f"base_{self.base_year}.parquet"))
+        step = 1 if year > self.base_year else -1
+        for y in range(self.base_year + step, year + step, step):
+            changes = pl.read_parquet(os.path.join(self.folder, f"delta_{y}.parquet"))
+            nodes = apply_delta(nodes, changes, self.columns(y))
+        return nodes
+
+
+def write_deltas(working_folder, start_year, end_year, base_year=None, years=None):
+    """
+    Write the base year and the deltas of the parquet node files of stage 08.
+
+    Parameters
+    ----------
+    working_folder : str
+    start_year, end_year : int
+        Year range of the merged node mapping.
+    base_year : int, optional
+        Year stored in full, the first year by default.
+    years : iterable of int, optional
+        Years to store, all years with parquet node files by default. They have to be consecutive.
+
+    Returns
+    -------
+    dict of file name -> size in bytes
+    """
+    store = NodeStore(working_folder, start_year, end_year)
+    years = sorted(store.years() if years is None else years)
+    if not years:
+        raise FileNotFoundError("No parquet node files found, run stage 08 first.")
+    if years != list(range(years[0], years[-1] + 1)):
+        raise ValueError(f"Delta files need consecutive years, got {years}.")
+    base_year = years[0] if base_year is None else base_year
+    if base_year not in years:
+        raise ValueError(f"Base year {base_year} is not one of {years}.")
+
+    folder = config.delta_folder(working_folder, start_year, end_year)
+    read = lambda y: pl.read_parquet(store.file(y))
+    sizes = {}
+    manifest = dict(base_year=base_year, columns={})
+
+    base = read(base_year)
+    fn = os.path.join(folder, f"base_{base_year}.parquet")
+    with metrics.step(f"write base {base_year}", rows_in=base.height):
+        write_parquet(base, fn)
+    sizes[fn] = os.path.getsize(fn)
+    manifest["columns"][str(base_year)] = base.columns
+
+    # walk away from the base year in both directions
+    for direction in (range(base_year + 1, years[-1] + 1), range(base_year - 1, years[0] - 1, -1)):
+        previous = base
+        for year in direction:
+            current = read(year)
+            with metrics.step(f"delta {year}", rows_in=current.height) as s:
+                changes = delta(previous, current)
+                s["rows_out"] = changes.height
+            fn = os.path.join(folder, f"delta_{year}.parquet")
+            write_parquet(changes, fn)
+            sizes[fn] = os.path.getsize(fn)
+            manifest["columns"][str(year)] = current.columns
+            print(f"{year}: {changes.height} of {current.height} rows changed, columns {changes.columns[2:]}")
+            previous = current
+
+    fn = os.path.join(folder, "manifest.json")
+    tmp = config.temporary_file(fn)
+    with open(tmp, "w") as f:
+        json.dump(manifest, f, indent=4)
+    os.replace(tmp, fn)
+    return sizes
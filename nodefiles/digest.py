@@ -0,0 +1,314 @@
+"""
+Author: Eszter Bokanyi, e.bokanyi@liacs.leidenuniv.nl
+Last modified: 2026.10.18
+
+Order-independent digests of the tables of a run, to check that two runs wrote the same tables.
+
+A rewritten stage has to produce the same files as before, but the rows may come out in another
+order, and comparing two tables of 20M rows row by row is slow. `digest` hashes every value of a
+table together with the key of its row (`id`, or `label`, region codes, ...) and adds up the hashes
+of a column, so the digest of a column does not depend on the row order. The sums are kept per bin
+of rows (ids `bin * bin_width` to `(bin + 1) * bin_width - 1` for integer keys, hash buckets of the
+key otherwise), so that `compare` can tell which columns differ and in which id ranges, and
+`differing_keys` then reads only the rows of those bins to list the keys that differ.
+
+Tables are scanned lazily with the registered dtypes (`schema.DTYPES`) and reduced by a streaming
+group-by, so a table is never held in memory. Integer columns are hashed as Int64 and float columns
+as Float64, so that a CSV and its parquet copy have the same digests. Hashes are polars hashes with
+a fixed seed: digests of one polars version can be compared, digests of different versions cannot
+(the version is stored in the digest).
+
+Usage
+-----
+    python -m nodefiles digest /h/run_a/temp/income_2015.csv.gz /h/run_b/temp/income_2015.csv.gz
+    python -m nodefiles digest /h/run_a /h/run_b                                    # every table of two runs
+    python -m nodefiles digest /h/run_a/yearly_node_files/nodes_start_2009_end_2023_year_2015.csv.gz --save nodes_2015.json
+    python -m nodefiles digest nodes_2015.json /h/run_b/yearly_node_files/nodes_start_2009_end_2023_year_2015.csv.gz
+"""
+
+import gzip
+import hashlib
+import json
+import os
+
+import polars as pl
+
+from . import schema
+
+SEED = 20240601
+# key columns of the tables of the pipeline, the first one present is used
+KEYS = [["id"], ["label"], ["level", "region_code"], ["buurt_code"], ["gemeente_code"]]
+# bins of a table with an integer key, and buckets of other keys
+BINS = 256
+BUCKETS = 256
+TABLE_SUFFIXES = (".csv.gz", ".parquet")
+KEY_COLUMN = "__key__"
+
+
+def scan(fn):
+    """Lazy polars frame of a gzipped CSV or parquet file, with the registered dtypes."""
+    if fn.endswith(".parquet"):
+        return pl.scan_parquet(fn)
+    with gzip.open(fn, "rt", encoding="utf-8") as f:
+        header = f.readline().rstrip("\r\n").split(",")
+    return pl.scan_csv(fn, schema_overrides=schema.dtypes(header))
+
+
+def default_key(columns):
+    """Key columns of a table with `columns`."""
+    for key in KEYS:
+        if all(c in columns for c in key):
+            return key
+    return columns[:1]
+
+
+def canonical(column, dtype):
+    """Expression casting integer columns to Int64 and float columns to Float64."""
+    if dtype.is_integer():
+        return pl.col(column).cast(pl.Int64)
+    if dtype.is_float():
+        return pl.col(column).cast(pl.Float64)
+    return pl.col(column)
+
+
+def bin_width(max_key, bins=BINS):
+    """Power of two width of the id bins of an integer key up to `max_key`, about `bins` bins."""
+    width = 1
+    while width * bins <= max_key:
+        width *= 2
+    return width
+
+
+def _hex(hi, lo):
+    return f"{hi % 2 ** 64:016x}{lo % 2 ** 64:016x}"
+
+
+def digest(fn, key=None, width=None):
+    """
+    Digest of every column of a table, per bin of rows and in total.
+
+    Parameters
+    ----------
+    fn : str
+        Gzipped CSV or parquet file.
+    key : list of str, optional
+        Columns identifying a row, see `KEYS` for the default.
+    width : int, optional
+        Width of the bins of an integer key, about BINS bins over the key range by default.
+
+    Returns
+    -------
+    dict with the file, key, binning, number of rows and, for the key and every other column, its
+    digest and the digests of its bins; `table` is the digest of the whole table
+    """
+    lf = scan(fn)
+    table_schema = lf.collect_schema()
+    key = key or default_key(table_schema.names())
+    missing = [c for c in key if c not in table_schema]
+    if missing:
+        raise ValueError(f"Key columns {missing} are not in {fn}.")
+    lf = lf.select([canonical(c, dtype) for c, dtype in table_schema.items()])
+    integer_key = len(key) == 1 and table_schema[key[0]].is_integer()
+    if integer_key:
+        if width is None:
+            width = bin_width(lf.select(pl.col(key[0]).max()).collect().item() or 0)
+        bins = (pl.col(key[0]) // width).fill_null(-1)
+    else:
+        width = None
+        bins = pl.struct(key).hash(SEED) % BUCKETS
+
+    columns = [KEY_COLUMN] + [c for c in table_schema.names() if c not in key]
+    hashes = [pl.struct(key).hash(SEED).alias(KEY_COLUMN)] + [
+        pl.struct(key + [c]).hash(SEED).alias(c) for c in columns[1:]
+    ]
+    # sums of the high and low 32 bits of the hashes cannot overflow
+    sums = (lf
+        .select(bins.alias("bin"), *hashes)
+        .group_by("bin")
+        .agg([pl.len().alias("rows")] + [e for c in columns for e in (
+            (pl.col(c) // 2 ** 32).sum().alias(f"{c}_hi"), (pl.col(c) % 2 ** 32).sum().alias(f"{c}_lo"),
+        )])
+        .sort("bin")
+        .collect(engine="streaming")
+    )
+
+    result = dict(
+        file=os.path.abspath(fn), key=key, width=width, buckets=None if integer_key else BUCKETS,
+        polars=pl.__version__, rows=int(sums["rows"].sum()), columns={},
+    )
+    for c in columns:
+        bin_digests = {
+            str(b): _hex(hi, lo)
+            for b, hi, lo in zip(sums["bin"].to_list(), sums[f"{c}_hi"].to_list(), sums[f"{c}_lo"].to_list())
+        }
+        result["columns"][c] = dict(
+            dtype=str(table_schema[c]) if c != KEY_COLUMN else None,
+            digest=_hex(sums[f"{c}_hi"].sum(), sums[f"{c}_lo"].sum()),
+            bins=bin_digests,
+        )
+    h = hashlib.sha256(f"{key} {result['rows']}".encode())
+    for c in sorted(result["columns"]):
+        h.update(f"{c} {result['columns'][c]['digest']}".encode())
+    result["table"] = h.hexdigest()
+    return result
+
+
+def load(path, key=None, width=None):
+    """Digest of a table, or a digest saved as JSON."""
+    if path.endswith(".json"):
+        with open(path) as f:
+            return json.load(f)
+    return digest(path, key, width)
+
+
+def save(result, fn):
+    with open(fn, "w") as f:
+        json.dump(result, f, indent=1)
+
+
+def ranges(bins, width):
+    """Key ranges (first, last) of sorted integer bins, with consecutive bins merged."""
+    merged = []
+    for b in bins:
+        if merged and b == merged[-1][1] + 1:
+            merged[-1][1] = b
+        else:
+            merged.append([b, b])
+    return [(first * width, (last + 1) * width - 1) for first, last in merged]
+
+
+def compare(a, b):
+    """
+    Differences between two digests.
+
+    Returns
+    -------
+    list of dicts with the `column` (KEY_COLUMN for rows that are only in one table), a description
+    in `message`, and the differing `bins` and, for integer keys, their key `ranges`
+    """
+    if a["key"] != b["key"]:
+        return [dict(column=None, message=f"tables have different keys {a['key']} and {b['key']}", bins=[], ranges=[])]
+    if a["width"] != b["width"] or a["buckets"] != b["buckets"]:
+        return [dict(column=None, message="digests have different bins, digest both tables with the same --bin-width", bins=[], ranges=[])]
+    if a["polars"] != b["polars"]:
+        print(f"Warning: digests of polars {a['polars']} and {b['polars']} are not comparable.")
+    differences = []
+    for c in a["columns"]:
+        if c not in b["columns"]:
+            differences.append(dict(column=c, message="only in the first table", bins=[], ranges=[]))
+    for c in b["columns"]:
+        if c not in a["columns"]:
+            differences.append(dict(column=c, message="only in the second table", bins=[], ranges=[]))
+    # bins with rows that are only in one table, the key column comes first
+    row_bins = set()
+    for c in a["columns"]:
+        if c not in b["columns"] or a["columns"][c]["digest"] == b["columns"][c]["digest"]:
+            continue
+        bins_a, bins_b = a["columns"][c]["bins"], b["columns"][c]["bins"]
+        bins = sorted(int(i) for i in set(bins_a) | set(bins_b) if bins_a.get(i) != bins_b.get(i))
+        rows_only = c != KEY_COLUMN and set(bins) <= row_bins
+        if c == KEY_COLUMN:
+            row_bins = set(bins)
+            message = "rows only in one table"
+        elif rows_only:
+            message = "differs only in bins with rows only in one table"
+        else:
+            message = "values differ"
+        if a["columns"][c]["dtype"] != b["columns"][c]["dtype"]:
+            message += f" (dtypes {a['columns'][c]['dtype']} and {b['columns'][c]['dtype']})"
+        differences.append(dict(
+            column=c, message=message, bins=bins, rows_only=rows_only,
+            ranges=ranges([i for i in bins if i >= 0], a["width"]) if a["width"] else [],
+        ))
+    return differences
+
+
+def differing_keys(fn_a, fn_b, column, key, bins, width=None, limit=10):
+    """
+    Keys of up to `limit` rows whose `column` differs between two tables, within the differing `bins`.
+
+    Rows that are only in one of the tables count as differing.
+    """
+    def rows(fn):
+        lf = scan(fn)
+        table_schema = lf.collect_schema()
+        lf = lf.select([canonical(c, table_schema[c]) for c in key + ([column] if column != KEY_COLUMN else [])])
+        bin_expr = (pl.col(key[0]) // width).fill_null(-1) if width else pl.struct(key).hash(SEED) % BUCKETS
+        value = pl.struct(key + [column]) if column != KEY_COLUMN else pl.struct(key)
+        return lf.filter(bin_expr.is_in(bins)).select(*key, value.hash(SEED).alias("hash"))
+
+    return (rows(fn_a)
+        .join(rows(fn_b), on=key, how="full", coalesce=True, nulls_equal=True)
+        .filter(pl.col("hash").ne_missing(pl.col("hash_right")))
+        .select(key)
+        .sort(key)
+        .head(limit)
+        .collect()
+    )
+
+
+def tables(folder):
+    """Relative paths of the gzipped CSV and parquet files under `folder`."""
+    found = []
+    for root, _, files in os.walk(folder):
+        for fn in files:
+            if fn.endswith(TABLE_SUFFIXES):
+                found.append(os.path.relpath(os.path.join(root, fn), folder))
+    return sorted(found)
+
+
+def format_differences(differences, limit=5):
+    """Lines describing the differences found by `compare`, columns that differ only where rows are added or removed in one line."""
+    lines = []
+    rows_only = [d["column"] for d in differences if d.get("rows_only")]
+    for d in differences:
+        if d.get("rows_only"):
+            continue
+        where = ", ".join(f"{first}-{last}" for first, last in d["ranges"][:limit])
+        if len(d["ranges"]) > limit:
+            where += f", ... ({len(d['ranges'])} ranges)"
+        if not where and d["bins"]:
+            where = f"{len(d['bins'])} key buckets"
+        column = "rows" if d["column"] == KEY_COLUMN else d["column"]
+        lines.append(f"\t{column}: {d['message']}" + (f" in {where}" if where else ""))
+    if rows_only:
+        more = f", ... ({len(rows_only)} columns)" if len(rows_only) > limit else ""
+        lines.append(f"\t{', '.join(rows_only[:limit])}{more}: differ only in bins with rows only in one table")
+    return "\n".join(lines)
+
+
+def compare_files(path_a, path_b, key=None, width=None, show=10):
+    """
+    Compare two tables (or saved digests), print the differences, and return whether they are the same.
+
+    For two tables with an integer key, the id bins of the second table are those of the first, and
+    up to `show` differing keys of every differing column are listed.
+    """
+    a = load(path_a, key, width)
+    b = load(path_b, key or a["key"], width or a["width"])
+    differences = compare(a, b)
+    if not differences:
+        print(f"same: {path_b} ({a['rows']} rows, {len(a['columns']) - 1} columns, digest {a['table'][:16]})")
+        return True
+    print(f"DIFFERENT: {path_a} ({a['rows']} rows) and {path_b} ({b['rows']} rows)")
+    print(format_differences(differences))
+    if show and not path_a.endswith(".json") and not path_b.endswith(".json"):
+        for d in differences:
+            if d["bins"] and not d.get("rows_only"):
+                keys = differing_keys(path_a, path_b, d["column"], a["key"], d["bins"], a["width"], show)
+                column = "rows" if d["column"] == KEY_COLUMN else d["column"]
+                examples = [str(row[0]) if len(row) == 1 else str(row) for row in keys.rows()]
+                print(f"\t{column}, e.g. {', '.join(a['key'])} {', '.join(examples)}")
+    return False
+
+
+def compare_folders(folder_a, folder_b, show=10):
+    """Compare every table that two working folders have in common, returns whether all are the same."""
+    found_a, found_b = tables(folder_a), tables(folder_b)
+    same = True
+    for fn in sorted(set(found_a) ^ set(found_b)):
+        print(f"only in {folder_a if fn in found_a else folder_b}: {fn}")
+        same = False
+    for fn in sorted(set(found_a) & set(found_b)):
+        same &= compare_files(os.path.join(folder_a, fn), os.path.join(folder_b, fn), show=show)
+    return same
@@ -0,0 +1,100 @@
+"""
+Authors: Eszter Bokanyi, e.bokanyi@liacs.leidenuniv.nl, Yuliia Kazmina, y.kazmina@uva.nl
+Last modified: 2026.10.18
+
+Stage 04: highest education level converted to a standardized 4-level classification.
+
+Education coding systems changed over time:
+- 2009-2012: Uses OPLNRHB codes requiring conversion via reference tables
+- 2013-2018: Uses OPLNIVSOI2016AGG4HBMETNIRWO
+- 2019+: Uses OPLNIVSOI2021AGG4HBmetNIRWO
+"""
+
+import polars as pl
+
+from . import config, metrics, schema, staging
+
+
+def read_education(year):
+    """RINPERSOON, education code and weight columns of HOOGSTEOPLTAB of `year`."""
+    fn, sep = config.education_file(year)
+    with metrics.step("read HOOGSTEOPLTAB") as s:
+        education_input = pl.read_csv(staging.local(fn), columns=["RINPERSOON", config.EDUCATION_COLUMN[year], "GEWICHTHOOGSTEOPL"], separator=sep)
+        s["rows_out"] = education_input.height
+    print(f"Loaded data for {year}")
+    return education_input
+
+
+def education_levels(education_input, year, conversion=None):
+    """
+    Standardized education level of each person.
+
+    Parameters
+    ----------
+    education_input : polars DataFrame
+        Output of `read_education`.
+    year : int
+    conversion : polars DataFrame, optional
+        OPLNRHB -> education level conversion table, only needed for years 2009-2012.
+
+    Returns
+    -------
+    polars DataFrame with `label`, `educ_level` and `educ_weight`
+    """
+    educ_column = config.EDUCATION_COLUMN[year]
+    conv_column = config.CONVERSION_COLUMN[year]
+
+    # Years 2013+ already have standardized codes, just extract first character
+    if year > 2012:
+        return (
+            education_input
+            .with_columns(
+                pl.col(educ_column).cast(pl.Utf8).str.slice(0,1).alias("educ_level")
+            )
+            .rename({
+                "GEWICHTHOOGSTEOPL":"educ_weight",
+                "RINPERSOON":"label"}
+            )
+            .drop(educ_column)
+            .with_columns(pl.col("label").cast(schema.LABEL))
+        )
+
+    # Years 2009-2012: require conversion from OPLNRHB to standardized codes
+    # Zero-pad OPLNRHB codes to 5 digits for consistent joining
+    education_input = (education_input
+        .with_columns(
+            pl.col("OPLNRHB").cast(pl.Utf8).str.zfill(5).alias("OPLNRHB_str")
+        )
+    )
+
+    # Join with conversion tables to get standardized education level
+    education_input = education_input.join(conversion, on="OPLNRHB_str", how="inner")
+
+    return (
+        education_input.with_columns(
+            pl.col(conv_column).cast(pl.Utf8).str.slice(0,1).alias("educ_level")
+        )
+        .drop(["OPLNRHB", "OPLNRHB_str", "CTO", "OPLNIVSOI2016AGG4HB"])
+        .rename({
+            "GEWICHTHOOGSTEOPL":"educ_weight",
+            "RINPERSOON":"label"}
+        ).with_columns(
+            pl.col("label").cast(schema.LABEL)
+        )
+    )
+
+
+def sources(pipeline, year):
+    fn, _ = config.education_file(year)
+    if year <= 2012:
+        return [fn, *config.education_reference_files()]
+    return [fn]
+
+
+def run(pipeline, year):
+    conversion = pipeline.inputs.education_conversion() if year <= 2012 else None
+    education_input = read_education(year)
+    with metrics.step("education levels", rows_in=education_input.height) as s:
+        education = education_levels(education_input, year, conversion)
+        s["rows_out"] = education.height
+    return education
@@ -0,0 +1,184 @@
+"""
+Author: Eszter Bokanyi, e.bokanyi@liacs.leidenuniv.nl
+Last modified: 2026.10.18
+
+Stage 07: higher-level administrative regions of each gemeente, and a codebook mapping codes to names.
+It can be later joined to the location data.
+"""
+
+import json
+import os
+
+from . import config, metrics, staging
+
+# selected variables
+OUTPUT_COLUMNS = ["gemeente_code", "landsdeel", "provincie", "coropgebied", "stedgem"]
+
+
+def gemeente_metadata(fn, year):
+    """
+    Read a GIN file and harmonize its columns across the changing formats and column names.
+
+    Parameters
+    ----------
+    fn : str
+        GIN file of `year` (SAV, DTA, XLSX or CSV).
+    year : int
+
+    Returns
+    -------
+    (pandas DataFrame with OUTPUT_COLUMNS, codebook dict of column -> {code: name})
+    """
+    import numpy as np
+    import pandas as pd
+
+    fn = staging.local(fn)
+    var_of_interest = OUTPUT_COLUMNS
+    if year == 2019:
+        var_of_interest_input= ["gemeentencode", "landsdelencode", "provinciescode", "coropgebiedencode", "stedelijkheidcode"]
+        name_of_interest = ["gemeentenenaam", "landsdelennaam", "provinciesnaam", "coropgebiedennaam", "stedelijkheidomschrijving"]
+    if year == 2020:
+        var_of_interest_input= ["gemeentencode", "landsdelencode", "provinciescode", "coropgebiedencode", "stedelijkheidcode"]
+        name_of_interest = ["gemeentennaam", "landsdelennaam", "provinciesnaam", "coropgebiedennaam", "stedelijkheidomschrijving"]
+    if year > 2020:
+        var_of_interest_input = ["gemeenten|Code", "Landsdelen|Code", "Provincies|Code", "COROP-gebieden|Code", "Stedelijkheid|Code"]
+        name_of_interest = [n.split("|")[0]+"|Naam" for n in var_of_interest_input]
+        name_of_interest[-1] = "Stedelijkheid|Omschrijving"
+    if year == 2021:
+        name_of_interest[0] = name_of_interest[0].lower()
+
+    # Initialize codebook to store code-to-name mappings
+    codebook = {}
+
+    # Handle SPSS (.sav) files (2009-2018)
+    # Need to read twice: once for codes, once for labels
+    if fn.split(".")[-1]=="sav":
+        # with categorical variables
+        df = pd.read_spss(fn, convert_categoricals=False)
+
+        # with labels
+        df_w_labels = pd.read_spss(fn, convert_categoricals=True)
+
+        if year==2014:
+            df.rename(columns={c:c.lower() for c in df.columns}, inplace=True)
+            df_w_labels.rename(columns={c:c.lower() for c in df_w_labels.columns}, inplace=True)
+
+        df_w_labels["gemeente_code"] = df_w_labels["gemeente"]
+
+        df["gemeente_code"] = "GM" + df["gemeente"].astype(str)
+        df["landsdeel"] = df["landsdeel"].astype(int)
+        df["provincie"] = df["provincie"].astype(int)
+        df["coropgebied"] = df["coropgebied"].astype(int)
+        df["stedgem"] = df["stedgem"].astype(int)
+
+        # Create codebook: map codes to human-readable labels
+        for c in var_of_interest:
+            codebook[c] = {k:v for k,v in set(zip(df[c], df_w_labels[c]))}
+
+    # Handle Stata (.dta) files (2019-2020)
+    elif fn.split(".")[-1]=="dta":
+        df = pd.read_stata(fn)
+
+        if year < 2019:
+            df["gemeente_code"] = "GM" + df["gemeente"].astype(str)
+            df["landsdeel"] = df["landsdeel"].astype(int)
+            df["provincie"] = df["provincie"].astype(int)
+            df["coropgebied"] = df["coropgebied"].astype(int)
+            df["stedgem"] = df["stedgem"].astype(int)
+
+        if year>=2019:
+            # creating codebook
+            for c,cc in zip(var_of_interest_input, name_of_interest):
+                codebook[c] = dict(zip(df[c], df[cc]))
+        else:
+            # creating codebook
+            for c in var_of_interest:
+                codebook[c] = dict(zip(df[c], df["lab" + c]))
+
+        if year>=2019:
+            t = dict(zip(var_of_interest, var_of_interest_input))
+            trev = {v:k for k,v in t.items()}
+            print(json.dumps(trev, indent=4))
+            df.rename(columns=trev, inplace=True)
+            print(df.head())
+            for c in ["landsdeel", "provincie", "coropgebied"]:
+                df[c] = df[c].str.slice(2,4).map(int)
+
+            # gemeentencode has already been renamed to gemeente_code above
+            df["gemeente_code"] = "GM" + df["gemeente_code"].astype(str)
+            df["landsdeel"] = df["landsdeel"].astype(int)
+            df["provincie"] = df["provincie"].astype(int)
+            df["coropgebied"] = df["coropgebied"].astype(int)
+            df["stedgem"] = df["stedgem"].astype(int)
+
+            for c in var_of_interest:
+                codebook[c] = codebook[t[c]]
+                del codebook[t[c]]
+
+    # Handle CSV files (not currently used but included for completeness)
+    elif fn.split(".")[-1]=="csv":
+        df = pd.read_csv(fn, header=0, index_col=None)
+        for c in ["landsdeel", "provincie", "coropgebied"]:
+            df[c] = df[c].str.slice(2,4).map(int)
+
+        df["gemeente_code"] = "GM" + df["gemeente"].astype(str)
+        df["landsdeel"] = df["landsdeel"].astype(int)
+        df["provincie"] = df["provincie"].astype(int)
+        df["coropgebied"] = df["coropgebied"].astype(int)
+        df["stedgem"] = df["stedgem"].astype(int)
+
+        # Create codebook from CSV columns
+        for c in var_of_interest:
+            codebook[c] = dict(zip(df[c], df[c+"naam"]))
+
+    # Handle Excel (.xlsx) files (2021+)
+    elif fn.split(".")[-1]=="xlsx":
+        df = pd.read_excel(fn)
+        df = df.rename(columns = {c : c.strip(" ") for c in df.columns})
+        print(df.head())
+        print(df.columns)
+        df = df.rename(columns=dict(zip(var_of_interest_input, var_of_interest)))
+        mask = ~pd.isnull(df["gemeente_code"]) & ~np.isnan(df["gemeente_code"])
+        df = df[mask].copy()
+
+        for c in ["landsdeel", "provincie", "coropgebied"]:
+            df[c] = df[c].str.slice(2,4)
+
+        df["gemeente_code"] = "GM" + df["gemeente_code"].astype(int).astype(str).str.zfill(4)
+        df["landsdeel"] = df["landsdeel"].astype(int).astype(str)
+        df["stedgem"] = df["stedgem"].astype(int).astype(str).str.zfill(1)
+
+        # creating codebook
+        for c,cc in zip(var_of_interest, name_of_interest):
+            codebook[c] = dict(zip(df[c], df[cc]))
+
+    print(df[var_of_interest].head())
+    print(df[var_of_interest].dtypes)
+
+    print("NUMBER of GEMEENTE: ", len(pd.unique(df["gemeente_code"])))
+    return df[var_of_interest], codebook
+
+
+def write_codebook(codebook, fn):
+    os.makedirs(os.path.dirname(fn), exist_ok=True)
+    tmp = config.temporary_file(fn)
+    with open(tmp, "w") as f:
+        json.dump(codebook, f, indent=4)
+    os.replace(tmp, fn)
+
+
+def sources(pipeline, year):
+    return [config.gin_file(year)]
+
+
+def extra_outputs(pipeline, year):
+    return [config.gemeente_codebook_file(pipeline.output_folder, year)]
+
+
+def run(pipeline, year):
+    print(f"==================== YEAR {year} ===============================")
+    with metrics.step("read GIN") as s:
+        df, codebook = gemeente_metadata(config.gin_file(year), year)
+        s["rows_out"] = len(df)
+    write_codebook(codebook, extra_outputs(pipeline, year)[0])
+    return df
@@ -0,0 +1,101 @@
+"""
+Author: Eszter Bokanyi, e.bokanyi@liacs.leidenuniv.nl
+Last modified: 2026.10.18
+
+Household composition of the active nodes of a year, from the household components of stage 03.
+
+The households of stage 03 are the connected components of the household network. Component
+labels depend on the traversal order of scipy, so every household is identified by the smallest id
+of its active members instead (`household_id`), which only depends on the members. The composition
+columns are segment reductions over the household ids, with one `np.bincount` or `np.maximum.at`
+over all nodes per column:
+    * household_size: number of active members,
+    * household_children: number of active members younger than 18 (year - birth_year < 18),
+    * household_earners: number of active members with a positive gross income in INPATAB,
+    * household_max_educ_level: highest known education level (1-3) of the members, added in stage
+      08, where the education levels are joined.
+Active people without household edges (e.g. living in an institution, layer 402) form a household
+of their own. Inactive nodes have no household.
+"""
+
+import numpy as np
+import polars as pl
+
+from . import schema
+
+# education levels that can be compared, 9 is unknown
+EDUCATION_LEVELS = ["1", "2", "3"]
+
+
+def household_ids(components, active):
+    """Smallest id of the active members of the component of every node, -1 for inactive nodes."""
+    ids = np.arange(len(components))
+    first = np.full(components.max() + 1 if len(components) else 0, len(components))
+    np.minimum.at(first, components[active], ids[active])
+    return np.where(active, first[components], -1)
+
+
+def _series(name, values, household_id):
+    """Series of per-node values, null for nodes without a household."""
+    return pl.Series(name, values).set(pl.Series(household_id < 0), None).cast(schema.DTYPES[name])
+
+
+def segment_sum(household_id, weights):
+    """Sum of `weights` over the members of the household of every node."""
+    valid = household_id >= 0
+    sums = np.bincount(household_id[valid], weights=weights[valid], minlength=len(household_id))
+    return np.rint(sums[np.maximum(household_id, 0)]).astype(np.int64)
+
+
+def composition(nodes, components, is_earner, year):
+    """
+    Household id, size, children and earners of every node.
+
+    Parameters
+    ----------
+    nodes : polars DataFrame
+        Base nodes of the year (stage 02), ordered by id, with `label`, `active` and `birth_year`.
+    components : numpy array
+        Household component label of each node id.
+    is_earner : numpy array of bool
+        Whether each node has a positive gross income.
+    year : int
+
+    Returns
+    -------
+    polars DataFrame with `label`, `household_id`, `household_size`, `household_children` and
+    `household_earners`, null for inactive nodes
+    """
+    active = nodes["active"].fill_null(False).to_numpy()
+    household_id = household_ids(np.asarray(components), active)
+    child = ((year - nodes["birth_year"].cast(pl.Int32)) < 18).fill_null(False).to_numpy()
+    return pl.DataFrame([
+        nodes["label"],
+        _series("household_id", household_id, household_id),
+        _series("household_size", segment_sum(household_id, np.ones(len(household_id))), household_id),
+        _series("household_children", segment_sum(household_id, child.astype(np.float64)), household_id),
+        _series("household_earners", segment_sum(household_id, np.asarray(is_earner, dtype=np.float64)), household_id),
+    ])
+
+
+def max_educ_level(household_id, educ_level):
+    """
+    Highest known education level of the members of the household of every node.
+
+    Parameters
+    ----------
+    household_id, educ_level : polars Series
+        Columns of the node table of a year, in id order.
+
+    Returns
+    -------
+    polars Series `household_max_educ_level`, null without a household or a known level
+    """
+    hid = household_id.fill_null(-1).to_numpy().astype(np.int64)
+    level = educ_level.replace_strict(EDUCATION_LEVELS, [1, 2, 3], default=0, return_dtype=pl.Int8).fill_null(0).to_numpy()
+    valid = hid >= 0
+    best = np.zeros(len(hid), dtype=np.int8)
+    np.maximum.at(best, hid[valid], level[valid])
+    values = np.where(valid, best[np.maximum(hid, 0)], 0)
+    return (pl.Series("household_max_educ_level", values)
+        .replace_strict([0, 1, 2, 3], [None] + EDUCATION_LEVELS, return_dtype=pl.String))
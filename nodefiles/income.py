@@ -0,0 +1,422 @@
+"""
+Author: Eszter Bokanyi, e.bokanyi@liacs.leidenuniv.nl
+Last modified: 2026.10.18
+
+Stage 03: household and individual income and income percentiles (years 2011+).
+
+Households are the connected components of the household network (layer 401 of
+HUISGENOTENNETWERK), NOT the CBS economic main earner assignment and household construction.
+The components are kept as `household_id`, with the size, children and earners of every
+household, see `nodefiles.household`.
+
+Households without a main earner in the INHATAB of the year get household income -1, unless the
+income fallback of the pipeline is on, which takes their income from the INHATAB of the adjacent
+years, see `fallback_household_income`. `household_income_source_year` is the INHATAB year the
+household income comes from.
+"""
+
+import numpy as np
+import polars as pl
+
+from . import config, household, metrics, quality, schema, staging
+from .tableio import read_sav
+
+edgelist_rename_cols = {
+    "RINPERSOON" : "source",
+    "RINPERSOONRELATIE" : "target",
+    "RELATIE" : "layer"
+}
+
+INHATAB_COLUMNS = ["RINPERSOONHKW", "INHP100HGEST", "INHGESTINKH"]
+INPATAB_COLUMNS = ["RINPERSOON", "INPP100PBRUT", "INPBELI", "INPSECJ"]
+
+
+def read_household_edges(year):
+    """
+    Load household edges and filter for non-institutional households.
+
+    Layer 401 represents household members living together (see layers.csv),
+    layer 402 (institutional households) is excluded.
+    """
+    network_path, sep = config.household_network_file(year)
+    print(f"Loading household connections from {network_path}...")
+    with metrics.step("read HUISGENOTENNETWERK") as s:
+        edgelist = (
+            pl.read_csv(staging.local(network_path), separator=sep, has_header=True)
+                .select([pl.col(c) for c in edgelist_rename_cols])
+                .rename(edgelist_rename_cols)
+                .filter(pl.col("layer")==401) # Layer 401: non-institutional household members
+                .with_columns(
+                    pl.col("source").cast(schema.LABEL),
+                    pl.col("target").cast(schema.LABEL)
+                )
+        )
+        s["rows_out"] = edgelist.height
+    print(edgelist.head())
+    return edgelist
+
+
+def household_adjacency(edgelist, nodes):
+    """Symmetric sparse adjacency matrix of the household edges in the node id space."""
+    from scipy.sparse import csr_matrix
+
+    N = max(nodes["id"]) + 1
+    ids = nodes.select(pl.col("label"), pl.col("id"))
+    # convert to sparse edgelist
+    ij = (
+        edgelist
+            .join(ids, left_on="source", right_on="label", how="left").rename({"id":"i"})
+            .join(ids, left_on="target", right_on="label", how="left").rename({"id":"j"})
+            .filter(
+                (~pl.col("i").is_null()) &
+                (~pl.col("j").is_null())
+            )
+            .select(
+                pl.col("i"),
+                pl.col("j")
+            )
+    )
+    # force undirected connections
+    ij = pl.concat([
+        ij,
+        ij.rename({"i":"j", "j":"i"}).select(pl.col("i"), pl.col("j"))
+    ])
+    print(ij.head())
+
+    i = ij["i"].to_numpy()
+    j = ij["j"].to_numpy()
+
+    # create adjacency matrix
+    A = csr_matrix((np.ones(len(i)), (i, j)), shape=(N, N), dtype=np.uint64)
+    # if edges have accidentally been listed twice bc of symmetrization, drop
+    return csr_matrix(A > 0, dtype=np.uint64)
+
+
+def read_household_incomes(fn):
+    """Household income and percentile per main earner (RINPERSOONHKW) from INHATAB."""
+    print(f"Reading INHATAB file {fn}...")
+    with metrics.step("read INHATAB") as s:
+        household_incomes = read_sav(fn, usecols=INHATAB_COLUMNS).to_pandas()
+        s["rows_out"] = len(household_incomes)
+    household_incomes.columns = ["label_hkw", "income_value", "income_percentile"]
+    # Filter out invalid records:
+    # - Unknown income values are coded as very large numbers (>9.9999e9)
+    # - Institutional households have percentile <1
+    household_incomes = household_incomes[~((household_incomes["income_value"]>9.9999e9)|(household_incomes["income_percentile"]<1))]
+    print(household_incomes.head())
+    return household_incomes
+
+
+def read_individual_incomes(fn):
+    """Individual gross income, its percentile and socioeconomic situation from INPATAB."""
+    print(f"Reading INPATAB file {fn}...")
+    with metrics.step("read INPATAB") as s:
+        individual_incomes = read_sav(
+            fn, usecols=INPATAB_COLUMNS, transform=lambda df: df.with_columns(pl.col("RINPERSOON").cast(schema.LABEL))
+        ).to_pandas()
+        s["rows_out"] = len(individual_incomes)
+    individual_incomes.columns = ["label", "individual_income_gross", "individual_income_percentile", "socioeconomic_situation"]
+    print(individual_incomes.head())
+    return individual_incomes
+
+
+def percentile(s):
+    """Rank based percentiles (1-100) of the non-null values of a pandas Series."""
+    import pandas as pd
+
+    mask = s.notna()
+    n = mask.sum()
+    ranks = s[mask].rank(method="first")
+    p = pd.Series(index=s.index, dtype="Int64")
+    p.loc[mask] = (((ranks - 1) * 100 // n + 1).astype("Int64"))
+    return p
+
+
+def household_income(nodes, components, household_incomes):
+    """
+    Assign household income to every active node based on its household component.
+
+    Parameters
+    ----------
+    nodes : pandas DataFrame
+        Base nodes ordered by id, with `label` and `active`.
+    components : numpy array
+        Household component label of each node id.
+    household_incomes : pandas DataFrame
+        Output of `read_household_incomes`.
+
+    Returns
+    -------
+    pandas DataFrame with `label`, `household_component`, `is_hkw` and `income`
+    """
+    # label to income/percentile dicts
+    income_map = dict(zip(household_incomes["label_hkw"].map(int), household_incomes["income_value"]))
+    # set of main earners in households
+    hkw = set(household_incomes["label_hkw"].map(int))
+
+    nodes = nodes[["label", "active"]].copy()
+    # Add household component ID to each person
+    nodes["household_component"] = components
+    # Mark main earners (hoofdkostwinner - person with household income data)
+    nodes["is_hkw"] = nodes["label"].isin(hkw)
+
+    # Categorize households by number of main earners
+    # This is necessary because income assignment differs by earner count:
+    # - No earners: cannot assign income (temporal mismatch between network and income data)
+    # - Single earner: use that earner's income directly
+    # - Multiple earners: average their incomes
+    earner_count = (nodes
+        [nodes["active"]]
+        .groupby("household_component")
+        .agg({"is_hkw":"sum", "label": lambda x: list(x)}))
+
+    no_earner_households = earner_count.query("is_hkw==0")
+    single_earner_households = earner_count.query("is_hkw==1").copy()
+    multiple_earner_households = earner_count.query("is_hkw>=2").copy()
+
+    # Calculate and report the share of households without identified earners (likely due to
+    # temporal mismatch, network data and income data may be from slightly different time points)
+    # and with multiple earners (will use averaged income), see `nodefiles.quality`
+    n_households = len(earner_count)
+    quality.observe("no_earner_household_share", no_earner_households.shape[0] / n_households if n_households else 0.0)
+    quality.observe("multiple_earner_household_share", multiple_earner_households.shape[0] / n_households if n_households else 0.0)
+    print("Percentage of no earner households out of all households")
+    print(round(100*no_earner_households.shape[0]/n_households, 1) if n_households else 0.0)
+
+    # For households with multiple earners, calculate average income
+    # Average income across all identified earners in the household
+    multiple_earner_households["avg_income"] = \
+        multiple_earner_households["label"].map(lambda l: np.mean([income_map[elem] for elem in l if elem in income_map]))
+    # getting income for single earner households based on the data for the single earner
+    single_earner_households["income"] = \
+        single_earner_households["label"].map(lambda l: [income_map[elem] for elem in l if elem in income_map][0])
+
+    # Create mapping dictionaries: household component ID -> income/percentile
+    # Combines both single and multiple earner households
+    household_to_income = {
+        **dict(zip(single_earner_households.index, single_earner_households["income"])),
+        **dict(zip(multiple_earner_households.index, multiple_earner_households["avg_income"]))
+    }
+
+    # Apply household income to all members of each household
+    nodes["income"] = nodes["household_component"].map(lambda c: household_to_income.get(c, -1))
+
+    inactives = ~nodes["active"]
+    nodes["household_component"] = nodes["household_component"].astype("Int64")
+    nodes.loc[inactives, "household_component"] = None
+    nodes["income"] = nodes["income"].astype(float)
+    nodes.loc[inactives, "income"] = None
+    nodes["is_hkw"] = nodes["is_hkw"].astype("boolean")
+    nodes.loc[inactives, "is_hkw"] = None
+    return nodes
+
+
+def fallback_years(pipeline, year):
+    """Years of INHATAB the income fallback of `year` reads, none unless the pipeline has the income fallback on."""
+    if not pipeline.income_fallback:
+        return []
+    files = pipeline.inputs.inhatab_files()
+    distance = config.INCOME_FALLBACK_YEARS
+    return [y for y in range(year - distance, year + distance + 1) if y != year and y in files]
+
+
+def adjacent_household_incomes(pipeline, year):
+    """INHATAB of the `fallback_years` of `year` as a single polars DataFrame with a `year` column, None without them."""
+    years = fallback_years(pipeline, year)
+    if not years:
+        return None
+    return pl.concat([
+        pl.from_pandas(pipeline.inputs.household_incomes(y)[["label_hkw", "income_value"]])
+            .with_columns(pl.lit(y, dtype=pl.Int16).alias("year"))
+        for y in years
+    ])
+
+
+def fallback_household_income(households, adjacent_incomes, year):
+    """
+    Household income of the households without a main earner, from the main earners of adjacent years.
+
+    HUISGENOTENNETWERK and INHATAB do not describe the same moment, so some households have no
+    member that is a main earner (RINPERSOONHKW) in the INHATAB of `year`. Such a household gets the
+    income of its members that are main earners in the nearest other year of INHATAB, at most
+    `config.INCOME_FALLBACK_YEARS` away and the earlier year if both are equally near, averaged over
+    these members as for multiple earners. The members of all such households are matched to the main
+    earners of the adjacent years at once, with an as-of join by label backward and one forward in
+    time. Incomes of other years are taken as they are, without indexation.
+
+    Parameters
+    ----------
+    households : pandas DataFrame
+        Output of `household_income`.
+    adjacent_incomes : polars DataFrame or None
+        `label_hkw`, `income_value` and `year` of the INHATAB of the adjacent years, see
+        `adjacent_household_incomes`. Without it, no fallback is applied.
+    year : int
+
+    Returns
+    -------
+    (polars DataFrame with `label`, `household_income` and `household_income_source_year`, in the
+    order of `households`, the source year is null for households without income; number of
+    households with income from an adjacent year)
+    """
+    households = pl.from_pandas(households[["label", "active", "household_component", "income"]])
+    resolved = pl.DataFrame(
+        schema={"household_component": households["household_component"].dtype, "fallback_income": pl.Float64, "source_year": pl.Int16}
+    )
+    if adjacent_incomes is not None:
+        members = (households
+            .filter(pl.col("active") & (pl.col("income") == -1))
+            .select("label", "household_component", pl.lit(year, dtype=pl.Int16).alias("year"))
+        )
+        earners = (adjacent_incomes
+            .select(
+                pl.col("label_hkw").cast(schema.LABEL).alias("label"),
+                pl.col("year").alias("source_year"),
+                pl.col("income_value").cast(pl.Float64).alias("fallback_income"),
+            )
+            .sort("source_year")
+        )
+        # the nearest earlier and the nearest later year every member is a main earner in
+        matches = pl.concat([
+            members.join_asof(
+                earners, left_on="year", right_on="source_year", by="label", strategy=strategy,
+                tolerance=config.INCOME_FALLBACK_YEARS, allow_exact_matches=False, check_sortedness=False
+            )
+            for strategy in ("backward", "forward")
+        ]).drop_nulls("source_year")
+        resolved = (matches
+            .with_columns((pl.col("source_year") - year).abs().alias("distance"))
+            # nearest year of every household, the earlier one on ties
+            .filter(pl.col("source_year") == pl.col("source_year").sort_by(["distance", "source_year"]).first().over("household_component"))
+            .group_by("household_component")
+            .agg(pl.col("fallback_income").mean(), pl.col("source_year").first())
+        )
+        n_households = households.filter(pl.col("active"))["household_component"].n_unique()
+        quality.observe("fallback_household_share", resolved.height / n_households if n_households else 0.0)
+        print("Percentage of households with income from an adjacent year out of all households")
+        print(round(100*resolved.height/n_households, 1) if n_households else 0.0)
+
+    table = (households
+        .join(resolved, on="household_component", how="left", maintain_order="left")
+        .select(
+            "label",
+            pl.coalesce("fallback_income", "income").alias("household_income"),
+            pl.when(pl.col("source_year").is_not_null()).then(pl.col("source_year"))
+                .when(pl.col("income") != -1).then(pl.lit(year, dtype=pl.Int16))
+                .alias("household_income_source_year"),
+        )
+    )
+    return table, resolved.height
+
+
+def node_income(nodes, A, household_incomes, individual_incomes, year, adjacent_incomes=None):
+    """
+    Household and individual income and household composition of all nodes.
+
+    Parameters
+    ----------
+    nodes : polars DataFrame
+        Base nodes of the year (output of stage 02), ordered by id.
+    A : scipy sparse matrix
+        Household adjacency matrix from `household_adjacency`.
+    household_incomes, individual_incomes : pandas DataFrame
+        Outputs of `read_household_incomes` and `read_individual_incomes`.
+    year : int
+    adjacent_incomes : polars DataFrame, optional
+        INHATAB of the adjacent years for the income fallback, see `adjacent_household_incomes`.
+
+    Returns
+    -------
+    polars DataFrame with `label`, `household_income`, `household_income_source_year`,
+    `household_income_percentile`, `individual_income_gross`, `individual_income_percentile`,
+    `socioeconomic_situation` and the household columns of `household.composition`
+    """
+    from scipy.sparse.csgraph import connected_components
+
+    print("Getting connected components...")
+    # Use graph theory to identify households as connected components
+    # Each component represents one household unit
+    with metrics.step("connected components", rows_in=A.nnz) as s:
+        cc = connected_components(A.sign())
+        s["rows_out"] = cc[0]
+    print("Done.")
+
+    with metrics.step("household income", rows_in=len(household_incomes)) as s:
+        households = household_income(nodes.to_pandas(), cc[1], household_incomes)
+        s["rows_out"] = len(households)
+
+    with metrics.step("income fallback", rows_in=0 if adjacent_incomes is None else adjacent_incomes.height) as s:
+        fallback, s["rows_out"] = fallback_household_income(households, adjacent_incomes, year)
+
+    # Prepare output dataframe with household income columns
+    output = households[[
+        "label",
+        "income",
+    ]].rename(columns = {"income":"household_income"})
+    output["household_income"] = fallback["household_income"].to_numpy()
+    with metrics.step("income percentiles", rows_in=len(output)):
+        output["household_income_percentile"] = percentile(output["household_income"])
+
+    print("Joining individual income...")
+    with metrics.step("join income", rows_in=len(individual_incomes)) as s:
+        output = output.set_index("label").join(individual_incomes.set_index("label"), how="left")
+        output.reset_index(inplace=True)
+        s["rows_out"] = len(output)
+    with metrics.step("household composition", rows_in=nodes.height) as s:
+        # unknown incomes are coded as very large numbers, as in INHATAB
+        gross = individual_incomes["individual_income_gross"]
+        earners = individual_incomes.loc[(gross > 0) & (gross < 9.9999e9), "label"]
+        is_earner = nodes["label"].is_in(pl.Series(earners.to_numpy(), dtype=schema.LABEL)).to_numpy()
+        households = household.composition(nodes, cc[1], is_earner, year)
+        output = (pl.from_pandas(output)
+            .join(fallback.select("label", "household_income_source_year"), on="label", how="left", maintain_order="left")
+            .join(households, on="label", how="left", maintain_order="left")
+        )
+        s["rows_out"] = households["household_id"].n_unique() - 1
+    print(output.head())
+    print("Done.")
+    return output
+
+
+def sources(pipeline, year):
+    inputs = pipeline.inputs
+    return [
+        config.household_network_file(year)[0],
+        inputs.inhatab_files()[year],
+        inputs.inpatab_files()[year],
+        config.layers_file(pipeline.working_folder)
+    ] + [inputs.inhatab_files()[y] for y in fallback_years(pipeline, year)]
+
+
+def run(pipeline, year):
+    from mlnlib.mln import MultiLayerNetwork
+
+    inputs = pipeline.inputs
+    nodes = pipeline.result("base", year)
+    N = max(nodes["id"]) + 1
+    print(nodes.head())
+    print(N)
+
+    edgelist = read_household_edges(year)
+    with metrics.step("edge id join", rows_in=edgelist.height) as s:
+        A = household_adjacency(edgelist, nodes)
+        s["rows_out"] = A.nnz
+    del edgelist
+
+    # create network object
+    with metrics.step("build network"):
+        households = MultiLayerNetwork(
+            nodes = nodes,
+            edges = A,
+            layers = inputs.layers()
+        )
+    print(households)
+
+    return node_income(
+        nodes,
+        households.A,
+        inputs.household_incomes(year),
+        read_individual_incomes(inputs.inpatab_files()[year]),
+        year,
+        adjacent_household_incomes(pipeline, year)
+    )
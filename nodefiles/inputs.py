@@ -0,0 +1,196 @@
+"""
+Author: Eszter Bokanyi, e.bokanyi@liacs.leidenuniv.nl
+Last modified: 2026.10.18
+
+Memoized readers for inputs that are shared between stages or years.
+
+When every stage runs as its own process, each of them re-reads the merged node mapping,
+KINDOUDERTAB, the death records, the education reference tables and so on. A single
+`SharedInputs` object is created per driver run instead, and every shared input is
+read the first time it is asked for and kept in memory afterwards.
+"""
+
+import polars as pl
+
+from . import config, metrics, schema, staging
+from .tableio import read_csv_gz, read_sav
+
+KINDOUDERTAB_COLUMNS = ["RINPERSOONS", "RINPERSOON", "RINPERSOONSpa", "RINPERSOONSMa"]
+# KINDOUDERTAB columns of the parent labels, by parent
+PARENT_COLUMNS = {"mother": "Ma", "father": "pa"}
+
+
+class SharedInputs:
+    """Lazily loaded, in-memory cache of inputs shared between stages and years."""
+
+    def __init__(self, working_folder, start_year=None, end_year=None, budget=None):
+        self.working_folder = working_folder
+        self.start_year = start_year
+        self.end_year = end_year
+        # read the SPSS sources in chunks within this `tableio.MemoryBudget`, if given
+        self.budget = budget
+        self._cache = {}
+
+    def _memo(self, key, load):
+        if key not in self._cache:
+            self._cache[key] = load()
+        return self._cache[key]
+
+    def put(self, key, value):
+        """Register an already computed input, e.g. the merged mapping right after stage 01."""
+        self._cache[key] = value
+
+    def drop(self, key):
+        """Free an input that is not needed anymore."""
+        self._cache.pop(key, None)
+
+    def files_per_year(self):
+        return self._memo("files_per_year", lambda: config.load_files_per_year(self.working_folder))
+
+    def layers(self):
+        import pandas as pd
+
+        return self._memo(
+            "layers",
+            lambda: pd.read_csv(config.layers_file(self.working_folder), index_col=None, header=0)
+        )
+
+    def merged_mapping(self):
+        """All RINPERSOON labels between start_year and end_year encoded to integer ids."""
+        return self._memo(
+            "merged_mapping",
+            lambda: read_csv_gz(config.merged_mapping_file(self.working_folder, self.start_year, self.end_year))
+        )
+
+    def deaths(self):
+        """RINPERSOON and date of death from the latest GBAOVERLIJDENTAB."""
+        def load():
+            fn = config.overlijdentab_file()
+            print(f"Reading OVERLIJDENTAB from file name {fn}...")
+            with metrics.step("read OVERLIJDENTAB") as s:
+                df = read_sav(
+                    fn, usecols=["RINPERSOON", "GBADatumOverlijden"],
+                    transform=lambda df: df.with_columns(pl.col("RINPERSOON").cast(schema.LABEL)),
+                    budget=self.budget
+                )
+                s["rows_out"] = df.height
+            return df
+        return self._memo("deaths", load)
+
+    def parent_flags(self):
+        """Whether the mother and father of each person have ever been recorded in the GBA."""
+        def load():
+            print("Reading KINDOUDERTAB...")
+            with metrics.step("read KINDOUDERTAB") as s:
+                df = read_sav(
+                    config.kindoudertab_file(), usecols=KINDOUDERTAB_COLUMNS, transform=missing_parent_flags, budget=self.budget
+                )
+                s["rows_out"] = df.height
+            return df
+        return self._memo("parent_flags", load)
+
+    def parent_links(self):
+        """Child -> mother and child -> father sparse matrices in the id space of the merged mapping, see `parents.link_matrices`."""
+        from .parents import link_matrices
+
+        def load():
+            columns = ["RINPERSOONS", "RINPERSOON"] + [f"RINPERSOON{prefix}{suffix}" for suffix in PARENT_COLUMNS.values() for prefix in ("S", "")]
+            print("Reading parent links from KINDOUDERTAB...")
+            with metrics.step("read KINDOUDERTAB parents") as s:
+                labels = read_sav(config.kindoudertab_file(), usecols=columns, transform=parent_labels, budget=self.budget)
+                s["rows_out"] = labels.height
+            with metrics.step("parent link matrices", rows_in=labels.height):
+                return link_matrices(self.merged_mapping(), labels)
+        return self._memo("parent_links", load)
+
+    def education_conversion(self):
+        """OPLNRHB -> CTO -> OPLNIVSOI2016AGG4HB conversion table for years 2009-2012."""
+        def load():
+            with metrics.step("read education reference tables"):
+                return _read_education_conversion()
+        return self._memo("education_conversion", load)
+
+    def address_history(self):
+        """All registered addresses of all years from the most recent converted address file."""
+        def load():
+            fn = config.address_history_file()
+            print(f"Reading all addresses from {fn}...")
+            with metrics.step("read address history") as s:
+                df = pl.read_csv(staging.local(fn), separator=",")
+                s["rows_out"] = df.height
+            print(f"Done. Total number of records is {df.shape[0]}.")
+            return df
+        return self._memo("address_history", load)
+
+    def address_to_buurt(self, year):
+        """VSLGWBTAB address object to buurt code lookup for `year`."""
+        def load():
+            with metrics.step("read VSLGWBTAB") as s:
+                df = read_sav(
+                    config.vslgwbtab_file(), usecols=["SOORTOBJECTNUMMER", "RINOBJECTNUMMER", f"bc{year}"], budget=self.budget
+                )
+                s["rows_out"] = df.height
+            return df
+        return self._memo(("address_to_buurt", year), load)
+
+    def inpatab_files(self):
+        return self._memo("inpatab_files", lambda: config.income_files(config.INPATAB_FOLDER, "INPA"))
+
+    def inhatab_files(self):
+        return self._memo("inhatab_files", lambda: config.income_files(config.INHATAB_FOLDER, "INHA"))
+
+    def household_incomes(self, year):
+        """INHATAB of `year`, read once for the year itself and for the income fallback of the years around it."""
+        from .income import read_household_incomes
+
+        return self._memo(("household_incomes", year), lambda: read_household_incomes(self.inhatab_files()[year]))
+
+
+def missing_parent_flags(kindoudertab):
+    """`label`, `missing_mother` and `missing_father` of the persons in (a chunk of) KINDOUDERTAB."""
+    return (
+        kindoudertab
+        .filter(pl.col("RINPERSOONS")=="R")
+        .with_columns(
+            pl.col("RINPERSOON").cast(schema.LABEL).alias("label"),
+            pl.col("RINPERSOONSMa").map_elements(lambda x: 0 if x=="R" else 1, return_dtype=pl.Int8).alias("missing_mother"),
+            pl.col("RINPERSOONSpa").map_elements(lambda x: 0 if x=="R" else 1, return_dtype=pl.Int8).alias("missing_father")
+        )
+        .select(
+            pl.col("label"),
+            pl.col("missing_mother"),
+            pl.col("missing_father")
+        )
+    )
+
+
+def parent_labels(kindoudertab):
+    """`label`, `mother_label` and `father_label` of the persons in (a chunk of) KINDOUDERTAB, null if unknown."""
+    return (
+        kindoudertab
+        .filter(pl.col("RINPERSOONS")=="R")
+        .select(
+            pl.col("RINPERSOON").cast(schema.LABEL).alias("label"),
+            *[
+                pl.when(pl.col(f"RINPERSOONS{suffix}")=="R")
+                .then(pl.col(f"RINPERSOON{suffix}").cast(schema.LABEL, strict=False))
+                .alias(f"{parent}_label")
+                for parent, suffix in PARENT_COLUMNS.items()
+            ]
+        )
+    )
+
+
+def _read_education_conversion():
+    """OPLNRHB -> CTO -> OPLNIVSOI2016AGG4HB conversion table from the SSB reference files."""
+    import pyreadstat
+
+    fn_1, fn_2 = config.education_reference_files()
+    # First conversion: OPLNR to CTO (Centrale Toelatingsclassificatie Onderwijs)
+    conversion_df_1, _ = pyreadstat.read_sav(staging.local(fn_1), apply_value_formats=False, usecols=["OPLNR", "CTO2016V"])
+    conversion_df_1 = conversion_df_1.drop(0)  # Drop header row
+    conversion_df_1.columns = ["OPLNRHB_str", "CTO"]
+    # Second conversion: CTO to standardized education level
+    conversion_df_2, _ = pyreadstat.read_sav(staging.local(fn_2), usecols=["CTO", "OPLNIVSOI2016AGG4HB"])
+    # Merge conversion tables to create full mapping chain
+    return pl.from_pandas(conversion_df_1.merge(conversion_df_2, on="CTO", how="left"))
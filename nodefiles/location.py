@@ -0,0 +1,102 @@
+"""
+Author: Eszter Bokanyi, e.bokanyi@liacs.leidenuniv.nl
+Last modified: 2026.10.18
+
+Stage 05: buurt, wijk, and gemeente of the jan 1 address of nodes for a given year.
+
+Note, that buurt, wijk, and gemeente codes are selected for that given year, since
+delineations and coding might change from year to year. Thus, when joining with
+geographical data, the correct year's administrative delineations have to be chosen.
+"""
+
+import polars as pl
+
+from . import config, metrics, schema
+
+
+def addresses_on_jan1(nodes_address, year):
+    """Address registrations that are valid on jan 1 of `year`."""
+    print("Selecting people's addresses on jan 1...")
+    return nodes_address.filter(
+        (pl.col("GBADATUMEINDEADRESHOUDING").cast(pl.String) >= f"{year}0101") &
+        (pl.col("GBADATUMAANVANGADRESHOUDING").cast(pl.String) <= f"{year}0101")
+    )
+
+
+def location_codes(nodes_address, address_to_buurt, year):
+    """
+    Derive household change year, buurt code, wijk code, and gemeente code of each person.
+
+    Parameters
+    ----------
+    nodes_address : polars DataFrame
+        Output of `addresses_on_jan1`.
+    address_to_buurt : polars DataFrame
+        VSLGWBTAB with SOORTOBJECTNUMMER, RINOBJECTNUMMER and bc{year}.
+    year : int
+
+    Returns
+    -------
+    polars DataFrame with `label`, `household_change_year`, `gemeente_code`, `wijk_code` and `buurt_code`
+    """
+    print("Getting buurtcodes for selected jan 1 addresses...")
+    # object numbers are numeric in the SPSS lookup, but integers in the converted address CSV
+    keys = ["SOORTOBJECTNUMMER", "RINOBJECTNUMMER"]
+    address_to_buurt = address_to_buurt.with_columns(pl.col(k).cast(nodes_address.schema[k]) for k in keys)
+    print("Deriving household change year, buurt code, wijk code, and gemeente code...")
+    return (nodes_address
+        .join(address_to_buurt, on=keys, how="left")
+        .rename({f"bc{year}":"location_code"})
+        .with_columns(
+            pl.col("GBADATUMAANVANGADRESHOUDING").cast(pl.String).str.slice(0,4).cast(schema.DTYPES["household_change_year"]).alias("household_change_year"),
+            pl.col("location_code").map_elements(lambda s: str(s).zfill(8) if s!='NA' else None).alias("location_code")
+        )
+        .select(
+            pl.exclude(["RINPERSOONS", "GBADATUMAANVANGADRESHOUDING", "GBADATUMEINDEADRESHOUDING"])
+        )
+        .rename({
+            "RINPERSOON":"label"
+        })
+        .with_columns(pl.col("label").cast(schema.LABEL))
+        .with_columns(
+            pl.col("location_code").str.slice(0,4).alias("gemeente_code"),
+            pl.col("location_code").str.slice(0,6).alias("wijk_code"),
+            pl.col("location_code").str.slice(0,8).alias("buurt_code")
+        )
+        .with_columns(
+            pl.concat_str([pl.lit("GM"), pl.col("gemeente_code")]).alias("gemeente_code"),
+            pl.concat_str([pl.lit("WK"), pl.col("wijk_code")]).alias("wijk_code"),
+            pl.concat_str([pl.lit("BU"), pl.col("buurt_code")]).alias("buurt_code")
+        )
+        .select(
+            pl.exclude(["location_code", "SOORTOBJECTNUMMER", "RINOBJECTNUMMER", "GBAFUNCTIEADRES", "GBAAANGIFTEADRESHOUDING"])
+        )
+    )
+
+
+def sources(pipeline, year):
+    return [config.address_history_file(), config.vslgwbtab_file()]
+
+
+def run(pipeline, year):
+    print(f"YEAR {year}")
+    inputs = pipeline.inputs
+    if pipeline.budget is None:
+        address_history = inputs.address_history()
+        with metrics.step("filter jan 1 addresses", rows_in=address_history.height) as s:
+            nodes_address = addresses_on_jan1(address_history, year)
+            s["rows_out"] = nodes_address.height
+    else:
+        # stream the address history instead of keeping all years in memory
+        with metrics.step("filter jan 1 addresses") as s:
+            nodes_address = pipeline.budget.scan_csv(config.address_history_file(), lambda lf: addresses_on_jan1(lf, year))
+            s["rows_out"] = nodes_address.height
+    print("Reading address lookup file...")
+    address_to_buurt = inputs.address_to_buurt(year)
+    with metrics.step("join buurt codes", rows_in=nodes_address.height) as s:
+        nodes_address = location_codes(nodes_address, address_to_buurt, year)
+        s["rows_out"] = nodes_address.height
+    with pl.Config(tbl_cols = -1):
+        print(nodes_address.head())
+        print(nodes_address.count())
+    return nodes_address
@@ -0,0 +1,76 @@
+"""
+Author: Eszter Bokanyi, e.bokanyi@liacs.leidenuniv.nl
+Last modified: 2026.10.18
+
+Stage 01: union of all RINPERSOON ids that occur in the GBA files between start_year and end_year.
+
+This serves as the basis for node encoding for the longitudinal network files.
+"""
+
+import json
+
+import polars as pl
+
+from . import config, metrics, schema, staging
+
+
+def read_persons(year, files_per_year):
+    """RINPERSOON column of the CSV version of GBAPERSOONTAB of `year`."""
+    print("YEAR", year)
+    fn, kwargs = config.persoontab_csv_file(year, files_per_year)
+    print(f"Reading {fn}...")
+    print("kwargs")
+    print(json.dumps(kwargs, indent=4))
+    with metrics.step(f"read GBAPERSOONTAB {year}") as s:
+        node_df = pl.read_csv(staging.local(fn), columns=["RINPERSOON"], **kwargs)
+        s["rows_out"] = node_df.height
+    print("dataframe shape", node_df.shape)
+    return node_df["RINPERSOON"]
+
+
+def merged_node_mapping(labels_per_year):
+    """
+    Encode the union of labels to integer ids.
+
+    Labels get ids in order of the year they first appear in.
+
+    Parameters
+    ----------
+    labels_per_year : iterable of polars Series
+        RINPERSOON labels of each year, in year order.
+
+    Returns
+    -------
+    polars DataFrame with columns `id` (integer) and `label` (RINPERSOON)
+    """
+    node_set = set()
+    node_list = []
+    for labels in labels_per_year:
+        # merge nodes to set
+        new = set(labels).difference(node_set)
+        node_set.update(new)
+        node_list.extend(new)
+        print("length set", len(node_list))
+
+    # RINPERSOON to label, index to integer ID
+    return pl.DataFrame({
+        "id": pl.Series(range(len(node_list)), dtype=schema.DTYPES["id"]),
+        "label": pl.Series(node_list, dtype=schema.LABEL),
+    })
+
+
+def sources(pipeline, year=None):
+    files_per_year = pipeline.inputs.files_per_year()
+    # files_per_year.json also sets the separators and encodings the files are read with
+    return [config.files_per_year_file(pipeline.working_folder)] + [
+        config.persoontab_csv_file(y, files_per_year)[0] for y in range(pipeline.start_year, pipeline.end_year + 1)
+    ]
+
+
+def run(pipeline, year=None):
+    files_per_year = pipeline.inputs.files_per_year()
+    labels_per_year = [read_persons(y, files_per_year) for y in range(pipeline.start_year, pipeline.end_year + 1)]
+    with metrics.step("union", rows_in=sum(len(labels) for labels in labels_per_year)) as s:
+        merged_nodes = merged_node_mapping(labels_per_year)
+        s["rows_out"] = merged_nodes.height
+    return merged_nodes
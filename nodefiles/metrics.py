@@ -0,0 +1,319 @@
+"""
+Author: Eszter Bokanyi, e.bokanyi@liacs.leidenuniv.nl
+Last modified: 2026.10.18
+
+Per-step performance telemetry of the pipeline.
+
+Stages wrap their named steps ("read ADRESBUS", "connected components", "join income", ...) in
+`step`, which measures
+    * wall time and CPU time (all threads of the process),
+    * current and peak resident memory (the peak is the process high-water mark at the end of the step,
+      on Linux it is reset at the start of every stage, see `reset_peak`),
+    * bytes read and written by the process during the step,
+    * rows in and rows out, if the stage sets them on the step record.
+Records are printed as one line each and, while a run is active, appended to a JSON-lines file
+{working_folder}/metrics/metrics_{run_id}.jsonl, one file per run. `summary` compares runs.
+
+Memory and I/O counters come from the operating system: /proc and the resource module on Linux,
+psutil (if installed) elsewhere. Counters that are unavailable are recorded as null.
+"""
+
+import json
+import os
+import platform
+import re
+import socket
+import sys
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+_recorder = None
+_context = {}
+
+
+# ============================================================
+# Process counters
+# ============================================================
+
+def _psutil_process():
+    try:
+        import psutil
+    except ImportError:
+        return None
+    return psutil.Process()
+
+
+def memory():
+    """(current RSS, peak RSS) of this process in bytes, None where unknown."""
+    rss = peak = None
+    if sys.platform.startswith("linux"):
+        try:
+            with open("/proc/self/status") as f:
+                for line in f:
+                    if line.startswith("VmRSS:"):
+                        rss = int(line.split()[1]) * 1024
+                    elif line.startswith("VmHWM:"):
+                        peak = int(line.split()[1]) * 1024
+            return rss, peak
+        except OSError:
+            pass
+    process = _psutil_process()
+    if process is not None:
+        info = process.memory_info()
+        rss = info.rss
+        # peak working set on Windows
+        peak = getattr(info, "peak_wset", None)
+    if peak is None and sys.platform != "win32":
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # kilobytes on Linux, bytes on macOS
+        peak = peak if sys.platform == "darwin" else peak * 1024
+    return rss, peak
+
+
+def total_memory():
+    """Physical memory of the machine in bytes, None where unknown."""
+    if hasattr(os, "sysconf"):
+        try:
+            return os.sysconf("SC_PAGE_SIZE") * os.sysconf("SC_PHYS_PAGES")
+        except (ValueError, OSError):
+            pass
+    try:
+        import psutil
+    except ImportError:
+        return None
+    return psutil.virtual_memory().total
+
+
+def io_bytes():
+    """(bytes read, bytes written) by this process so far, including reads from network drives."""
+    if sys.platform.startswith("linux"):
+        try:
+            counters = {}
+            with open("/proc/self/io") as f:
+                for line in f:
+                    k, v = line.split(":")
+                    counters[k] = int(v)
+            return counters["rchar"], counters["wchar"]
+        except (OSError, KeyError):
+            pass
+    process = _psutil_process()
+    if process is not None and hasattr(process, "io_counters"):
+        counters = process.io_counters()
+        return counters.read_bytes, counters.write_bytes
+    return None, None
+
+
+def reset_peak():
+    """
+    Reset the peak resident memory of the process to its current resident memory, so that the peak
+    recorded by the next steps is their own. Only possible on Linux, elsewhere the peak remains the
+    high-water mark of the whole process.
+    """
+    if sys.platform.startswith("linux"):
+        try:
+            with open("/proc/self/clear_refs", "w") as f:
+                f.write("5")
+        except OSError:
+            pass
+
+
+def _diff(after, before):
+    return None if after is None or before is None else after - before
+
+
+# ============================================================
+# Recording
+# ============================================================
+
+class Recorder:
+    """Appends step records of one run to a JSON-lines file."""
+
+    def __init__(self, fn, run_id):
+        self.fn = fn
+        self.run_id = run_id
+        os.makedirs(os.path.dirname(fn), exist_ok=True)
+        self._f = open(fn, "a", encoding="utf-8")
+
+    def emit(self, record):
+        self._f.write(json.dumps(record) + "\n")
+        self._f.flush()
+
+    def close(self):
+        self._f.close()
+
+
+def metrics_folder(working_folder):
+    return os.path.join(working_folder, "metrics")
+
+
+@contextmanager
+def run(working_folder, run_id=None):
+    """
+    Record all steps inside the block into {working_folder}/metrics/metrics_{run_id}.jsonl.
+
+    If a run is already active, its file is reused, so a driver run and the stages it calls
+    share one file.
+    """
+    global _recorder
+    if _recorder is not None:
+        yield _recorder
+        return
+    if run_id is None:
+        run_id = f"{datetime.now().strftime('%Y-%m-%d_%H-%M-%S')}_{socket.gethostname()}_{os.getpid()}"
+    _recorder = Recorder(os.path.join(metrics_folder(working_folder), f"metrics_{run_id}.jsonl"), run_id)
+    try:
+        yield _recorder
+    finally:
+        _recorder.close()
+        _recorder = None
+
+
+@contextmanager
+def context(**kwargs):
+    """Attach fields (e.g. stage and year) to all steps recorded inside the block."""
+    global _context
+    previous = _context
+    _context = {**previous, **kwargs}
+    try:
+        yield
+    finally:
+        _context = previous
+
+
+@contextmanager
+def step(name, rows_in=None, rows_out=None):
+    """
+    Measure a named step.
+
+    The yielded dict is the record; set `rows_in`, `rows_out` or other fields on it inside the block.
+
+    Usage
+    -----
+        with metrics.step("read ADRESBUS") as s:
+            df = read_addresses(year)
+            s["rows_out"] = df.height
+    """
+    record = {
+        **_context,
+        "step": name,
+        "rows_in": rows_in,
+        "rows_out": rows_out,
+    }
+    read_before, written_before = io_bytes()
+    cpu_before = time.process_time()
+    wall_before = time.perf_counter()
+    record["start"] = datetime.now().isoformat(timespec="seconds")
+    try:
+        yield record
+    finally:
+        wall = time.perf_counter() - wall_before
+        cpu = time.process_time() - cpu_before
+        read_after, written_after = io_bytes()
+        rss, peak = memory()
+        record.update(
+            wall_s = round(wall, 3),
+            cpu_s = round(cpu, 3),
+            rss_bytes = rss,
+            peak_rss_bytes = peak,
+            bytes_read = _diff(read_after, read_before),
+            bytes_written = _diff(written_after, written_before),
+        )
+        if _recorder is not None:
+            record["run_id"] = _recorder.run_id
+            record["host"] = platform.node()
+            _recorder.emit(record)
+        print(format_record(record))
+
+
+def human_bytes(n):
+    if n is None:
+        return "-"
+    for unit in ["B", "KB", "MB", "GB"]:
+        if abs(n) < 1024:
+            return f"{n:.0f}{unit}"
+        n /= 1024
+    return f"{n:.1f}TB"
+
+
+def parse_bytes(size):
+    """Number of bytes in a size such as "16G", "512MB" or "1000000" (units are powers of 1024)."""
+    m = re.fullmatch(r"([0-9.]+)\s*([KMGT]?)B?", str(size).strip().upper())
+    if m is None:
+        raise ValueError(f"Invalid size {size!r}, expected e.g. 16G or 512M.")
+    number, unit = m.groups()
+    return int(float(number) * 1024 ** ("KMGT".index(unit) + 1 if unit else 0))
+
+
+def format_record(record):
+    where = " ".join(str(record[k]) for k in ("stage", "year") if record.get(k) is not None)
+    rows = ""
+    if record.get("rows_in") is not None or record.get("rows_out") is not None:
+        rows = f" rows {record.get('rows_in') if record.get('rows_in') is not None else '-'}->{record.get('rows_out') if record.get('rows_out') is not None else '-'}"
+    return (
+        f"\t[{where}] {record['step']}: {record['wall_s']:.1f}s wall, {record['cpu_s']:.1f}s cpu, "
+        f"peak {human_bytes(record['peak_rss_bytes'])}, read {human_bytes(record['bytes_read'])}, "
+        f"written {human_bytes(record['bytes_written'])}{rows}"
+    )
+
+
+# ============================================================
+# Comparing runs
+# ============================================================
+
+def load(fn):
+    with open(fn, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def runs(working_folder):
+    """Metrics files of all runs in a working folder, oldest first."""
+    folder = metrics_folder(working_folder)
+    if not os.path.isdir(folder):
+        return []
+    return sorted(os.path.join(folder, fn) for fn in os.listdir(folder) if fn.endswith(".jsonl"))
+
+
+def summary(files, metric="wall_s", by=("stage", "step")):
+    """
+    Table comparing runs: one row per `by` group, one column per run with `metric` summed over
+    years (maximum for peak memory), and the ratio of the last run to the first.
+
+    Returns
+    -------
+    (header, rows) with rows as lists of strings
+    """
+    aggregate = max if metric.startswith("peak") or metric == "rss_bytes" else sum
+    names = []
+    table = {}
+    for fn in files:
+        name = os.path.basename(fn)[len("metrics_"):-len(".jsonl")]
+        names.append(name)
+        for record in load(fn):
+            group = tuple(str(record.get(k, "")) for k in by)
+            value = record.get(metric)
+            if value is None:
+                continue
+            table.setdefault(group, {}).setdefault(name, []).append(value)
+
+    header = list(by) + names + (["last/first"] if len(names) > 1 else [])
+    rows = []
+    for group, values in table.items():
+        row = list(group)
+        per_run = [aggregate(values[n]) if n in values else None for n in names]
+        for v in per_run:
+            row.append("-" if v is None else (human_bytes(v) if metric.endswith("bytes") else f"{v:.1f}"))
+        if len(names) > 1:
+            first, last = per_run[0], per_run[-1]
+            row.append(f"{last/first:.2f}" if first and last is not None else "-")
+        rows.append(row)
+    return header, rows
+
+
+def format_table(header, rows):
+    widths = [max(len(str(x)) for x in col) for col in zip(header, *rows)] if rows else [len(h) for h in header]
+    lines = ["  ".join(str(x).ljust(w) for x, w in zip(header, widths))]
+    lines.append("  ".join("-" * w for w in widths))
+    lines.extend("  ".join(str(x).ljust(w) for x, w in zip(row, widths)) for row in rows)
+    return "\n".join(lines)
@@ -0,0 +1,314 @@
+"""
+Author: Eszter Bokanyi, e.bokanyi@liacs.leidenuniv.nl
+Last modified: 2026.10.18
+
+Microbenchmarks of the hot kernels of the pipeline, with stored baselines and a regression threshold.
+
+Every kernel is a stage function timed in isolation on the synthetic data of `nodefiles.synthetic`
+(generated once per scale, see `benchmark.prepare`). Its inputs are read and prepared with the
+stage functions themselves before timing starts:
+    * union:                 `merged.merged_node_mapping` over three years of GBAPERSOONTAB (01)
+    * active_population:     `base.active_population` on GBAADRESOBJECTBUS and the death records (02)
+    * edge_joins:            `income.household_adjacency`, household edge list to node ids (03)
+    * connected_components:  scipy `connected_components` of the household adjacency matrix (03)
+    * household_income:      `income.household_income`, income of each household component (03)
+    * percentiles:           `income.percentile` of the household incomes (03)
+    * household_composition: `household.composition`, size, children and earners of each household (03)
+    * date_window:           `location.addresses_on_jan1` on the address history (05)
+    * centroids:             `buurt.buurt_metadata`, centroids and reprojection (06)
+    * join_chain:            `combined.combined_nodes` (08)
+
+The best of `repeat` runs of each kernel is compared to the baseline stored for the same scale and
+year in {root}/microbench_baseline_{n_persons}_{year}.json, and a kernel fails if it is more than
+`threshold` times slower (and slower by more than NOISE_SECONDS). Baselines are only meaningful
+on the machine they were recorded on.
+
+Usage
+-----
+    python -m nodefiles microbench /data/benchmark --persons 1000000 --save-baseline
+    python -m nodefiles microbench /data/benchmark --persons 1000000 --threshold 1.2
+"""
+
+import json
+import os
+import platform
+import time
+from datetime import datetime
+from functools import cached_property
+
+from . import base, buurt, combined, config, education, gemeente, household, income, location, merged, metrics, synthetic
+from .benchmark import prepare
+from .pipeline import Pipeline
+
+# slowdowns smaller than this are measurement noise
+NOISE_SECONDS = 0.05
+
+KERNELS = {}
+
+
+def kernel(name):
+    """Register a kernel: a function of the `Fixtures` returning the call to time."""
+    def register(f):
+        KERNELS[name] = f
+        return f
+    return register
+
+
+class Fixtures:
+    """Inputs of the kernels for one year, read from the synthetic sources and computed once."""
+
+    def __init__(self, pipeline, year):
+        self.pipeline = pipeline
+        self.inputs = pipeline.inputs
+        self.year = year
+
+    @cached_property
+    def labels_per_year(self):
+        files_per_year = self.inputs.files_per_year()
+        return [merged.read_persons(y, files_per_year) for y in range(self.pipeline.start_year, self.pipeline.end_year + 1)]
+
+    @cached_property
+    def merged_nodes(self):
+        nodes = merged.merged_node_mapping(self.labels_per_year)
+        self.inputs.put("merged_mapping", nodes)
+        return nodes
+
+    @cached_property
+    def addresses(self):
+        return base.read_addresses(self.year)
+
+    @cached_property
+    def population(self):
+        return base.active_population(self.addresses, self.inputs.deaths(), self.year)
+
+    @cached_property
+    def nodes(self):
+        return base.base_nodes(self.merged_nodes, base.read_persons(self.year), self.population, self.inputs.parent_flags())
+
+    @cached_property
+    def household_edges(self):
+        return income.read_household_edges(self.year)
+
+    @cached_property
+    def adjacency(self):
+        return income.household_adjacency(self.household_edges, self.nodes)
+
+    @cached_property
+    def components(self):
+        from scipy.sparse.csgraph import connected_components
+
+        return connected_components(self.adjacency.sign())[1]
+
+    @cached_property
+    def household_incomes(self):
+        return income.read_household_incomes(self.inputs.inhatab_files()[self.year])
+
+    @cached_property
+    def nodes_income(self):
+        return income.node_income(
+            self.nodes, self.adjacency, self.household_incomes,
+            income.read_individual_incomes(self.inputs.inpatab_files()[self.year]), self.year
+        )
+
+    @cached_property
+    def address_history(self):
+        return self.inputs.address_history()
+
+    @cached_property
+    def buurten(self):
+        return buurt.read_buurten(self.year)
+
+    @cached_property
+    def combined_tables(self):
+        year = self.year
+        conversion = self.inputs.education_conversion() if year <= 2012 else None
+        nodes_location = location.location_codes(
+            location.addresses_on_jan1(self.address_history, year), self.inputs.address_to_buurt(year), year
+        )
+        return [
+            self.nodes,
+            self.nodes_income,
+            education.education_levels(education.read_education(year), year, conversion),
+            nodes_location,
+            buurt.buurt_metadata(self.buurten),
+            gemeente.gemeente_metadata(config.gin_file(year), year)[0],
+        ]
+
+
+@kernel("union")
+def _merged_union(f):
+    labels = f.labels_per_year
+    return lambda: merged.merged_node_mapping(labels)
+
+
+@kernel("active_population")
+def _active_population(f):
+    addresses, deaths = f.addresses, f.inputs.deaths()
+    return lambda: base.active_population(addresses, deaths, f.year)
+
+
+@kernel("edge_joins")
+def _household_edge_joins(f):
+    edges, nodes = f.household_edges, f.nodes
+    return lambda: income.household_adjacency(edges, nodes)
+
+
+@kernel("connected_components")
+def _connected_components(f):
+    from scipy.sparse.csgraph import connected_components
+
+    A = f.adjacency.sign()
+    return lambda: connected_components(A)
+
+
+@kernel("household_income")
+def _household_income(f):
+    nodes, components, household_incomes = f.nodes.to_pandas(), f.components, f.household_incomes
+    return lambda: income.household_income(nodes, components, household_incomes)
+
+
+@kernel("household_composition")
+def _household_composition(f):
+    nodes, components = f.nodes, f.components
+    is_earner = (f.nodes_income["individual_income_gross"] > 0).fill_null(False).to_numpy()
+    return lambda: household.composition(nodes, components, is_earner, f.year)
+
+
+@kernel("percentiles")
+def _income_percentiles(f):
+    incomes = f.nodes_income["household_income"].to_pandas()
+    return lambda: income.percentile(incomes)
+
+
+@kernel("date_window")
+def _jan1_address_filter(f):
+    address_history = f.address_history
+    return lambda: location.addresses_on_jan1(address_history, f.year)
+
+
+@kernel("centroids")
+def _buurt_centroids(f):
+    gdf = f.buurten
+    return lambda: buurt.buurt_metadata(gdf)
+
+
+@kernel("join_chain")
+def _combined_join_chain(f):
+    tables = f.combined_tables
+    return lambda: combined.combined_nodes(*tables)
+
+
+def time_kernel(call, repeat):
+    """Best wall time of `repeat` calls in seconds."""
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        call()
+        wall = time.perf_counter() - start
+        best = wall if best is None else min(best, wall)
+    return best
+
+
+def baseline_file(root, n_persons, year):
+    return os.path.join(root, f"microbench_baseline_{n_persons}_{year}.json")
+
+
+def load_baseline(fn):
+    if not os.path.exists(fn):
+        return None
+    with open(fn) as f:
+        return json.load(f)
+
+
+def save_baseline(fn, n_persons, year, timings):
+    """Store the timings as the baseline of this scale and year, keeping other kernels' baselines."""
+    baseline = load_baseline(fn)
+    if baseline is None or baseline["persons"] != n_persons or baseline["year"] != year:
+        baseline = dict(persons=n_persons, year=year, kernels={})
+    baseline.update(host=platform.node(), created=datetime.now().isoformat(timespec="seconds"))
+    baseline["kernels"].update(timings)
+    os.makedirs(os.path.dirname(os.path.abspath(fn)), exist_ok=True)
+    with open(fn, "w") as f:
+        json.dump(baseline, f, indent=4)
+
+
+def compare(timings, baseline, threshold):
+    """
+    Status of each kernel against the baseline.
+
+    Returns
+    -------
+    list of (kernel, seconds, baseline seconds or None, status), status is "ok", "slower" or "new"
+    """
+    rows = []
+    for name, seconds in timings.items():
+        reference = baseline["kernels"].get(name) if baseline is not None else None
+        if reference is None:
+            status = "new"
+        elif seconds > threshold * reference and seconds - reference > NOISE_SECONDS:
+            status = "slower"
+        else:
+            status = "ok"
+        rows.append((name, seconds, reference, status))
+    return rows
+
+
+def run(root, n_persons, year, kernels=None, repeat=3, threshold=1.25, baseline=None, save=False, seed=0):
+    """
+    Time the kernels on synthetic data of `n_persons` persons and compare them to the baseline.
+
+    Parameters
+    ----------
+    root : str
+        Folder of the synthetic sources (shared with `benchmark`) and of the baseline.
+    n_persons : int
+    year : int
+        Year the kernels are run for, the merged union covers year-2 to year.
+    kernels : list of str, optional
+        Names of the kernels to run, all of KERNELS by default.
+    repeat : int
+        Number of timed calls of each kernel, the best is kept.
+    threshold : float
+        A kernel fails if it is more than `threshold` times slower than its baseline.
+    baseline : str, optional
+        Baseline file, defaults to {root}/microbench_baseline_{n_persons}_{year}.json.
+    save : bool
+        Store the timings as the new baseline instead of comparing.
+    seed : int
+
+    Returns
+    -------
+    rows of `compare`
+    """
+    start_year, end_year = year - 2, year
+    sources, working_folder = prepare(root, n_persons, start_year, end_year, seed)
+    config.set_source_roots(**synthetic.source_roots(sources))
+    fixtures = Fixtures(Pipeline(working_folder, start_year, end_year), year)
+    baseline = baseline if baseline is not None else baseline_file(root, n_persons, year)
+
+    timings = {}
+    for name in (kernels if kernels else KERNELS):
+        print(f"==============================\n {name} \n==============================")
+        call = KERNELS[name](fixtures)
+        timings[name] = time_kernel(call, repeat)
+
+    if save:
+        save_baseline(baseline, n_persons, year, timings)
+        print(f"Baseline written to {baseline}")
+        rows = compare(timings, None, threshold)
+    else:
+        stored = load_baseline(baseline)
+        if stored is not None and (stored["persons"] != n_persons or stored["year"] != year):
+            print(f"Baseline {baseline} is for {stored['persons']} persons in {stored['year']}, not comparing.")
+            stored = None
+        rows = compare(timings, stored, threshold)
+
+    print(metrics.format_table(
+        ["kernel", "seconds", "baseline", "ratio", "status"],
+        [
+            [name, f"{seconds:.3f}", "-" if reference is None else f"{reference:.3f}",
+             "-" if not reference else f"{seconds / reference:.2f}", status]
+            for name, seconds, reference, status in rows
+        ]
+    ))
+    return rows
@@ -0,0 +1,214 @@
+"""
+Author: Eszter Bokanyi, e.bokanyi@liacs.leidenuniv.nl
+Last modified: 2026.10.18
+
+Stage 10: the network layers of a year as sparse matrices in the id space of the node files.
+
+Every network file of a year (one per group of layers.csv: household, family, neighbor, colleague
+and school) is read once with a streaming scan, which keeps the RINPERSOON, RELATIE and
+RINPERSOONRELATIE columns of the edges of the layers in layers.csv and resolves both labels to
+the ids of the merged mapping by joins, so that only (layer, i, j) integer triples are held in
+memory. Edges of people outside the merged mapping are dropped.
+
+For every layer of layers.csv, the adjacency matrix is written as a compressed scipy CSR matrix
+of N x N, with N the number of nodes of the merged mapping, so that row `id` is the node with that
+id in the node files:
+    {working_folder}/yearly_node_files/network_start_{start_year}_end_{end_year}_year_{year}/layer_{layer}.npz
+Edges are kept in the direction of the file, and an edge listed twice is stored once with value 1.
+
+The output table has one row per node with its number of edges in every layer (degree_{layer}) and
+`layers_present`, the sum of the `binary` codes (layers.csv) of the layers it has edges in. Degrees of
+layers whose network file does not exist for the year are null, and their matrices are empty.
+
+`adjacency` combines layers into one matrix whose values are the sums of the `binary` codes of the
+layers of each edge, the edge encoding of mlnlib:
+
+    from nodefiles.network import adjacency
+    from nodefiles.store import NodeStore
+
+    A = adjacency("/h/ODISSEI_portal_C", 2009, 2023, 2020, layers=[301, 304, 306])
+    mln = MultiLayerNetwork(nodes=NodeStore("/h/ODISSEI_portal_C", 2009, 2023).network_nodes(2020), edges=A, layers=layers)
+"""
+
+import os
+
+import numpy as np
+import polars as pl
+
+from . import config, metrics, schema, staging
+
+edge_columns = {
+    "RINPERSOON": "source",
+    "RELATIE": "layer",
+    "RINPERSOONRELATIE": "target",
+}
+
+
+def separator(fn):
+    """Separator of a network CSV, which is not the same in all years, from its header."""
+    with open(fn) as f:
+        header = f.readline()
+    return ";" if ";" in header else ","
+
+
+def read_edges(fn, mapping, layers):
+    """
+    Edges of the `layers` in a network file, in the id space of `mapping`.
+
+    Returns
+    -------
+    polars DataFrame with `layer`, `i` (id of RINPERSOON) and `j` (id of RINPERSOONRELATIE)
+    """
+    fn = staging.local(fn)
+    ids = mapping.lazy().select("label", "id")
+    return (pl.scan_csv(fn, separator=separator(fn))
+        .select([pl.col(c).alias(name) for c, name in edge_columns.items()])
+        .filter(pl.col("layer").is_in(layers))
+        .with_columns(
+            pl.col("source").cast(schema.LABEL),
+            pl.col("target").cast(schema.LABEL),
+            pl.col("layer").cast(pl.Int16),
+        )
+        .join(ids.rename({"label": "source", "id": "i"}), on="source", how="inner")
+        .join(ids.rename({"label": "target", "id": "j"}), on="target", how="inner")
+        .select("layer", "i", "j")
+        .collect(engine="streaming")
+    )
+
+
+def layer_matrices(edges, n, layers):
+    """N x N CSR adjacency matrix of every layer in `layers` from the (layer, i, j) `edges`."""
+    from scipy.sparse import csr_matrix
+
+    parts = {key[0]: part for key, part in edges.partition_by("layer", as_dict=True).items()}
+    matrices = {}
+    for layer in layers:
+        part = parts.get(layer)
+        i = part["i"].to_numpy() if part is not None else np.empty(0, dtype=np.int32)
+        j = part["j"].to_numpy() if part is not None else np.empty(0, dtype=np.int32)
+        A = csr_matrix((np.ones(len(i), dtype=np.int8), (i, j)), shape=(n, n))
+        # duplicate edges are summed by the conversion
+        A.data[:] = 1
+        matrices[layer] = A
+    return matrices
+
+
+def node_degrees(mapping, matrices, binary, missing=()):
+    """
+    Degree of every node in every layer and the bitmask of the layers it has edges in.
+
+    Parameters
+    ----------
+    mapping : polars DataFrame
+        Merged node mapping, in id order.
+    matrices : dict
+        Layer -> CSR matrix, see `layer_matrices`.
+    binary : dict
+        Layer -> `binary` code of the layer in layers.csv.
+    missing : iterable of int
+        Layers without a network file, their degrees are null.
+    """
+    present = np.zeros(mapping.height, dtype=np.int64)
+    degrees = []
+    for layer, A in matrices.items():
+        if layer in missing:
+            degrees.append(pl.Series(f"degree_{layer}", [None] * mapping.height, dtype=pl.Int32))
+            continue
+        degree = np.diff(A.indptr)
+        present |= np.where(degree > 0, binary[layer], 0)
+        degrees.append(pl.Series(f"degree_{layer}", degree))
+    return mapping.select("label", "id").hstack(degrees + [pl.Series("layers_present", present)])
+
+
+def save_matrix(A, fn):
+    from scipy.sparse import save_npz
+
+    os.makedirs(os.path.dirname(fn), exist_ok=True)
+    tmp = config.temporary_file(fn)
+    with open(tmp, "wb") as f:
+        save_npz(f, A, compressed=True)
+    os.replace(tmp, fn)
+
+
+def load_layer(working_folder, start_year, end_year, year, layer):
+    """CSR adjacency matrix of `layer` in `year`, written by this stage."""
+    from scipy.sparse import load_npz
+
+    return load_npz(config.network_layer_file(working_folder, start_year, end_year, year, layer)).tocsr()
+
+
+def adjacency(working_folder, start_year, end_year, year, layers=None, layers_file=None):
+    """
+    Adjacency matrix of several layers, with the sum of the `binary` codes of the layers of each edge as value.
+
+    Parameters
+    ----------
+    working_folder : str
+    start_year, end_year, year : int
+    layers : iterable of int, optional
+        Layer codes, all layers of layers.csv by default.
+    layers_file : str, optional
+        layers.csv, {working_folder}/src/layers.csv by default.
+    """
+    table = pl.read_csv(layers_file or config.layers_file(working_folder))
+    binary = dict(zip(table["layer"].to_list(), table["binary"].to_list()))
+    A = None
+    for layer in (binary if layers is None else layers):
+        L = load_layer(working_folder, start_year, end_year, year, layer).astype(np.int64) * binary[layer]
+        A = L if A is None else A + L
+    return A
+
+
+def groups(pipeline):
+    """Group of layers.csv -> its layer codes."""
+    layers = pipeline.inputs.layers()
+    return {group: layers.loc[layers["group"] == group, "layer"].tolist() for group in layers["group"].unique()}
+
+
+def sources(pipeline, year):
+    return [config.network_source_file(group, year) for group in groups(pipeline)] + [config.layers_file(pipeline.working_folder)]
+
+
+def extra_outputs(pipeline, year):
+    return [
+        config.network_layer_file(pipeline.output_folder, pipeline.start_year, pipeline.end_year, year, layer)
+        for layer in pipeline.inputs.layers()["layer"].tolist()
+    ]
+
+
+def run(pipeline, year):
+    print(f"YEAR {year}")
+    layers = pipeline.inputs.layers()
+    binary = dict(zip(layers["layer"].tolist(), layers["binary"].tolist()))
+    mapping = pipeline.inputs.merged_mapping().sort("id")
+    n = mapping.height
+
+    edges = []
+    missing = []
+    for group, codes in groups(pipeline).items():
+        fn = config.network_source_file(group, year)
+        if not os.path.exists(fn):
+            print(f"No {group} network for {year}: {fn} does not exist, degrees of layers {codes} are left empty.")
+            missing += codes
+            continue
+        print(f"Reading {fn}...")
+        with metrics.step(f"read {group} network") as s:
+            edges.append(read_edges(fn, mapping, codes))
+            s["rows_out"] = edges[-1].height
+    edges = pl.concat(edges) if edges else pl.DataFrame(schema={"layer": pl.Int16, "i": pl.Int32, "j": pl.Int32})
+
+    with metrics.step("layer matrices", rows_in=edges.height) as s:
+        matrices = layer_matrices(edges, n, list(binary))
+        s["rows_out"] = sum(A.nnz for A in matrices.values())
+    del edges
+    with metrics.step("write layer matrices"):
+        for layer, A in matrices.items():
+            save_matrix(A, config.network_layer_file(pipeline.output_folder, pipeline.start_year, pipeline.end_year, year, layer))
+    for layer, A in matrices.items():
+        if A.nnz:
+            print(f"\tlayer {layer}: {A.nnz} edges")
+
+    with metrics.step("degrees", rows_in=n) as s:
+        degrees = node_degrees(mapping, matrices, binary, missing)
+        s["rows_out"] = degrees.height
+    return degrees
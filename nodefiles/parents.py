@@ -0,0 +1,132 @@
+"""
+Author: Eszter Bokanyi, e.bokanyi@liacs.leidenuniv.nl
+Last modified: 2026.10.18
+
+Stage 11: attributes of the mother and father of every node of a year.
+
+The parent links of KINDOUDERTAB are encoded once per run (`SharedInputs.parent_links`) as two
+sparse N x N child -> parent matrices in the id space of the merged mapping, with a 1 in row `id` of
+the child and the column of the id of its mother (father). A row has at most one entry, and parents
+outside the merged mapping (e.g. died before start_year) are left out.
+
+For every year, the parental attributes are gathered from the combined node table of that year
+(stage 08) through the column indices of the matrices, one vectorized gather per column, instead of
+joining the node table to itself:
+    * mother_id and father_id,
+    * mother_educ_level and father_educ_level,
+    * mother_household_income_percentile and father_household_income_percentile,
+    * max_parent_income_percentile, the higher of the two household income percentiles,
+    * mother_buurt_code and father_buurt_code.
+Attributes of unknown parents are null, as are the income columns of years without income data.
+The table has one row per node in id order, like the node table, and its columns can be added to it
+with a horizontal concatenation or a join on `id`.
+"""
+
+import numpy as np
+import polars as pl
+
+from . import config, metrics, schema
+
+PARENTS = ["mother", "father"]
+# columns of the node table gathered for both parents
+PARENT_ATTRIBUTES = ["educ_level", "household_income_percentile", "buurt_code"]
+
+OUTPUT_COLUMNS = (
+    ["label", "id", "mother_id", "father_id"]
+    + [f"{parent}_{c}" for c in PARENT_ATTRIBUTES for parent in PARENTS]
+    + ["max_parent_income_percentile"]
+)
+
+
+def link_matrices(mapping, parent_labels):
+    """
+    Child -> parent CSR matrices in the id space of the merged mapping.
+
+    Parameters
+    ----------
+    mapping : polars DataFrame
+        Merged node mapping, `label` and `id`.
+    parent_labels : polars DataFrame
+        `label`, `mother_label` and `father_label` of KINDOUDERTAB, see `inputs.parent_labels`.
+
+    Returns
+    -------
+    dict of "mother" and "father" -> N x N scipy CSR matrix with at most one entry per row
+    """
+    from scipy.sparse import csr_matrix
+
+    n = mapping.height
+    ids = mapping.select("label", "id")
+    matrices = {}
+    for parent in PARENTS:
+        links = (parent_labels
+            .select("label", f"{parent}_label")
+            .drop_nulls()
+            .join(ids, on="label", how="inner")
+            .join(ids.rename({"label": f"{parent}_label", "id": "parent_id"}), on=f"{parent}_label", how="inner")
+            # KINDOUDERTAB has one row per child
+            .unique("id", keep="first")
+        )
+        matrices[parent] = csr_matrix(
+            (np.ones(links.height, dtype=np.int8), (links["id"].to_numpy(), links["parent_id"].to_numpy())), shape=(n, n)
+        )
+    return matrices
+
+
+def parent_ids(A):
+    """Id of the parent of every row of a child -> parent matrix, null if there is none."""
+    ids = np.full(A.shape[0], -1, dtype=np.int64)
+    ids[np.repeat(np.arange(A.shape[0]), np.diff(A.indptr))] = A.indices
+    return pl.Series(ids).set(pl.Series(ids < 0), None)
+
+
+def max_income_percentile():
+    """Expression of `max_parent_income_percentile`, the higher household income percentile of the parents."""
+    return pl.max_horizontal([f"{parent}_household_income_percentile" for parent in PARENTS]).alias("max_parent_income_percentile")
+
+
+def parent_attributes(nodes, matrices):
+    """
+    Attributes of the parents of every node.
+
+    Parameters
+    ----------
+    nodes : polars DataFrame
+        Combined node table of a year (stage 08), in id order.
+    matrices : dict
+        Child -> parent matrices, see `link_matrices`.
+
+    Returns
+    -------
+    polars DataFrame with OUTPUT_COLUMNS, one row per node in id order
+    """
+    if not nodes["id"].equals(pl.Series("id", range(nodes.height), dtype=nodes["id"].dtype)):
+        raise ValueError("The node table must have ids 0..N-1 in order.")
+    columns = [nodes["label"], nodes["id"]]
+    gathered = {}
+    for parent in PARENTS:
+        ids = parent_ids(matrices[parent])
+        columns.append(ids.alias(f"{parent}_id"))
+        for c in PARENT_ATTRIBUTES:
+            if c in nodes.columns:
+                gathered[f"{parent}_{c}"] = nodes[c].gather(ids).alias(f"{parent}_{c}")
+            else:
+                gathered[f"{parent}_{c}"] = pl.Series(f"{parent}_{c}", [None] * nodes.height, dtype=schema.DTYPES[c])
+    parents = pl.DataFrame(columns + list(gathered.values()))
+    return parents.with_columns(max_income_percentile()).select(OUTPUT_COLUMNS)
+
+
+def sources(pipeline, year):
+    return [config.kindoudertab_file()]
+
+
+def run(pipeline, year):
+    print(f"YEAR {year}")
+    matrices = pipeline.inputs.parent_links()
+    nodes = pipeline.result("combined", year)
+    with metrics.step("parent attributes", rows_in=nodes.height) as s:
+        parents = parent_attributes(nodes, matrices)
+        s["rows_out"] = parents.height
+    for parent in PARENTS:
+        print(f"\t{matrices[parent].nnz} nodes with a known {parent}")
+    return parents
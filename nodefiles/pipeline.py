@@ -0,0 +1,362 @@
+"""
+Author: Eszter Bokanyi, e.bokanyi@liacs.leidenuniv.nl
+Last modified: 2026.10.18
+
+Stage registry and the single-process driver of the pipeline.
+
+`Pipeline.run` processes a whole range of years in one Python process: shared inputs
+(merged mapping, KINDOUDERTAB, death records, reference tables, the address history)
+are read once, and the tables of a year are handed from stage to stage in memory.
+Every stage still writes its output to the working folder, so that the stage scripts
+can be run one by one as before, reading their upstream tables from disk.
+
+Stage modules are only imported when a stage is run for the first time, so heavy
+dependencies (scipy, mlnlib, geopandas) are not loaded unless they are needed.
+
+Stages whose inputs, code and parameters did not change since their output was written are
+skipped, see `nodefiles.cache`.
+
+With a memory budget (`max_memory`, or the NODEFILES_MAX_MEMORY environment variable for the
+stage scripts), the large sources of stages 02 and 05 are read in chunks within the budget, see
+`tableio.MemoryBudget`, and stage outputs are not kept in memory for the downstream stages.
+
+Every stage output is checked before it is written, see `nodefiles.quality`.
+
+With a staging size (`staging_size`, or the NODEFILES_STAGING_SIZE environment variable), `run`
+copies the sources of the next stages to a local staging folder in the background while the current
+stage computes, see `nodefiles.staging`.
+
+With the income fallback (`income_fallback`, or the NODEFILES_INCOME_FALLBACK environment variable),
+stage 03 also reads the INHATAB of the adjacent years, see `income.fallback_household_income`. Every
+INHATAB is read once per run and kept until the next years do not need it anymore.
+"""
+
+import importlib
+import os
+from contextlib import nullcontext
+from dataclasses import dataclass
+from typing import Callable, Optional, Tuple
+
+from . import config, metrics, quality, schema, staging
+from .cache import BuildCache, code_version, stage_key
+from .inputs import SharedInputs
+from .tableio import MemoryBudget, read_csv_gz, write_csv_gz
+
+
+@dataclass(frozen=True)
+class Stage:
+    """
+    A pipeline stage: the nodefiles module of the same name implements it as `run(pipeline, year)`,
+    and lists the source files it reads as `sources(pipeline, year)`. Files written next to the
+    output table are listed by the optional `extra_outputs(pipeline, year)`.
+
+    `output(working_folder, start_year, end_year, year)` returns the file the table is written to.
+    """
+    name: str
+    script: str
+    output: Callable
+    depends: Tuple[str, ...] = ()
+    per_year: bool = True
+    first_year: Optional[int] = None
+
+    def applies(self, year):
+        return self.first_year is None or year is None or year >= self.first_year
+
+
+STAGES = [
+    Stage(
+        "merged", "01_nodes_merged_nodelist.py",
+        lambda folder, start_year, end_year, year: config.merged_mapping_file(folder, start_year, end_year),
+        per_year=False
+    ),
+    Stage(
+        "base", "02_nodes_base_files.py",
+        config.base_file,
+        depends=("merged",)
+    ),
+    Stage(
+        "income", "03_nodes_income.py",
+        lambda folder, start_year, end_year, year: config.income_file(folder, year),
+        depends=("base",),
+        first_year=config.FIRST_INCOME_YEAR
+    ),
+    Stage(
+        "education", "04_nodes_education.py",
+        lambda folder, start_year, end_year, year: config.education_output_file(folder, year)
+    ),
+    Stage(
+        "location", "05_nodes_location.py",
+        lambda folder, start_year, end_year, year: config.location_file(folder, year)
+    ),
+    Stage(
+        "buurt", "06_buurt_metadata.py",
+        lambda folder, start_year, end_year, year: config.buurt_metadata_file(folder, year)
+    ),
+    Stage(
+        "gemeente", "07_gemeente_metadata.py",
+        lambda folder, start_year, end_year, year: config.gemeente_metadata_file(folder, year)
+    ),
+    Stage(
+        "combined", "08_combined_nodelists.py",
+        config.nodes_file,
+        depends=("base", "income", "education", "location", "buurt", "gemeente")
+    ),
+    Stage(
+        "context", "09_context_features.py",
+        config.context_file,
+        depends=("combined",)
+    ),
+    Stage(
+        "network", "10_network_layers.py",
+        config.network_degree_file,
+        depends=("merged",)
+    ),
+    Stage(
+        "parents", "11_parent_attributes.py",
+        config.parents_file,
+        depends=("merged", "combined")
+    ),
+]
+
+STAGES_BY_NAME = {s.name: s for s in STAGES}
+
+
+class Pipeline:
+    """
+    Driver running stages for a start_year-end_year node mapping.
+
+    Parameters
+    ----------
+    working_folder : str
+        Folder containing src/, temp/, codebook/ and yearly_node_files/.
+    start_year, end_year : int, optional
+        Year range of the merged node mapping, only needed by the stages depending on it.
+    output_folder : str, optional
+        Folder to write outputs to, defaults to working_folder.
+    force : bool
+        Rerun stages even if their cached output is up to date.
+    max_memory : int or str, optional
+        Memory budget in bytes or as a size such as "16G", defaults to NODEFILES_MAX_MEMORY if set.
+        Without a budget, sources are read as a whole.
+    staging_size : int or str, optional
+        Size of the local staging folder for prefetched sources in bytes or as a size such as "50G",
+        defaults to NODEFILES_STAGING_SIZE if set. Without it, `run` reads the sources in place.
+    staging_folder : str, optional
+        Local folder for the prefetched sources, defaults to NODEFILES_STAGING_FOLDER or a folder
+        in the temporary directory of the system.
+    income_fallback : bool, optional
+        Resolve the income of households without a main earner from the INHATAB of the adjacent
+        years, defaults to whether NODEFILES_INCOME_FALLBACK is set to a value other than 0.
+    """
+
+    def __init__(
+        self, working_folder, start_year=None, end_year=None, output_folder=None, force=False, max_memory=None,
+        staging_size=None, staging_folder=None, income_fallback=None
+    ):
+        self.working_folder = working_folder
+        self.output_folder = output_folder if output_folder is not None else working_folder
+        self.start_year = start_year
+        self.end_year = end_year
+        self.force = force
+        if max_memory is None:
+            max_memory = os.environ.get("NODEFILES_MAX_MEMORY") or None
+        self.budget = None
+        if max_memory is not None:
+            self.budget = MemoryBudget(metrics.parse_bytes(max_memory), config.spill_folder(self.output_folder))
+        if staging_size is None:
+            staging_size = os.environ.get("NODEFILES_STAGING_SIZE") or None
+        self.staging_size = None if staging_size is None else metrics.parse_bytes(staging_size)
+        self.staging_folder = staging_folder or os.environ.get("NODEFILES_STAGING_FOLDER") or config.staging_folder()
+        if income_fallback is None:
+            income_fallback = os.environ.get("NODEFILES_INCOME_FALLBACK", "0") not in ("", "0")
+        self.income_fallback = income_fallback
+        self.inputs = SharedInputs(working_folder, start_year, end_year, self.budget)
+        self.cache = BuildCache(self.output_folder)
+        self.thresholds = quality.load_thresholds(working_folder)
+        self._results = {}
+        self._keys = {}
+
+    def module(self, name):
+        return importlib.import_module(f".{name}", __package__)
+
+    def output(self, name, year=None, folder=None):
+        """File the output table of stage `name` is written to."""
+        stage = STAGES_BY_NAME[name]
+        folder = self.output_folder if folder is None else folder
+        return stage.output(folder, self.start_year, self.end_year, year)
+
+    def outputs(self, name, year=None):
+        """Output table of stage `name` followed by the other files it writes."""
+        module = self.module(name)
+        extra = module.extra_outputs(self, year) if hasattr(module, "extra_outputs") else []
+        return [self.output(name, year)] + extra
+
+    def uses_range(self, name):
+        """Whether the output of stage `name` depends on start_year and end_year via the merged mapping."""
+        stage = STAGES_BY_NAME[name]
+        return not stage.per_year or any(self.uses_range(d) for d in stage.depends)
+
+    def input_bytes(self, name, year=None):
+        """
+        Total size of the source files of stage `name` for `year`. For stages that only read upstream
+        outputs, the size of the sources of the upstream stages, as a measure of the scale of their input.
+        """
+        sources = self.module(name).sources(self, year)
+        if sources:
+            return sum(os.path.getsize(fn) for fn in sources if os.path.exists(fn))
+        return sum(self.input_bytes(d, year) for d in STAGES_BY_NAME[name].depends if STAGES_BY_NAME[d].applies(year))
+
+    def key(self, name, year=None):
+        """Cache key of the output of stage `name` for `year`, see `nodefiles.cache`."""
+        stage = STAGES_BY_NAME[name]
+        year = year if stage.per_year else None
+        if (name, year) not in self._keys:
+            params = {"year": year}
+            if self.uses_range(name):
+                params.update(start_year=self.start_year, end_year=self.end_year)
+            upstream = {
+                d: self.key(d, year) for d in stage.depends if STAGES_BY_NAME[d].applies(year)
+            }
+            module = self.module(name)
+            self._keys[(name, year)] = stage_key(
+                name, code_version(module), params, module.sources(self, year), upstream
+            )
+        return self._keys[(name, year)]
+
+    def result(self, name, year=None):
+        """Output table of stage `name`, from memory if it has been computed in this process, else from disk."""
+        key = (name, year if STAGES_BY_NAME[name].per_year else None)
+        if key not in self._results:
+            fn = self.output(name, year, folder=self.working_folder)
+            print(f"Reading {fn}...")
+            with metrics.step(f"read {name} output") as s:
+                self._results[key] = read_csv_gz(fn)
+                s["rows_out"] = len(self._results[key])
+        return self._results[key]
+
+    def run_stage(self, name, year=None):
+        """
+        Run a single stage, write its output and keep it in memory for the downstream stages.
+
+        If the cached output of the stage is up to date, the stage is skipped and None is returned;
+        downstream stages then read the output from disk.
+
+        Raises
+        ------
+        ValueError
+            If a data-quality check of the output failed (see `nodefiles.quality`). The report is
+            written and the table goes to `quality.rejected_file` instead of the outputs, which are
+            removed.
+        """
+        stage = STAGES_BY_NAME[name]
+        if not stage.applies(year):
+            print(f"Year {year} has no {name} data.")
+            return None
+        key = self.key(name, year)
+        outputs = self.outputs(name, year)
+        if not self.force and self.cache.is_fresh(key, outputs):
+            print(f"Skipping {name} {year if stage.per_year else ''}: {outputs[0]} is up to date (key {key}).")
+            return None
+        with metrics.run(self.output_folder), metrics.context(stage=name, year=year if stage.per_year else None):
+            metrics.reset_peak()
+            with metrics.step("stage total") as total, quality.collect() as observed:
+                # recorded for the run planner, see `nodefiles.plan`
+                total["input_bytes"] = self.input_bytes(name, year)
+                result = schema.enforce(self.module(name).run(self, year), name)
+                with metrics.step("quality checks", rows_in=len(result)):
+                    report = quality.check(
+                        self.output_folder, name, year if stage.per_year else None, result, observed, self.thresholds
+                    )
+                if report["failures"]:
+                    # files the stage wrote itself (e.g. parquet, layer matrices) and earlier outputs
+                    for fn in outputs:
+                        if os.path.isfile(fn):
+                            os.remove(fn)
+                    rejected = quality.rejected_file(self.output_folder, name, year if stage.per_year else None)
+                    print(f"Saving rejected results to {rejected}...")
+                    write_csv_gz(result, rejected)
+                else:
+                    print(f"Saving results to {outputs[0]}...")
+                    with metrics.step("write output", rows_in=len(result)):
+                        write_csv_gz(result, outputs[0])
+                    # a table rejected by an earlier run is outdated now
+                    rejected = quality.rejected_file(self.output_folder, name, year if stage.per_year else None)
+                    if os.path.exists(rejected):
+                        os.remove(rejected)
+                total["rows_out"] = len(result)
+        if self.budget is not None and (total["peak_rss_bytes"] or 0) > self.budget.max_memory:
+            print(f"WARNING: peak memory of {name} was {metrics.human_bytes(total['peak_rss_bytes'])}, "
+                  f"over the budget of {metrics.human_bytes(self.budget.max_memory)}.")
+        if report["failures"]:
+            raise ValueError(
+                f"{len(report['failures'])} data-quality checks of {name} {year if stage.per_year else ''} failed, "
+                f"see {quality.report_file(self.output_folder, name, year if stage.per_year else None)}, "
+                f"the table is in {quality.rejected_file(self.output_folder, name, year if stage.per_year else None)}."
+            )
+        self.cache.record(name, year if stage.per_year else None, key, outputs)
+        if self.budget is None:
+            self._results[(name, year if stage.per_year else None)] = result
+        if name == "merged":
+            self.inputs.put("merged_mapping", result)
+        return result
+
+    def release(self, year):
+        """Free all tables and inputs that belong to `year` only."""
+        for key in [k for k in self._results if k[1] == year]:
+            del self._results[key]
+        self.inputs.drop(("address_to_buurt", year))
+        # the INHATAB of `year` is still read by the income fallback of the next years
+        self.inputs.drop(("household_incomes", year - (config.INCOME_FALLBACK_YEARS if self.income_fallback else 0)))
+
+    def prefetch(self, prefetcher, name, year=None):
+        """Schedule the sources of stage `name` for `year` for staging, unless its cached output is up to date."""
+        stage = STAGES_BY_NAME[name]
+        if not stage.applies(year):
+            return
+        if not self.force and self.cache.is_fresh(self.key(name, year), self.outputs(name, year)):
+            return
+        working_folder = os.path.abspath(self.working_folder)
+        files = [
+            fn for fn in self.module(name).sources(self, year)
+            if not os.path.abspath(fn).startswith(working_folder + os.sep)
+        ]
+        prefetcher.schedule((name, year), files)
+
+    def run(self, years=None):
+        """Run all stages, the merged mapping once and then every other stage for every year."""
+        if years is None:
+            years = range(self.start_year, self.end_year + 1)
+        for folder in (config.temp_folder, config.codebook_folder, config.yearly_node_folder):
+            os.makedirs(folder(self.output_folder), exist_ok=True)
+
+        # stages in the order they are run, the sources of the next LOOKAHEAD are staged
+        plan = [("merged", None)] + [(stage.name, year) for year in years for stage in STAGES if stage.per_year]
+        prefetcher = None
+        if self.staging_size is not None:
+            prefetcher = staging.Prefetcher(self.staging_folder, self.staging_size)
+
+        def run_planned(i):
+            name, year = plan[i]
+            if prefetcher is not None:
+                for ahead in plan[i:i + staging.LOOKAHEAD]:
+                    self.prefetch(prefetcher, *ahead)
+            self.run_stage(name, year)
+            if prefetcher is not None:
+                prefetcher.release((name, year))
+
+        with metrics.run(self.output_folder) as recorder, prefetcher if prefetcher is not None else nullcontext():
+            print(f"Recording metrics to {recorder.fn}")
+            if prefetcher is not None:
+                print(f"Staging sources in {self.staging_folder} (up to {metrics.human_bytes(self.staging_size)})")
+            print("==============================\n 01 Creating population. \n==============================")
+            run_planned(0)
+            i = 1
+            for year in years:
+                print(f"==============================\n YEAR {year} \n==============================")
+                for stage in STAGES:
+                    if stage.per_year:
+                        print(f"==============================\n {stage.script} \n==============================")
+                        run_planned(i)
+                        i += 1
+                self.release(year)
+
@@ -0,0 +1,202 @@
+"""
+Author: Eszter Bokanyi, e.bokanyi@liacs.leidenuniv.nl
+Last modified: 2026.10.18
+
+Run planner: expected runtime and peak memory of every stage before a run is started.
+
+The estimate of a stage is a function of the total size of its source files (`sources`; stages that
+only read upstream outputs use the size of the upstream sources), fitted per stage to the
+"stage total" records of earlier runs in {working_folder}/metrics/:
+    * with records at two or more input sizes, a least squares line a + b * size,
+    * with records at one input size, the observed time and memory per byte,
+    * without records, DEFAULT_SECONDS_PER_GB and DEFAULT_MEMORY_FACTOR, which are rough.
+The number of rows of the SPSS sources is read from their metadata and listed next to the sizes.
+No data is read, so planning takes seconds. Stages whose cached output is up to date are listed
+as cached and cost nothing.
+
+The schedule is the order of `Pipeline.run`. Stages whose expected peak memory exceeds the memory
+of the machine are flagged, and the number of year ranges that fit into memory next to each other
+is suggested as concurrency level.
+
+Usage
+-----
+    python -m nodefiles plan 2009 2023 /h/ODISSEI_portal_C
+    python -m nodefiles plan 2009 2023 /h/ODISSEI_portal_C --memory 64G --json plan.json
+"""
+
+import json
+import os
+
+from . import metrics
+from .pipeline import STAGES, STAGES_BY_NAME, Pipeline
+
+DEFAULT_SECONDS_PER_GB = 120
+# peak memory per byte of input, SPSS and CSV sources take several times their size in memory
+DEFAULT_MEMORY_FACTOR = 4
+
+
+def source_rows(files):
+    """Total number of rows of the SPSS files among `files`, from their metadata, or None."""
+    import pyreadstat
+
+    rows = None
+    for fn in files:
+        if fn.lower().endswith(".sav") and os.path.exists(fn):
+            rows = (rows or 0) + pyreadstat.read_sav(fn, metadataonly=True)[1].number_rows
+    return rows
+
+
+def history(working_folder):
+    """(stage, year, input bytes, wall seconds, peak bytes) of the "stage total" records of earlier runs."""
+    records = []
+    for fn in metrics.runs(working_folder):
+        for record in metrics.load(fn):
+            if record.get("step") == "stage total" and record.get("input_bytes"):
+                records.append((record["stage"], record.get("year"), record["input_bytes"], record["wall_s"], record["peak_rss_bytes"]))
+    return records
+
+
+def fit(points):
+    """
+    Function of the input size fitted to (size, value) points, and its basis.
+
+    A least squares line if there are points at two or more sizes and its slope is not negative,
+    else the mean value per byte.
+    """
+    points = [(x, y) for x, y in points if y is not None]
+    if not points:
+        return None, None
+    xs = {x for x, _ in points}
+    if len(xs) >= 2:
+        n = len(points)
+        mean_x = sum(x for x, _ in points) / n
+        mean_y = sum(y for _, y in points) / n
+        slope = sum((x - mean_x) * (y - mean_y) for x, y in points) / sum((x - mean_x) ** 2 for x, _ in points)
+        if slope >= 0:
+            intercept = mean_y - slope * mean_x
+            return (lambda x: max(intercept + slope * x, 0.0)), f"fit of {n} records"
+    ratio = sum(y / x for x, y in points) / len(points)
+    return (lambda x: ratio * x), f"ratio of {len(points)} records"
+
+
+class Planner:
+    """Estimates of the stages of `pipeline`, fitted to the metrics of earlier runs in its output folder."""
+
+    def __init__(self, pipeline):
+        self.pipeline = pipeline
+        records = history(pipeline.output_folder)
+        self.models = {}
+        for stage in STAGES:
+            points = [(x, wall, peak) for name, _, x, wall, peak in records if name == stage.name]
+            self.models[stage.name] = (
+                fit([(x, wall) for x, wall, _ in points]),
+                fit([(x, peak) for x, _, peak in points]),
+            )
+
+    def estimate(self, name, year=None):
+        """(input bytes, rows, seconds, peak bytes, basis) of stage `name` for `year`."""
+        pipeline = self.pipeline
+        size = pipeline.input_bytes(name, year)
+        rows = source_rows(pipeline.module(name).sources(pipeline, year))
+        (time_model, time_basis), (memory_model, _) = self.models[name]
+        if time_model is None:
+            seconds = DEFAULT_SECONDS_PER_GB * size / 1024 ** 3
+            peak = DEFAULT_MEMORY_FACTOR * size
+            basis = "default"
+        else:
+            seconds = time_model(size)
+            peak = memory_model(size) if memory_model is not None else DEFAULT_MEMORY_FACTOR * size
+            basis = time_basis
+        return size, rows, seconds, peak, basis
+
+    def plan(self, years=None):
+        """
+        Expected schedule of `Pipeline.run(years)`.
+
+        Returns
+        -------
+        list of dicts with stage, year, status, input_bytes, rows, seconds, peak_bytes, basis and
+        start (expected seconds since the start of the run)
+        """
+        pipeline = self.pipeline
+        if years is None:
+            years = range(pipeline.start_year, pipeline.end_year + 1)
+        schedule = [("merged", None)] + [(s.name, y) for y in years for s in STAGES if s.per_year]
+        rows = []
+        start = 0.0
+        for name, year in schedule:
+            stage = STAGES_BY_NAME[name]
+            row = dict(stage=name, year=year, status="run", input_bytes=None, rows=None, seconds=0.0, peak_bytes=None, basis="-", start=start)
+            if not stage.applies(year):
+                row["status"] = "no data"
+            elif not pipeline.force and pipeline.cache.is_fresh(pipeline.key(name, year), pipeline.outputs(name, year)):
+                row["status"] = "cached"
+            else:
+                size, n_rows, seconds, peak, basis = self.estimate(name, year)
+                row.update(input_bytes=size, rows=n_rows, seconds=seconds, peak_bytes=peak, basis=basis)
+                start += seconds
+            rows.append(row)
+        return rows
+
+
+def format_seconds(seconds):
+    if seconds < 60:
+        return f"{seconds:.0f}s"
+    if seconds < 3600:
+        return f"{seconds / 60:.0f}m"
+    return f"{seconds / 3600:.1f}h"
+
+
+def run(working_folder, start_year, end_year, years=None, memory=None, output=None, force=False):
+    """
+    Print the expected schedule of a run and flag stages that do not fit into `memory`.
+
+    Parameters
+    ----------
+    working_folder : str
+    start_year, end_year : int
+    years : iterable of int, optional
+        Years of the run, start_year-end_year by default.
+    memory : int or str, optional
+        Memory available to the run, e.g. "64G", the physical memory of this machine by default.
+    output : str, optional
+        JSON file to write the schedule to.
+    force : bool
+        Plan a run with --force, i.e. without skipping cached stages.
+
+    Returns
+    -------
+    rows of `Planner.plan`
+    """
+    pipeline = Pipeline(working_folder, start_year, end_year, force=force)
+    available = metrics.parse_bytes(memory) if memory is not None else metrics.total_memory()
+    rows = Planner(pipeline).plan(years)
+
+    table = []
+    for row in rows:
+        over = available is not None and row["peak_bytes"] is not None and row["peak_bytes"] > available
+        table.append([
+            row["stage"], "-" if row["year"] is None else row["year"], row["status"],
+            metrics.human_bytes(row["input_bytes"]), "-" if row["rows"] is None else row["rows"],
+            format_seconds(row["start"]), format_seconds(row["seconds"]), metrics.human_bytes(row["peak_bytes"]),
+            row["basis"], "OVER MEMORY" if over else "",
+        ])
+    print(metrics.format_table(["stage", "year", "status", "input", "rows", "starts", "time", "peak", "basis", ""], table))
+
+    total = sum(row["seconds"] for row in rows)
+    peaks = [row["peak_bytes"] for row in rows if row["peak_bytes"] is not None]
+    print(f"\nExpected total time {format_seconds(total)}, largest peak memory {metrics.human_bytes(max(peaks) if peaks else None)}, "
+          f"available memory {metrics.human_bytes(available)}.")
+    if available is not None and peaks:
+        over = [f"{row['stage']} {row['year']}" for row in rows if row["peak_bytes"] is not None and row["peak_bytes"] > available]
+        if over:
+            print(f"WARNING: {len(over)} stages are expected to run out of memory: {', '.join(over)}. "
+                  "Use --max-memory for stages 02 and 05, or a machine with more memory.")
+        else:
+            print(f"Suggested concurrency: {max(1, int(available // max(peaks)))} processes with separate year ranges fit into memory.")
+
+    if output is not None:
+        with open(output, "w") as f:
+            json.dump(dict(available_memory=available, stages=rows), f, indent=4)
+        print(f"Plan written to {output}")
+    return rows
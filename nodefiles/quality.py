@@ -0,0 +1,179 @@
+"""
+Author: Eszter Bokanyi, e.bokanyi@liacs.leidenuniv.nl
+Last modified: 2026.10.18
+
+Data-quality checks of every stage output, computed right before the output is written.
+
+The checks are not part of the writer's batches. They are a separate polars query over the table
+the stage returned, which is in memory anyway, so they cost one vectorized pass over its columns,
+little next to compressing the CSV. For every table a stage writes, `check` computes in that query
+    * rows, and active rows if the table has an `active` column,
+    * null_rate.{column}: share of null values of every column,
+    * completeness.{column}: share of active rows with a value, and inactive_filled.{column}: share
+      of inactive rows with a value, for tables with an `active` column,
+    * percentile_uniformity.{column}: largest deviation of the share of a decile from 0.1 among the
+      non-null values of every *_percentile column (0 for perfectly uniform percentiles),
+and compares it to the report of the previous year of the same stage:
+    * yoy.rows and yoy.active: relative change of the number of (active) rows.
+Stages add checks only they can compute with `observe`, e.g. the share of households without a main
+earner in stage 03, from tables they build anyway.
+
+The checks are written to {working_folder}/quality/quality_{stage}_{year}.json. A check fails if
+its value is outside the bounds in THRESHOLDS, which can be changed in the optional file
+{working_folder}/src/quality_thresholds.json (same format, `null` disables a check). Check names
+in thresholds may contain wildcards, e.g. "completeness.*". If a check failed, the pipeline writes
+the report, but not the output: the table goes to {working_folder}/quality/rejected_{stage}_{year}.csv.gz
+for inspection, earlier outputs of the stage are removed, so that nothing downstream reads a table
+that did not pass, and an error is raised. Checks whose bounds have "warn": true (e.g. of variables
+taken over from CBS as they are) are only reported as warnings when they are out of bounds.
+"""
+
+import fnmatch
+import json
+import os
+from contextlib import contextmanager
+from datetime import datetime
+
+import polars as pl
+
+from . import config
+
+# check name (wildcards allowed) -> bounds of its value
+THRESHOLDS = {
+    "null_rate.label": {"max": 0.0},
+    "null_rate.id": {"max": 0.0},
+    "completeness.gender": {"min": 0.99},
+    "completeness.birth_year": {"min": 0.99},
+    # percentiles of the parents (stage 11) are not uniform over the children
+    "percentile_uniformity.household_income_percentile": {"max": 0.01},
+    # INPATAB's own percentile, of a different population and with codes for no or negative income
+    "percentile_uniformity.individual_income_percentile": {"max": 0.01, "warn": True},
+    "no_earner_household_share": {"max": 0.25},
+    "yoy.active": {"min": -0.05, "max": 0.05},
+}
+
+_observed = None
+
+
+@contextmanager
+def collect():
+    """Collect the checks stages `observe` inside the block into the yielded dict."""
+    global _observed
+    previous = _observed
+    _observed = {}
+    try:
+        yield _observed
+    finally:
+        _observed = previous
+
+
+def observe(name, value):
+    """Add a check computed by a stage to the report of its output, if one is being collected."""
+    if _observed is not None:
+        _observed[name] = value
+
+
+def report_file(working_folder, stage, year=None):
+    suffix = "" if year is None else f"_{year}"
+    return os.path.join(config.quality_folder(working_folder), f"quality_{stage}{suffix}.json")
+
+
+def rejected_file(working_folder, stage, year=None):
+    """Where a stage output that failed its checks is written instead of its output file."""
+    suffix = "" if year is None else f"_{year}"
+    return os.path.join(config.quality_folder(working_folder), f"rejected_{stage}{suffix}.csv.gz")
+
+
+def load_thresholds(working_folder):
+    """THRESHOLDS, updated with {working_folder}/src/quality_thresholds.json if it exists."""
+    thresholds = dict(THRESHOLDS)
+    fn = config.quality_thresholds_file(working_folder)
+    if os.path.exists(fn):
+        with open(fn) as f:
+            thresholds.update(json.load(f))
+    return {name: bounds for name, bounds in thresholds.items() if bounds is not None}
+
+
+def summary(df):
+    """Row counts, null rates, completeness and percentile uniformity of a polars DataFrame."""
+    expressions = [pl.len().alias("rows")]
+    has_active = "active" in df.columns
+    if has_active:
+        active = pl.col("active").fill_null(False)
+        expressions.append(active.sum().alias("active"))
+    for c in df.columns:
+        expressions.append(pl.col(c).is_null().mean().alias(f"null_rate.{c}"))
+        if has_active and c not in ("label", "id", "active"):
+            filled = pl.col(c).is_not_null()
+            expressions.append(filled.filter(active).mean().alias(f"completeness.{c}"))
+            expressions.append(filled.filter(~active).mean().alias(f"inactive_filled.{c}"))
+        if c.endswith("_percentile"):
+            decile = (pl.col(c).drop_nulls().cast(pl.Int32) - 1) // 10
+            shares = decile.value_counts(normalize=True).struct.field("proportion")
+            expressions.append((shares - 0.1).abs().max().alias(f"percentile_uniformity.{c}"))
+    row = df.select(expressions).row(0, named=True)
+    return {name: value for name, value in row.items() if value is not None}
+
+
+def failures(checks, thresholds):
+    """Checks whose value is outside their bounds, as a list of dicts with check, value and bounds."""
+    failed = []
+    for pattern, bounds in thresholds.items():
+        for name, value in checks.items():
+            if not fnmatch.fnmatchcase(name, pattern):
+                continue
+            if ("min" in bounds and value < bounds["min"]) or ("max" in bounds and value > bounds["max"]):
+                failed.append(dict(check=name, value=value, **bounds))
+    return failed
+
+
+def check(working_folder, stage, year, df, observed=None, thresholds=THRESHOLDS):
+    """
+    Compute the checks of a stage output, write its report and return it.
+
+    Parameters
+    ----------
+    working_folder : str
+    stage : str
+    year : int or None
+    df : polars DataFrame
+        Stage output, with the dtypes of `schema.DTYPES`.
+    observed : dict, optional
+        Checks added by the stage with `observe`.
+    thresholds : dict
+        Bounds of the checks, see `load_thresholds`.
+
+    Returns
+    -------
+    dict with stage, year, created, checks, failures and warnings
+    """
+    checks = summary(df)
+    checks.update(observed or {})
+    if year is not None:
+        previous_fn = report_file(working_folder, stage, year - 1)
+        if os.path.exists(previous_fn):
+            with open(previous_fn) as f:
+                previous = json.load(f)["checks"]
+            for count in ("rows", "active"):
+                if previous.get(count) and count in checks:
+                    checks[f"yoy.{count}"] = checks[count] / previous[count] - 1
+    violations = failures(checks, thresholds)
+    report = dict(
+        stage=stage,
+        year=year,
+        created=datetime.now().isoformat(timespec="seconds"),
+        checks=checks,
+        failures=[v for v in violations if not v.get("warn")],
+        warnings=[v for v in violations if v.get("warn")],
+    )
+    fn = report_file(working_folder, stage, year)
+    os.makedirs(os.path.dirname(fn), exist_ok=True)
+    tmp = config.temporary_file(fn)
+    with open(tmp, "w") as f:
+        json.dump(report, f, indent=4)
+    os.replace(tmp, fn)
+    for failure in report["failures"]:
+        print(f"QUALITY CHECK FAILED: {failure}")
+    for warning in report["warnings"]:
+        print(f"QUALITY WARNING: {warning}")
+    return report
@@ -0,0 +1,251 @@
+"""
+Author: Eszter Bokanyi, e.bokanyi@liacs.leidenuniv.nl
+Last modified: 2026.10.18
+
+Memory-mapped fixed-width records of the node files, for lookups of a few nodes by id or label.
+
+Reading the attributes of a few thousand people from the gzipped node files means decompressing
+whole files, and even the parquet files (`nodefiles.store`) are decoded by row group. `build`
+writes every yearly node table of stage 08 once more as an array of fixed-width binary records,
+    {working_folder}/yearly_node_files/records_start_{start_year}_end_{end_year}/
+        manifest.json       record layout: field, dtype and null value of every column, categories
+        nodes_{year}.bin    one record per node, the record of node `id` at byte id * record_size
+        labels.bin          sorted RINPERSOON labels (int32)
+        label_ids.bin       id of every label in labels.bin (int32)
+Columns are stored with the numpy dtype of their registered dtype (`schema.DTYPES`), with the
+smallest value of the dtype as null; booleans as int8 with -1 as null; floats with NaN as null. String
+columns (codes such as buurt_code or educ_level) are stored as integer codes into a sorted list of
+their values over all years in the manifest, with -1 as null. The id is the position of the record
+and is not stored. The layout has the columns of all years, columns a year does not have (income and
+household columns before 2011) are null in its records.
+
+`RecordStore` opens the files as read-only numpy memory maps, so a lookup only reads the pages
+of the requested records, and memory is left to the page cache of the operating system. `get`
+gathers the records of an array of ids for several years at once, `ids` finds the ids of an
+array of labels by binary search in the memory-mapped label index.
+
+Usage
+-----
+    python -m nodefiles records 2009 2023 /h/ODISSEI_portal_C
+
+    from nodefiles.records import RecordStore
+
+    records = RecordStore("/h/ODISSEI_portal_C", 2009, 2023)
+    ids = records.ids(labels)
+    df = records.get(ids, years=range(2015, 2021), columns=["birth_year", "buurt_code", "household_income"])
+"""
+
+import json
+import os
+
+import numpy as np
+import polars as pl
+
+from . import config, metrics, schema
+from .store import NodeStore
+
+# numpy dtype of every numeric polars dtype, booleans are stored as int8
+NUMPY_DTYPES = {
+    pl.Int8: "i1", pl.Int16: "i2", pl.Int32: "i4", pl.Int64: "i8",
+    pl.Float32: "f4", pl.Float64: "f8", pl.Boolean: "i1",
+}
+
+
+def field(column, dtype, categories=None):
+    """Layout of a column in the records: name, kind (int, bool, float or category), numpy dtype, null value."""
+    if dtype == pl.String:
+        # the narrowest signed integer that holds the category codes and -1
+        code = next(t for t in ("i1", "i2", "i4") if len(categories) < np.iinfo(t).max)
+        return dict(name=column, kind="category", dtype=code, null=-1, categories=categories)
+    if dtype == pl.Boolean:
+        return dict(name=column, kind="bool", dtype="i1", null=-1)
+    if dtype in (pl.Float32, pl.Float64):
+        return dict(name=column, kind="float", dtype=NUMPY_DTYPES[dtype], null=None)
+    numpy_dtype = NUMPY_DTYPES[dtype]
+    return dict(name=column, kind="int", dtype=numpy_dtype, null=int(np.iinfo(numpy_dtype).min))
+
+
+def encode(df, fields):
+    """Fixed-width records of the rows of `df`, a structured numpy array."""
+    records = np.empty(df.height, dtype=np.dtype([(f["name"], f["dtype"]) for f in fields]))
+    for f in fields:
+        if f["name"] not in df.columns:
+            # e.g. the income columns before 2011
+            records[f["name"]] = np.nan if f["kind"] == "float" else f["null"]
+            continue
+        s = df[f["name"]]
+        if f["kind"] == "category":
+            codes = s.replace_strict(f["categories"], list(range(len(f["categories"]))), default=None)
+            records[f["name"]] = codes.fill_null(-1).to_numpy()
+        elif f["kind"] == "float":
+            records[f["name"]] = s.cast(pl.Float64).fill_null(float("nan")).to_numpy()
+        else:
+            records[f["name"]] = s.cast(pl.Int64).fill_null(f["null"]).to_numpy()
+    return records
+
+
+def decode(records, fields):
+    """polars Series of the `fields` of a structured numpy array of records, with the registered dtypes."""
+    columns = []
+    for f in fields:
+        values = records[f["name"]]
+        if f["kind"] == "category":
+            # code -1 picks the null appended to the categories
+            codes = np.where(values < 0, len(f["categories"]), values)
+            s = pl.Series(f["name"], f["categories"] + [None], dtype=pl.String).gather(codes)
+        elif f["kind"] == "float":
+            s = pl.Series(f["name"], values).fill_nan(None)
+        else:
+            s = pl.Series(f["name"], values)
+            null = np.flatnonzero(values == f["null"])
+            if len(null):
+                s = s.scatter(null, None)
+            if f["kind"] == "bool":
+                s = s == 1
+        columns.append(s.cast(schema.DTYPES[f["name"]]))
+    return columns
+
+
+def _write(array, fn):
+    tmp = config.temporary_file(fn)
+    array.tofile(tmp)
+    os.replace(tmp, fn)
+
+
+def build(working_folder, start_year, end_year, years=None):
+    """
+    Write the records of the parquet node files of stage 08.
+
+    Parameters
+    ----------
+    working_folder : str
+    start_year, end_year : int
+        Year range of the merged node mapping.
+    years : iterable of int, optional
+        Years to store, all years with parquet node files by default.
+
+    Returns
+    -------
+    dict of file name -> size in bytes
+    """
+    store = NodeStore(working_folder, start_year, end_year)
+    years = sorted(store.years() if years is None else years)
+    if not years:
+        raise FileNotFoundError("No parquet node files found, run stage 08 first.")
+    folder = config.record_folder(working_folder, start_year, end_year)
+    os.makedirs(folder, exist_ok=True)
+
+    # columns of all years, see `NodeStore.scan`
+    table_schema = store.scan(years).drop("year").collect_schema()
+    strings = [c for c, dtype in table_schema.items() if dtype == pl.String]
+    with metrics.step("categories") as s:
+        values = store.scan(years, strings).select(
+            [pl.col(c).drop_nulls().unique().implode() for c in strings]
+        ).collect()
+        categories = {c: sorted(values[c][0].to_list()) for c in strings}
+        s["rows_out"] = sum(len(v) for v in categories.values())
+    fields = [field(c, dtype, categories.get(c)) for c, dtype in table_schema.items() if c != "id"]
+
+    sizes = {}
+    n_nodes = None
+    for year in years:
+        nodes = pl.read_parquet(store.file(year))
+        ids = nodes["id"]
+        if ids[0] != 0 or ids[-1] != nodes.height - 1 or not ids.is_sorted():
+            raise ValueError(f"Node ids of {store.file(year)} are not 0..N-1 in order, rerun stage 08 for {year}.")
+        if n_nodes is not None and nodes.height != n_nodes:
+            raise ValueError(f"The node table of {year} has {nodes.height} rows instead of {n_nodes}, rerun stage 08 with one node mapping.")
+        n_nodes = nodes.height
+        fn = os.path.join(folder, f"nodes_{year}.bin")
+        with metrics.step(f"write records {year}", rows_in=nodes.height):
+            _write(encode(nodes, fields), fn)
+        sizes[fn] = os.path.getsize(fn)
+
+    # label index of the last year, the labels of all years are those of the node mapping
+    order = np.argsort(nodes["label"].to_numpy(), kind="stable")
+    for name, array in (("labels.bin", nodes["label"].to_numpy()[order]), ("label_ids.bin", ids.to_numpy()[order])):
+        fn = os.path.join(folder, name)
+        _write(array.astype(np.int32), fn)
+        sizes[fn] = os.path.getsize(fn)
+
+    manifest = dict(years=years, n_nodes=n_nodes, record_size=int(encode(nodes.head(0), fields).itemsize), fields=fields)
+    fn = os.path.join(folder, "manifest.json")
+    tmp = config.temporary_file(fn)
+    with open(tmp, "w") as f:
+        json.dump(manifest, f, indent=4)
+    os.replace(tmp, fn)
+    return sizes
+
+
+class RecordStore:
+    """
+    Random access to the records of a start_year-end_year node mapping, see `build`.
+
+    Parameters
+    ----------
+    working_folder : str
+    start_year, end_year : int
+        Year range of the merged node mapping.
+    """
+
+    def __init__(self, working_folder, start_year, end_year):
+        self.folder = config.record_folder(working_folder, start_year, end_year)
+        with open(os.path.join(self.folder, "manifest.json")) as f:
+            self.manifest = json.load(f)
+        self.fields = {f["name"]: f for f in self.manifest["fields"]}
+        self.dtype = np.dtype([(f["name"], f["dtype"]) for f in self.manifest["fields"]])
+        self.years = self.manifest["years"]
+        self.n_nodes = self.manifest["n_nodes"]
+        self._maps = {}
+
+    def _map(self, name, dtype, shape):
+        if name not in self._maps:
+            self._maps[name] = np.memmap(os.path.join(self.folder, name), dtype=dtype, mode="r", shape=shape)
+        return self._maps[name]
+
+    def records(self, year):
+        """Memory-mapped records of `year`, a structured numpy array indexed by id."""
+        if year not in self.years:
+            raise FileNotFoundError(f"No records of {year} in {self.folder}, years are {self.years}.")
+        return self._map(f"nodes_{year}.bin", self.dtype, (self.n_nodes,))
+
+    def ids(self, labels):
+        """Ids of an array of RINPERSOON labels, -1 for labels that are not in the node mapping."""
+        sorted_labels = self._map("labels.bin", np.int32, (self.n_nodes,))
+        label_ids = self._map("label_ids.bin", np.int32, (self.n_nodes,))
+        labels = np.asarray(labels, dtype=np.int64)
+        position = np.minimum(np.searchsorted(sorted_labels, labels), self.n_nodes - 1)
+        found = sorted_labels[position] == labels
+        return np.where(found, label_ids[position], -1)
+
+    def get(self, ids, years=None, columns=None):
+        """
+        Attributes of the nodes `ids` in `years`.
+
+        Parameters
+        ----------
+        ids : array-like of int
+        years : int or iterable of int, optional
+            All years of the store by default.
+        columns : list of str, optional
+            All columns by default.
+
+        Returns
+        -------
+        polars DataFrame with `year`, `id` and `columns`, one row per year and id, in the order of `ids`
+        """
+        ids = np.asarray(ids, dtype=np.int64)
+        if len(ids) and (ids.min() < 0 or ids.max() >= self.n_nodes):
+            raise IndexError(f"Ids must be between 0 and {self.n_nodes - 1}, unknown labels have id -1.")
+        if years is None:
+            years = self.years
+        elif isinstance(years, int):
+            years = [years]
+        fields = [self.fields[c] for c in (self.fields if columns is None else columns) if c != "id"]
+        tables = []
+        for year in years:
+            records = self.records(year)[ids]
+            tables.append(pl.DataFrame(
+                [pl.Series("year", np.full(len(ids), year)), pl.Series("id", ids)] + decode(records, fields)
+            ))
+        return schema.enforce(pl.concat(tables), "records")
@@ -0,0 +1,151 @@
+"""
+Author: Eszter Bokanyi, e.bokanyi@liacs.leidenuniv.nl
+Last modified: 2026.10.18
+
+Dtypes of all columns of the intermediate and final node tables.
+
+A column has the same dtype in every table it appears in, and it is the narrowest dtype that holds
+all valid values, e.g. RINPERSOON labels (9 digits) and node ids fit Int32, codes and flags Int8.
+Income amounts are Int64, because unknown amounts are coded as 9999999999 in INPATAB.
+
+The registry is enforced by `tableio.write_csv_gz` and `tableio.read_csv_gz`, and the pipeline
+enforces it on every stage output before handing it to the downstream stages. Values that do not
+fit their dtype raise an error instead of being wrapped or truncated silently.
+"""
+
+import polars as pl
+
+# layer codes (RELATIE) of layers.csv, one degree column each in the network degree tables (10)
+NETWORK_LAYERS = [
+    401, 402,
+    501, 502, 503, 504, 505, 506,
+    101, 102,
+    201,
+    301, 302, 303, 304, 305, 306, 307, 308, 309, 310, 311, 312, 313, 314, 315, 316, 317, 318, 319, 320, 321, 322,
+]
+
+DTYPES = {
+    # node identifiers (01)
+    "label": pl.Int32,
+    "id": pl.Int32,
+    # base (02)
+    "active": pl.Boolean,
+    "gender": pl.Int8,
+    "birth_year": pl.Int16,
+    "migrant_generation": pl.Int8,
+    "number_of_parents_from_abroad": pl.Int8,
+    "missing_mother": pl.Int8,
+    "missing_father": pl.Int8,
+    # income (03)
+    "household_income": pl.Int64,
+    "household_income_percentile": pl.Int8,
+    "household_income_source_year": pl.Int16,
+    "individual_income_gross": pl.Int64,
+    "individual_income_percentile": pl.Int8,
+    "socioeconomic_situation": pl.Int8,
+    # household composition (03), the highest education level of the household is added in 08
+    "household_id": pl.Int32,
+    "household_size": pl.Int16,
+    "household_children": pl.Int16,
+    "household_earners": pl.Int16,
+    "household_max_educ_level": pl.String,
+    # education (04), levels are codes, not numbers
+    "educ_level": pl.String,
+    "educ_weight": pl.Float32,
+    # location (05)
+    "household_change_year": pl.Int16,
+    "gemeente_code": pl.String,
+    "wijk_code": pl.String,
+    "buurt_code": pl.String,
+    # buurt (06), coordinates need double precision
+    "buurt_name": pl.String,
+    "buurt_centroid_x": pl.Float64,
+    "buurt_centroid_y": pl.Float64,
+    "buurt_centroid_lat": pl.Float64,
+    "buurt_centroid_lon": pl.Float64,
+    "buurt_eff_r": pl.Float32,
+    # gemeente (07)
+    "landsdeel": pl.Int8,
+    "provincie": pl.Int8,
+    "coropgebied": pl.Int8,
+    "stedgem": pl.Int8,
+    # context features (09), one row per region
+    "level": pl.String,
+    "region_code": pl.String,
+    "population": pl.Int32,
+    "share_women": pl.Float32,
+    "median_age": pl.Float32,
+    "share_age_0_14": pl.Float32,
+    "share_age_15_24": pl.Float32,
+    "share_age_25_44": pl.Float32,
+    "share_age_45_64": pl.Float32,
+    "share_age_65_plus": pl.Float32,
+    "median_household_income": pl.Float64,
+    "educ_weighted_count": pl.Float32,
+    "share_educ_level_1": pl.Float32,
+    "share_educ_level_2": pl.Float32,
+    "share_educ_level_3": pl.Float32,
+    # network layers (10), degree_{layer} per layer and the bitmask of the layers (`binary` of layers.csv) with edges
+    **{f"degree_{layer}": pl.Int32 for layer in NETWORK_LAYERS},
+    "layers_present": pl.Int64,
+    # parent attributes (11)
+    "mother_id": pl.Int32,
+    "father_id": pl.Int32,
+    "mother_educ_level": pl.String,
+    "father_educ_level": pl.String,
+    "mother_household_income_percentile": pl.Int8,
+    "father_household_income_percentile": pl.Int8,
+    "mother_buurt_code": pl.String,
+    "father_buurt_code": pl.String,
+    "max_parent_income_percentile": pl.Int8,
+    # count cube export (`nodefiles.cube`), besides level and region_code
+    "birth_cohort": pl.Int16,
+    "income_decile": pl.Int8,
+    "count": pl.Int32,
+    "suppressed": pl.Boolean,
+    # bitmask of the changed columns in the delta files (`nodefiles.delta`)
+    "delta_mask": pl.Int64,
+    # partition column of the parquet node files (`nodefiles.store`)
+    "year": pl.Int16,
+}
+
+LABEL = DTYPES["label"]
+
+
+def dtypes(columns):
+    """Registered dtypes of `columns`, e.g. to parse a CSV with."""
+    return {c: DTYPES[c] for c in columns if c in DTYPES}
+
+
+def enforce(df, name="table"):
+    """
+    Cast all columns of a pandas or polars DataFrame to their registered dtypes.
+
+    Parameters
+    ----------
+    df : pandas or polars DataFrame
+    name : str
+        Name of the table in error messages, e.g. the stage or file name.
+
+    Returns
+    -------
+    polars DataFrame
+
+    Raises
+    ------
+    ValueError
+        If a column is not in the registry or one of its values does not fit the registered dtype.
+    """
+    from .tableio import to_polars
+
+    df = to_polars(df)
+    unknown = [c for c in df.columns if c not in DTYPES]
+    if unknown:
+        raise ValueError(f"Columns {unknown} of {name} are not in the schema registry (nodefiles/schema.py).")
+    columns = []
+    for c in df.columns:
+        try:
+            columns.append(df[c].cast(DTYPES[c], strict=True))
+        except (pl.exceptions.InvalidOperationError, pl.exceptions.ComputeError) as e:
+            raise ValueError(f"Column {c} of {name} does not fit {DTYPES[c]}: {e}") from e
+    return pl.DataFrame(columns)
@@ -0,0 +1,181 @@
+"""
+Author: Eszter Bokanyi, e.bokanyi@liacs.leidenuniv.nl
+Last modified: 2026.10.18
+
+Prefetching of the source files of upcoming stages to a local staging folder.
+
+In the RA, all sources are read from the G: and K: network drives, and a stage waits for its reads
+before it can compute. With staging enabled, `Pipeline.run` hands the sources of the next stages
+(their `sources(pipeline, year)`) to a `Prefetcher`, which copies them to a local folder with
+background threads while the current stage computes, e.g. HOOGSTEOPLTAB, VSLGWBTAB, the buurt
+shapefile and the GIN file are copied while stage 03 finds the household components.
+
+Readers call `local(fn)` on the path they are about to read:
+    * if the copy of `fn` is complete, the staged copy is read,
+    * if it is being copied, the reader waits for the copy to finish,
+    * otherwise (not scheduled, not started yet, or failed) the network file is read, and a copy
+      that has not started is cancelled.
+Paths are not changed anywhere else, so build cache keys and messages still refer to the sources.
+
+The staging folder is bounded: a copy only starts if it fits into `max_bytes` next to the staged
+files, and staged copies are deleted as soon as no scheduled stage needs them any more.
+"""
+
+import os
+import shutil
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+# number of upcoming stages whose sources are prefetched
+LOOKAHEAD = 8
+
+_prefetcher = None
+
+
+def local(fn, companions=()):
+    """
+    Path to read the source `fn` from: its staged copy if it is (being) staged, else `fn`.
+
+    Parameters
+    ----------
+    fn : str
+    companions : list of str
+        Files that have to be read together with `fn` from the same folder, e.g. the .dbf of a
+        shapefile. The staged copy is only used if all of them are staged.
+    """
+    if _prefetcher is None:
+        return fn
+    return _prefetcher.local(fn, companions)
+
+
+class Prefetcher:
+    """
+    Background copies of source files into a bounded local staging folder.
+
+    Parameters
+    ----------
+    staging_folder : str
+        Local folder for the staged copies, it is emptied on `close`.
+    max_bytes : int
+        Largest total size of the staged copies.
+    threads : int
+        Number of files copied at the same time.
+    """
+
+    def __init__(self, staging_folder, max_bytes, threads=2):
+        self.staging_folder = staging_folder
+        self.max_bytes = max_bytes
+        self.used_bytes = 0
+        self._executor = ThreadPoolExecutor(max_workers=threads, thread_name_prefix="prefetch")
+        self._lock = threading.Condition()
+        # fn -> dict(state, size, path, future, users)
+        self._files = {}
+
+    def __enter__(self):
+        global _prefetcher
+        _prefetcher = self
+        return self
+
+    def __exit__(self, *exc):
+        global _prefetcher
+        _prefetcher = None
+        self.close()
+
+    def staged_path(self, fn):
+        """Location of the copy of `fn`, mirroring its absolute path below the staging folder."""
+        drive, path = os.path.splitdrive(os.path.abspath(fn))
+        parts = [drive.rstrip(":")] + [p for p in path.replace("\\", "/").split("/") if p]
+        return os.path.join(self.staging_folder, *[p for p in parts if p])
+
+    def schedule(self, user, files):
+        """Start copying `files`, needed by `user` (e.g. a (stage, year) pair), unless they are staged already."""
+        with self._lock:
+            for fn in files:
+                entry = self._files.get(fn)
+                if entry is None:
+                    try:
+                        size = os.path.getsize(fn)
+                    except OSError:
+                        continue
+                    if size > self.max_bytes:
+                        continue
+                    entry = self._files[fn] = dict(state="queued", size=size, path=self.staged_path(fn), future=None, users=set())
+                    entry["future"] = self._executor.submit(self._copy, fn, entry)
+                entry["users"].add(user)
+
+    def release(self, user):
+        """`user` is done with its files, delete the copies no other scheduled user needs."""
+        with self._lock:
+            for fn, entry in list(self._files.items()):
+                entry["users"].discard(user)
+                if entry["users"]:
+                    continue
+                if entry["state"] == "queued":
+                    entry["state"] = "skipped"
+                if entry["state"] != "copying":
+                    self._evict(fn, entry)
+            self._lock.notify_all()
+
+    def local(self, fn, companions=()):
+        with self._lock:
+            entries = [self._files.get(f) for f in (fn, *companions)]
+            if any(e is None or e["state"] in ("failed", "skipped") for e in entries):
+                return fn
+            # cancel queued copies, reading the network file now is faster than waiting for them
+            if any(e["state"] == "queued" for e in entries):
+                for e in entries:
+                    if e["state"] == "queued":
+                        e["state"] = "skipped"
+                self._lock.notify_all()
+                return fn
+        for e in entries:
+            e["future"].result()
+        if all(e["state"] == "done" for e in entries):
+            print(f"\tReading the staged copy of {fn}")
+            return self._files[fn]["path"]
+        return fn
+
+    def _copy(self, fn, entry):
+        with self._lock:
+            # wait for room in the staging folder, unless the copy is cancelled in the meantime
+            while entry["state"] == "queued" and self.used_bytes + entry["size"] > self.max_bytes:
+                self._lock.wait()
+            if entry["state"] != "queued":
+                return
+            entry["state"] = "copying"
+            self.used_bytes += entry["size"]
+        try:
+            os.makedirs(os.path.dirname(entry["path"]), exist_ok=True)
+            tmp = entry["path"] + ".tmp"
+            shutil.copyfile(fn, tmp)
+            os.replace(tmp, entry["path"])
+            state = "done"
+        except OSError as e:
+            print(f"\tCould not stage {fn}: {e}")
+            state = "failed"
+        with self._lock:
+            entry["state"] = state
+            if state == "failed":
+                self.used_bytes -= entry["size"]
+            elif not entry["users"]:
+                self._evict(fn, entry)
+            self._lock.notify_all()
+
+    def _evict(self, fn, entry):
+        if entry["state"] == "done":
+            try:
+                os.remove(entry["path"])
+            except OSError:
+                pass
+            self.used_bytes -= entry["size"]
+        del self._files[fn]
+
+    def close(self):
+        """Cancel pending copies, wait for running ones and delete the staging folder."""
+        with self._lock:
+            for entry in self._files.values():
+                if entry["state"] == "queued":
+                    entry["state"] = "skipped"
+            self._lock.notify_all()
+        self._executor.shutdown(wait=True)
+        shutil.rmtree(self.staging_folder, ignore_errors=True)
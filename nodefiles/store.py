@@ -0,0 +1,183 @@
+"""
+Author: Eszter Bokanyi, e.bokanyi@liacs.leidenuniv.nl
+Last modified: 2026.10.18
+
+Query API over the yearly node files, and their hand-off to mlnlib networks.
+
+Stage 08 writes every yearly node table as parquet next to the gzipped CSV, to
+    {working_folder}/yearly_node_files/parquet_start_{start_year}_end_{end_year}/year={year}/nodes.parquet
+`NodeStore.scan` returns a lazily evaluated polars frame over a range of years, so that only the
+needed data is read when it is collected:
+    * years outside the requested range are never opened (partition pruning),
+    * only the selected columns and the columns of the filter are decoded (projection pushdown),
+    * filters are evaluated while reading, and row groups whose min/max statistics cannot match are
+      skipped (predicate pushdown). Rows are stored in id order, so filters on `id` or `label`
+      ranges skip most row groups, while filters on e.g. `gemeente_code` skip the other columns
+      of non-matching rows.
+
+Usage
+-----
+    from nodefiles.store import NodeStore
+
+    store = NodeStore("/h/ODISSEI_portal_C", 2009, 2023)
+    df = store.scan(range(2015, 2021), ["id", "birth_year", "buurt_code"], "gemeente_code = 'GM0363' AND active").collect()
+    df = store.scan(2020, filter=pl.col("active") & (pl.col("birth_year") >= 2000)).collect()
+
+The node table of a year is also the node table of the mlnlib `MultiLayerNetwork` of that year:
+the row of node `id` is row `id` of the parquet file. `network_nodes` reads it as is, without
+re-sorting, to pass as `nodes=`, and `attributes` returns columns as NumPy arrays indexed by id:
+
+    nodes = store.network_nodes(2020, ["gender", "birth_year"])
+    mln = MultiLayerNetwork(nodes=nodes, edges=A, layers=layers)
+    birth_year = store.attributes(2020, ["birth_year"])["birth_year"]
+    birth_year[mln.to_id(label)]
+"""
+
+import os
+
+import polars as pl
+
+from . import config, schema
+
+
+class NodeStore:
+    """
+    Lazily evaluated access to the parquet node files of a start_year-end_year node mapping.
+
+    Parameters
+    ----------
+    working_folder : str
+        Working folder (or output folder) of the pipeline run that wrote the node files.
+    start_year, end_year : int
+        Year range of the merged node mapping.
+    """
+
+    def __init__(self, working_folder, start_year, end_year):
+        self.working_folder = working_folder
+        self.start_year = start_year
+        self.end_year = end_year
+
+    def file(self, year):
+        return config.nodes_parquet_file(self.working_folder, self.start_year, self.end_year, year)
+
+    def years(self):
+        """Years that have a parquet node file."""
+        return [y for y in range(self.start_year, self.end_year + 1) if os.path.exists(self.file(y))]
+
+    def scan(self, years=None, columns=None, filter=None):
+        """
+        Lazy frame of the node tables of `years`, with a `year` column.
+
+        Parameters
+        ----------
+        years : int or iterable of int, optional
+            A year, or years, e.g. range(2015, 2021). All available years by default.
+        columns : list of str, optional
+            Columns to return (`year` is always included), all by default.
+        filter : polars expression, SQL string, or list of them, optional
+            Rows to keep, e.g. pl.col("gemeente_code") == "GM0363" or "gemeente_code = 'GM0363' AND active".
+            A list of filters is combined with AND.
+
+        Returns
+        -------
+        polars LazyFrame
+
+        Years before 2011 have no income or household columns. Columns missing in some of the years
+        (and registered columns that are asked for but missing in all of them) are null in these
+        years, with their registered dtype.
+        """
+        if years is None:
+            years = self.years()
+        elif isinstance(years, int):
+            years = [years]
+        years = list(years)
+        missing = [y for y in years if not os.path.exists(self.file(y))]
+        if missing:
+            raise FileNotFoundError(
+                f"No parquet node files for {missing} in {config.nodes_parquet_folder(self.working_folder, self.start_year, self.end_year)}, "
+                "run stage 08 for these years first."
+            )
+
+        # union of the columns of all years, in the order they first appear
+        schemas = {y: pl.scan_parquet(self.file(y)).collect_schema() for y in years}
+        dtypes = {}
+        for table_schema in schemas.values():
+            for c, dtype in table_schema.items():
+                dtypes.setdefault(c, dtype)
+        if columns is None:
+            selected = [c for c in dtypes if c != "year"] + ["year"]
+        else:
+            selected = ["year"] + [c for c in columns if c != "year"]
+            dtypes.update({c: schema.DTYPES[c] for c in selected if c not in dtypes and c in schema.DTYPES})
+
+        frames = []
+        for y in years:
+            # every year is projected to the selected columns before the concatenation
+            lf = pl.scan_parquet(self.file(y)).with_columns(
+                [pl.lit(None, dtype=dtype).alias(c) for c, dtype in dtypes.items() if c not in schemas[y] and c != "year"]
+                + [pl.lit(y, dtype=schema.DTYPES["year"]).alias("year")]
+            )
+            if filter is not None:
+                lf = lf.filter(_predicate(filter))
+            frames.append(lf.select(selected))
+        return pl.concat(frames, how="vertical")
+
+    def read(self, years=None, columns=None, filter=None):
+        """Like `scan`, but collected into a polars DataFrame."""
+        return self.scan(years, columns, filter).collect()
+
+    def network_nodes(self, year, columns=None):
+        """
+        Node table of `year` in id order, to pass as `nodes=` to mlnlib `MultiLayerNetwork`.
+
+        The parquet file is already in id order and contains every id of the node mapping, so it is
+        read as is; the order is validated but never changed.
+
+        Parameters
+        ----------
+        year : int
+        columns : list of str, optional
+            Attribute columns besides `id` and `label`, all by default.
+
+        Returns
+        -------
+        polars DataFrame whose row i is node id i
+        """
+        if columns is not None:
+            columns = ["id", "label"] + [c for c in columns if c not in ("id", "label")]
+        nodes = pl.read_parquet(self.file(year), columns=columns, memory_map=True)
+        ids = nodes["id"]
+        if len(ids) and (ids[0] != 0 or ids[-1] != len(ids) - 1 or not ids.is_sorted()):
+            raise ValueError(f"Node ids of {self.file(year)} are not 0..N-1 in order, rerun stage 08 for {year}.")
+        return nodes
+
+    def attributes(self, year, columns):
+        """
+        Node attributes of `year` as NumPy arrays indexed by node id.
+
+        Numeric and boolean columns without nulls are views of the loaded columns, without a copy.
+        Columns with nulls are copied, to float arrays with NaN for integers.
+
+        Returns
+        -------
+        dict of column -> numpy array of length N
+        """
+        nodes = self.network_nodes(year, columns)
+        return {c: nodes[c].to_numpy() for c in columns}
+
+    def network(self, year, edges, layers, columns=None, **kwargs):
+        """mlnlib `MultiLayerNetwork` of `year` with the node attributes in `columns` (all by default)."""
+        from mlnlib.mln import MultiLayerNetwork
+
+        return MultiLayerNetwork(nodes=self.network_nodes(year, columns), edges=edges, layers=layers, **kwargs)
+
+
+def _predicate(filter):
+    if isinstance(filter, (list, tuple)):
+        predicate = _predicate(filter[0])
+        for f in filter[1:]:
+            predicate = predicate & _predicate(f)
+        return predicate
+    if isinstance(filter, str):
+        return pl.sql_expr(filter)
+    return filter
@@ -0,0 +1,219 @@
+"""
+Author: Eszter Bokanyi, e.bokanyi@liacs.leidenuniv.nl
+Last modified: 2026.10.18
+
+Node files of a sub-range of years, derived from an existing run of a wider year range.
+
+The ids of a start_year-end_year run come from the union of the people of exactly that range, so
+the node files of e.g. 2012-2020 cannot be taken from a 2009-2023 run as they are. `derive`
+builds them without running the stages again:
+    * the nodes of the sub-range are the people active in any year of the sub-range (from the
+      parquet node files) and, unless `active_only`, the people in the GBAPERSOONTAB of any year of
+      the sub-range, as in stage 01 (only the RINPERSOON column is read),
+    * they get compact new ids, in order of the first year of the sub-range they appear in, as in
+      stage 01, and by their old id within a year,
+    * the base tables, node tables (CSV and parquet) and context tables of the sub-range years are
+      rewritten with the new ids, by looking up the new id of every row in an array indexed by the
+      old id, and dropping the rows of people outside the sub-range; household ids are the
+      smallest new id of the members of the household again,
+    * the layer matrices of stage 10 are reduced to the rows and columns of the nodes of the
+      sub-range, in new id order, and their degree tables are computed again,
+    * the parent tables of stage 11 get the new ids of the parents, and parents outside the
+      sub-range are left out with their attributes.
+The nodes of the sub-range are read through `NodeStore.scan`, so a sub-range may span years with
+and without income data (e.g. 2010-2011). The context tables only describe the active population of
+a year and are copied unchanged. The attribute tables of stages 03-07 are not rewritten, the node
+tables already contain their values.
+Household income percentiles of people with tied incomes can differ from a direct run of the
+sub-range, since `income.percentile` ranks ties in row order, which follows the ids.
+
+The derived files get the names of a start_year=sub_start, end_year=sub_end run in the same working
+folder. Since they can differ from a direct run, they are not recorded in the build cache: a later
+run of the sub-range recomputes all of its stages and overwrites them. With `active_only`, no
+source is read, and people that are only in GBAPERSOONTAB but never active in the sub-range are
+left out.
+
+Usage
+-----
+    python -m nodefiles subrange 2009 2023 /h/ODISSEI_portal_C 2012 2020
+"""
+
+import os
+import shutil
+
+import numpy as np
+import polars as pl
+
+from . import combined, config, metrics, network, parents, schema
+from .merged import read_persons
+from .pipeline import Pipeline
+from .store import NodeStore
+from .tableio import read_csv_gz, write_csv_gz, write_parquet
+
+
+def subrange_mapping(mapping, ids_per_year):
+    """
+    Merged node mapping of a sub-range.
+
+    Parameters
+    ----------
+    mapping : polars DataFrame
+        Merged node mapping of the wide range, `id` and `label`.
+    ids_per_year : polars DataFrame
+        `id` (of the wide range) and `year` of every node present in a year of the sub-range.
+
+    Returns
+    -------
+    (polars DataFrame with the new `id` and `label`, NumPy array of the new id of every old id, -1
+    for nodes outside the sub-range)
+    """
+    first = (ids_per_year
+        .group_by("id")
+        .agg(pl.col("year").min().alias("first_year"))
+        .sort(["first_year", "id"])
+    )
+    old_ids = first["id"].to_numpy()
+    lookup = np.full(mapping.height, -1, dtype=np.int64)
+    lookup[old_ids] = np.arange(len(old_ids))
+    # rows of the wide mapping are in id order
+    labels = mapping.sort("id")["label"].gather(old_ids)
+    new_mapping = pl.DataFrame({
+        "id": pl.Series(range(len(old_ids)), dtype=schema.DTYPES["id"]),
+        "label": labels,
+    })
+    return new_mapping, lookup
+
+
+def remap(table, lookup):
+    """Rows of `table` whose node is in the sub-range, with their new ids, in new id order."""
+    new_ids = lookup[table["id"].to_numpy()]
+    return (table
+        .with_columns(pl.Series("id", new_ids))
+        .filter(pl.col("id") >= 0)
+        .sort("id")
+    )
+
+
+def remap_matrix(A, lookup):
+    """Rows and columns of a sparse matrix of the nodes in the sub-range, in new id order."""
+    kept = np.flatnonzero(lookup >= 0)
+    old_ids = kept[np.argsort(lookup[kept])]
+    return A.tocsr()[old_ids][:, old_ids]
+
+
+def remap_households(nodes):
+    """Household ids of a remapped node table, the smallest new id of the members of every household."""
+    if "household_id" not in nodes.columns:
+        return nodes
+    return nodes.with_columns(
+        pl.when(pl.col("household_id").is_not_null())
+        .then(pl.col("id").min().over("household_id"))
+        .cast(schema.DTYPES["household_id"])
+        .alias("household_id")
+    )
+
+
+def remap_parents(table, lookup):
+    """Parent table of the sub-range: rows and parent ids remapped, attributes of parents outside the sub-range null."""
+    table = remap(table, lookup)
+    columns = []
+    for parent in parents.PARENTS:
+        old_ids = table[f"{parent}_id"]
+        new_ids = pl.Series(lookup[old_ids.fill_null(0).to_numpy()]).set(old_ids.is_null(), -1)
+        dropped = pl.Series(new_ids < 0)
+        columns.append(new_ids.set(dropped, None).cast(schema.DTYPES["id"]).alias(f"{parent}_id"))
+        columns += [table[f"{parent}_{c}"].set(dropped, None) for c in parents.PARENT_ATTRIBUTES]
+    return table.with_columns(columns).with_columns(parents.max_income_percentile())
+
+
+def _copy(src, dst):
+    tmp = config.temporary_file(dst)
+    shutil.copyfile(src, tmp)
+    os.replace(tmp, dst)
+
+
+def remap_network(wide, sub, year, mapping, lookup):
+    """Write the layer matrices and degrees of stage 10 of `year` of the sub-range, returns the files."""
+    from scipy.sparse import load_npz
+
+    layers = wide.inputs.layers()
+    binary = dict(zip(layers["layer"].tolist(), layers["binary"].tolist()))
+    old_degrees = read_csv_gz(wide.output("network", year))
+    # layers without a network file in the wide run have no degrees
+    missing = [layer for layer in binary if old_degrees[f"degree_{layer}"].null_count() == old_degrees.height]
+    matrices = {}
+    for layer, old_fn, fn in zip(binary, wide.outputs("network", year)[1:], sub.outputs("network", year)[1:]):
+        matrices[layer] = remap_matrix(load_npz(old_fn), lookup)
+        network.save_matrix(matrices[layer], fn)
+    write_csv_gz(network.node_degrees(mapping, matrices, binary, missing), sub.output("network", year))
+    return sub.outputs("network", year)
+
+
+def derive(working_folder, start_year, end_year, sub_start, sub_end, active_only=False):
+    """
+    Write the merged mapping, base, node, context, network and parent tables of sub_start-sub_end from a start_year-end_year run.
+
+    Parameters
+    ----------
+    working_folder : str
+    start_year, end_year : int
+        Year range of the existing run.
+    sub_start, sub_end : int
+        Year range to derive, within start_year-end_year.
+    active_only : bool
+        Only keep the people active in a year of the sub-range, without reading GBAPERSOONTAB.
+
+    Returns
+    -------
+    list of written files
+    """
+    if not start_year <= sub_start <= sub_end <= end_year:
+        raise ValueError(f"{sub_start}-{sub_end} is not within {start_year}-{end_year}.")
+    wide = Pipeline(working_folder, start_year, end_year)
+    sub = Pipeline(working_folder, sub_start, sub_end)
+    years = list(range(sub_start, sub_end + 1))
+    store = NodeStore(working_folder, start_year, end_year)
+    missing = [y for y in years if not os.path.exists(store.file(y))]
+    if missing:
+        raise FileNotFoundError(f"No parquet node files of {missing} in the {start_year}-{end_year} run, run stage 08 first.")
+
+    mapping = read_csv_gz(wide.output("merged"))
+    with metrics.step("nodes of the sub-range") as s:
+        frames = [store.scan(years, ["id"], pl.col("active")).collect().select("id", pl.col("year").cast(pl.Int32))]
+        if not active_only:
+            files_per_year = sub.inputs.files_per_year()
+            for y in years:
+                labels = read_persons(y, files_per_year)
+                frames.append(mapping.filter(pl.col("label").is_in(labels)).select("id", pl.lit(y, dtype=pl.Int32).alias("year")))
+        ids_per_year = pl.concat(frames)
+        new_mapping, lookup = subrange_mapping(mapping, ids_per_year)
+        s["rows_out"] = new_mapping.height
+    print(f"{new_mapping.height} of {mapping.height} nodes of {start_year}-{end_year} are in {sub_start}-{sub_end}.")
+
+    written = [sub.output("merged")]
+    write_csv_gz(new_mapping, written[0])
+    for year in years:
+        with metrics.context(year=year):
+            with metrics.step("remap base") as s:
+                base = remap(read_csv_gz(wide.output("base", year)), lookup)
+                write_csv_gz(base, sub.output("base", year))
+                s["rows_out"] = base.height
+            with metrics.step("remap nodes") as s:
+                nodes = remap_households(remap(pl.read_parquet(store.file(year)), lookup))
+                fn, parquet_fn = sub.outputs("combined", year)
+                write_csv_gz(nodes, fn)
+                write_parquet(nodes, parquet_fn, combined.ROW_GROUP_SIZE)
+                s["rows_out"] = nodes.height
+            written += [sub.output("base", year), fn, parquet_fn]
+            if os.path.exists(wide.output("context", year)):
+                _copy(wide.output("context", year), sub.output("context", year))
+                written.append(sub.output("context", year))
+            if os.path.exists(wide.output("network", year)):
+                with metrics.step("remap network"):
+                    written += remap_network(wide, sub, year, new_mapping, lookup)
+            if os.path.exists(wide.output("parents", year)):
+                with metrics.step("remap parents"):
+                    write_csv_gz(remap_parents(read_csv_gz(wide.output("parents", year)), lookup), sub.output("parents", year))
+                written.append(sub.output("parents", year))
+        print(f"{year}: {nodes.height} nodes")
+    return written
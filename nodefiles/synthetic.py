@@ -0,0 +1,717 @@
+"""
+Author: Eszter Bokanyi, e.bokanyi@liacs.leidenuniv.nl
+Last modified: 2026.10.18
+
+Synthetic versions of all source files of the pipeline, to run, test and benchmark it outside of the CBS RA.
+
+`generate` writes every file the stages read for a range of years below a local folder, at the
+same relative paths as on the G: and K: drives (see `config.source`), and with the file formats,
+column names, column order, value types and separators of the originals:
+    * GBAPERSOONTAB (SAV and CSV), GBAADRESOBJECTBUS (yearly SAV and the converted CSV with all years),
+      GBAOVERLIJDENTAB and KINDOUDERTAB (SAV),
+    * HUISGENOTENNETWERK (CSV, layers 401 and 402 of layers.csv), FAMILIENETWERK (layers 301, 302,
+      304 and 306) and BURENNETWERK (layer 101),
+    * INHATAB and INPATAB (SAV),
+    * HOOGSTEOPLTAB (CSV, with the education column of each year) and the SSB reference tables (SAV),
+    * VSLGWBTAB (SAV), GIN (SAV, DTA or XLSX depending on the year) and buurt shapefiles.
+
+Values are random, but consistent between files: persons are born, immigrate, move, emigrate and
+die, households are the people registered at the same address object, address objects lie in
+buurten of wijken of gemeenten, and incomes, education and parents are drawn for the persons
+present in a given year.
+
+Identifiers and dates are stored as strings in the SPSS files and as integers in the CSV files, as
+in the RA. Codes that are strings with value labels in the original SPSS files are strings here,
+without value labels, except for the GIN files, whose labels are read by stage 07.
+
+Usage
+-----
+    python -m nodefiles synth /data/synthetic 1000000 2019 2021
+and then, with the G: and K: drives mapped to /data/synthetic/G and /data/synthetic/K,
+    NODEFILES_G_ROOT=/data/synthetic/G NODEFILES_K_ROOT=/data/synthetic/K python -m nodefiles run 2019 2021 /data/wf
+"""
+
+import json
+import os
+from datetime import datetime
+
+import numpy as np
+import polars as pl
+
+from . import config
+
+# end date of address registrations that have not ended yet
+OPEN_END = 88881231
+
+# household sizes 1-5 and their frequencies
+HOUSEHOLD_SIZES = [1, 2, 3, 4, 5]
+HOUSEHOLD_SIZE_P = [0.38, 0.33, 0.12, 0.12, 0.05]
+INSTITUTION_SIZE = 10
+
+LANDSDELEN = {1: "Noord-Nederland", 2: "Oost-Nederland", 3: "West-Nederland", 4: "Zuid-Nederland"}
+PROVINCIES = {
+    20: "Groningen", 21: "Fryslân", 22: "Drenthe", 23: "Overijssel", 24: "Flevoland", 25: "Gelderland",
+    26: "Utrecht", 27: "Noord-Holland", 28: "Zuid-Holland", 29: "Zeeland", 30: "Noord-Brabant", 31: "Limburg"
+}
+STEDELIJKHEID = {1: "Zeer sterk stedelijk", 2: "Sterk stedelijk", 3: "Matig stedelijk", 4: "Weinig stedelijk", 5: "Niet stedelijk"}
+
+# OPLNIVSOI2016AGG4HB / OPLNIVSOI2021AGG4HB codes, the first digit is the education level
+EDUCATION_CODES = ["1111", "1112", "1211", "1212", "1213", "2111", "2112", "2121", "2131", "2132", "3111", "3112", "3113", "3211", "3212", "3213", "9999"]
+EDUCATION_CODE_P = [0.03, 0.04, 0.08, 0.07, 0.05, 0.06, 0.07, 0.08, 0.10, 0.08, 0.06, 0.06, 0.03, 0.07, 0.05, 0.03, 0.04]
+
+SOCIOECONOMIC_CODES = [11, 12, 13, 14, 15, 21, 22, 23, 24, 25, 26, 31, 32]
+
+
+def _dates(rng, years):
+    """Random YYYYMMDD dates within `years`."""
+    return years * 10000 + rng.integers(1, 13, len(years)) * 100 + rng.integers(1, 29, len(years))
+
+
+def _rin(values):
+    """Zero padded 9 digit RINPERSOON strings, as stored in the SPSS files."""
+    return np.char.zfill(values.astype("U9"), 9).astype(object)
+
+
+def _strings(values):
+    """String form of `values` as an object array, converting only the unique values."""
+    uniques, inverse = np.unique(values, return_inverse=True)
+    return np.array([str(u) for u in uniques], dtype=object)[inverse]
+
+
+def _percentile(values):
+    """Rank based percentiles 1-100."""
+    ranks = np.empty(len(values), dtype=np.int64)
+    ranks[np.argsort(values, kind="stable")] = np.arange(len(values))
+    return ranks * 100 // max(len(values), 1) + 1
+
+
+class Population:
+    """
+    Random persons, their address history and households, and the geography of the address objects.
+
+    Parameters
+    ----------
+    n_persons : int
+        Number of persons ever registered in the GBA up to `end_year`.
+    start_year, end_year : int
+        Years the pipeline is run for.
+    seed : int
+
+    Person arrays are indexed by person, `spell_*` arrays by address registration,
+    `object_*` arrays by address object and `buurt_*` arrays by buurt.
+    """
+
+    def __init__(self, n_persons, start_year, end_year, seed=0):
+        self.start_year = start_year
+        self.end_year = end_year
+        self.rng = rng = np.random.default_rng(seed)
+
+        # persons: births, immigration and deaths, only those registered between 1995 and end_year are kept
+        m = int(1.3 * n_persons) + 1000
+        birth_year = rng.integers(1905, end_year + 1, m)
+        death_year = birth_year + rng.normal(81, 11, m).clip(0, 110).astype(np.int64)
+        immigrant = rng.random(m) < 0.12
+        arrival_year = np.where(immigrant, birth_year + rng.integers(0, 50, m), birth_year)
+        keep = np.flatnonzero((death_year >= 1995) & (arrival_year <= end_year) & (arrival_year <= death_year))
+        keep = keep[:n_persons]
+        n = self.n_persons = len(keep)
+        birth_year, death_year, immigrant, arrival_year = birth_year[keep], death_year[keep], immigrant[keep], arrival_year[keep]
+
+        self.label = 100_000_000 + rng.permutation(n).astype(np.int64) * (800_000_000 // n)
+        self.birth_year = birth_year
+        self.birth_month = rng.integers(1, 13, n)
+        self.birth_day = rng.integers(1, 29, n)
+        birth_date = birth_year * 10000 + self.birth_month * 100 + self.birth_day
+        self.gender = rng.integers(1, 3, n)
+        self.generation = np.where(immigrant, 1, rng.choice([0, 2], n, p=[0.85, 0.15]))
+        self.parents_abroad = np.where(self.generation == 0, 0, rng.integers(1, 3, n))
+
+        arrival = np.maximum(np.where(immigrant, _dates(rng, arrival_year), birth_date), birth_date)
+        death = np.maximum(_dates(rng, death_year), arrival)
+        died = death_year <= end_year
+        emigration_year = arrival_year + rng.integers(0, 40, n)
+        emigration = np.maximum(_dates(rng, emigration_year), arrival)
+        emigrated = (rng.random(n) < 0.08) & (emigration_year <= end_year) & (~died | (emigration < death))
+        self.arrival = arrival
+        self.departure = np.where(emigrated, emigration, np.where(died, death, OPEN_END))
+        # deaths abroad are not registered
+        self.died = died & ~emigrated
+        self.death = death
+
+        self._parents()
+        self._households()
+        self._geography()
+
+    def _parents(self):
+        """Mother and father of each person among the persons born 18-45 years earlier, -1 if unknown."""
+        rng = self.rng
+        for parent, gender in (("mother", 2), ("father", 1)):
+            candidates = np.flatnonzero(self.gender == gender)
+            candidates = candidates[np.argsort(self.birth_year[candidates], kind="stable")]
+            birth_years = self.birth_year[candidates]
+            lo = np.searchsorted(birth_years, self.birth_year - 45, side="left")
+            hi = np.searchsorted(birth_years, self.birth_year - 18, side="right")
+            known = (hi > lo) & (rng.random(self.n_persons) < 0.9)
+            pick = lo + (rng.random(self.n_persons) * np.maximum(hi - lo, 1)).astype(np.int64)
+            setattr(self, parent, np.where(known, candidates[np.minimum(pick, len(candidates) - 1)], -1))
+
+    def _households(self):
+        """Address registrations: everyone lives in a household or an institution, some move once to a new address."""
+        rng = self.rng
+        n = self.n_persons
+
+        # households and institutions, an address object each
+        order = rng.permutation(n)
+        n_institutional = int(0.008 * n) // INSTITUTION_SIZE * INSTITUTION_SIZE
+        sizes = rng.choice(HOUSEHOLD_SIZES, n, p=HOUSEHOLD_SIZE_P)
+        n_households = int(np.searchsorted(np.cumsum(sizes), n - n_institutional)) + 1
+        household = np.empty(n, dtype=np.int64)
+        household[order[n_institutional:]] = np.repeat(np.arange(n_households), sizes[:n_households])[:n - n_institutional]
+        household[order[:n_institutional]] = n_households + np.arange(n_institutional) // INSTITUTION_SIZE
+        n_objects = n_households + n_institutional // INSTITUTION_SIZE
+        institution = np.arange(n_objects) >= n_households
+
+        # one move to a new address for some, between arrival and departure
+        last_year = np.minimum(self.departure // 10000, self.end_year)
+        arrival_year = self.arrival // 10000
+        span = last_year - arrival_year
+        move_year = arrival_year + 1 + (rng.random(n) * np.maximum(span, 1)).astype(np.int64)
+        move = move_year * 10000 + rng.integers(1, 13, n) * 100 + rng.integers(2, 29, n)
+        moves = (rng.random(n) < 0.35) & (span >= 1) & (move < self.departure)
+        movers = np.flatnonzero(moves)
+        new_object = n_objects + np.arange(len(movers))
+        n_objects += len(movers)
+        institution = np.concatenate([institution, np.zeros(len(movers), dtype=bool)])
+
+        self.spell_person = np.concatenate([np.arange(n), movers])
+        self.spell_begin = np.concatenate([self.arrival, move[movers]])
+        self.spell_end = np.concatenate([np.where(moves, move - 1, self.departure), self.departure[movers]])
+        self.spell_object = np.concatenate([household, new_object])
+
+        self.n_objects = n_objects
+        self.object_institution = institution
+        self.object_id = 10_000_000 + rng.permutation(n_objects).astype(np.int64) * 7
+        self.object_type = rng.choice(np.array(["VBO", "LIG", "STA"], dtype=object), n_objects, p=[0.98, 0.01, 0.01])
+
+    def _geography(self):
+        """Gemeenten, wijken of 5 buurten and the buurt of every address object."""
+        rng = self.rng
+        n_buurten = int(np.clip(self.n_persons // 1000, 20, 13000))
+        n_gemeenten = int(np.clip(n_buurten // 25, 2, 342))
+
+        self.gemeente = np.sort(rng.choice(np.arange(1, 2000), n_gemeenten, replace=False))
+        self.gemeente_landsdeel = rng.choice(list(LANDSDELEN), n_gemeenten)
+        self.gemeente_provincie = rng.choice(list(PROVINCIES), n_gemeenten)
+        self.gemeente_corop = rng.integers(1, 41, n_gemeenten)
+        self.gemeente_stedgem = rng.choice(list(STEDELIJKHEID), n_gemeenten)
+
+        buurt_gemeente = np.sort(np.concatenate([np.arange(n_gemeenten), rng.integers(0, n_gemeenten, n_buurten - n_gemeenten)]))
+        rank = np.arange(n_buurten) - np.searchsorted(buurt_gemeente, buurt_gemeente)
+        self.buurt_gemeente = buurt_gemeente
+        # GGGGWWBB
+        self.buurt_code = self.gemeente[buurt_gemeente] * 10000 + (rank // 5) * 100 + rank % 5
+
+        self.object_buurt = rng.integers(0, n_buurten, self.n_objects)
+        # objects without a buurt in VSLGWBTAB
+        self.object_unknown_buurt = rng.random(self.n_objects) < 0.002
+
+    def registered(self, date):
+        """Address registrations valid on `date` (YYYYMMDD) as (person index, object index)."""
+        valid = (self.spell_begin <= date) & (self.spell_end >= date)
+        return self.spell_person[valid], self.spell_object[valid]
+
+    def households(self, year):
+        """
+        Persons registered on jan 1 of `year`, sorted by address object.
+
+        Returns
+        -------
+        (person index, object index, position of the first member of the household of each person)
+        """
+        person, obj = self.registered(year * 10000 + 101)
+        order = np.lexsort((self.birth_year[person], obj))
+        person, obj = person[order], obj[order]
+        first = np.searchsorted(obj, obj, side="left")
+        return person, obj, first
+
+
+# ============================================================
+# Writers
+# ============================================================
+
+def _makedirs(fn):
+    os.makedirs(os.path.dirname(fn), exist_ok=True)
+
+
+def write_sav(df, fn, **kwargs):
+    import pyreadstat
+
+    print(f"Writing {fn}...")
+    _makedirs(fn)
+    pyreadstat.write_sav(df, fn, **kwargs)
+
+
+def write_csv(columns, fn, separator=","):
+    print(f"Writing {fn}...")
+    _makedirs(fn)
+    pl.DataFrame(columns).write_csv(fn, separator=separator)
+
+
+def persoontab(pop, year, sav=True):
+    """GBAPERSOONTAB of `year`: everyone registered in the GBA up to `year`, in the column order of the original."""
+    import pandas as pd
+
+    idx = np.flatnonzero(pop.arrival // 10000 <= year)
+    n = len(idx)
+    # countries of birth: the Netherlands (6030) for natives
+    birth_country = np.where(pop.generation[idx] == 1, pop.rng.choice([5022, 6003, 7044, 5049, 6043], n), 6030)
+    columns = {
+        "RINPERSOONS": np.full(n, "R", dtype=object),
+        "RINPERSOON": pop.label[idx],
+        "GBAGEBOORTELAND": birth_country,
+        "GBAGESLACHT": pop.gender[idx],
+        "GBAGEBOORTELANDMOEDER": np.where(pop.parents_abroad[idx] > 0, birth_country, 6030),
+        "GBAGEBOORTELANDVADER": np.where(pop.parents_abroad[idx] > 1, birth_country, 6030),
+        "GBAAANTALOUDERSBUITENLAND": pop.parents_abroad[idx],
+        "GBAHERKOMSTGROEPERING": np.where(pop.generation[idx] == 0, 6030, birth_country),
+        "GBAGENERATIE": pop.generation[idx],
+        "GBAGEBOORTEJAAR": pop.birth_year[idx],
+        "GBAGEBOORTEMAAND": pop.birth_month[idx],
+        "GBAGEBOORTEDAG": pop.birth_day[idx],
+    }
+    if not sav:
+        return columns
+    columns["RINPERSOON"] = _rin(columns["RINPERSOON"])
+    for c in list(columns)[2:]:
+        columns[c] = _strings(columns[c])
+    return pd.DataFrame(columns)
+
+
+def addresses(pop, year=None, sav=True):
+    """
+    GBAADRESOBJECTBUS: address registrations that started before the end of `year`,
+    registrations ending after `year` are still open. All registrations if `year` is None.
+    """
+    import pandas as pd
+
+    begin, end = pop.spell_begin, pop.spell_end
+    idx = np.arange(len(begin)) if year is None else np.flatnonzero(begin <= year * 10000 + 1231)
+    end = end[idx]
+    if year is not None:
+        end = np.where(end > year * 10000 + 1231, OPEN_END, end)
+    n = len(idx)
+    person, obj = pop.spell_person[idx], pop.spell_object[idx]
+    columns = {
+        "RINPERSOONS": np.full(n, "R", dtype=object),
+        "RINPERSOON": pop.label[person],
+        "GBADATUMAANVANGADRESHOUDING": begin[idx],
+        "GBADATUMEINDEADRESHOUDING": end,
+        "SOORTOBJECTNUMMER": pop.object_type[obj],
+        "RINOBJECTNUMMER": pop.object_id[obj],
+        "GBAFUNCTIEADRES": np.full(n, "W", dtype=object),
+        "GBAAANGIFTEADRESHOUDING": np.full(n, "P", dtype=object),
+    }
+    if not sav:
+        return columns
+    columns["RINPERSOON"] = _rin(columns["RINPERSOON"])
+    columns["GBADATUMAANVANGADRESHOUDING"] = _strings(columns["GBADATUMAANVANGADRESHOUDING"])
+    columns["GBADATUMEINDEADRESHOUDING"] = _strings(columns["GBADATUMEINDEADRESHOUDING"])
+    columns["RINOBJECTNUMMER"] = columns["RINOBJECTNUMMER"].astype(float)
+    return pd.DataFrame(columns)
+
+
+def deaths(pop):
+    """GBAOVERLIJDENTAB: date of death of everyone who died in the Netherlands."""
+    import pandas as pd
+
+    idx = np.flatnonzero(pop.died)
+    return pd.DataFrame({
+        "RINPERSOONS": np.full(len(idx), "R", dtype=object),
+        "RINPERSOON": _rin(pop.label[idx]),
+        "GBADatumOverlijden": _strings(pop.death[idx]),
+    })
+
+
+def kindoudertab(pop):
+    """KINDOUDERTAB: father and mother of everyone, empty if not known."""
+    import pandas as pd
+
+    n = pop.n_persons
+    columns = {"RINPERSOONS": np.full(n, "R", dtype=object), "RINPERSOON": _rin(pop.label)}
+    for suffix, parent in (("pa", pop.father), ("Ma", pop.mother)):
+        known = parent >= 0
+        columns[f"RINPERSOONS{suffix}"] = np.where(known, "R", "").astype(object)
+        columns[f"RINPERSOON{suffix}"] = np.where(known, _rin(pop.label[parent]), "").astype(object)
+    return pd.DataFrame(columns)
+
+
+def household_network(pop, year):
+    """HUISGENOTENNETWERK of `year`: both directions of every pair of household members, 402 in institutions."""
+    person, obj, _ = pop.households(year)
+    sources, targets = [], []
+    max_size = int(np.bincount(obj).max()) if len(obj) else 1
+    for offset in range(1, max_size):
+        same = np.flatnonzero(obj[offset:] == obj[:-offset])
+        sources.append(same)
+        targets.append(same + offset)
+    i = np.concatenate(sources + targets)
+    j = np.concatenate(targets + sources)
+    n = len(i)
+    return {
+        "RINPERSOONS": np.full(n, "R"),
+        "RINPERSOON": pop.label[person[i]],
+        "RELATIE": np.where(pop.object_institution[obj[i]], 402, 401),
+        "RINPERSOONSRELATIE": np.full(n, "R"),
+        "RINPERSOONRELATIE": pop.label[person[j]],
+    }
+
+
+def _edges(pop, person, target, layer):
+    """Network file columns of the edges from `person` to `target` (person indices) in `layer`."""
+    n = len(person)
+    return {
+        "RINPERSOONS": np.full(n, "R"),
+        "RINPERSOON": pop.label[person],
+        "RELATIE": np.full(n, layer),
+        "RINPERSOONSRELATIE": np.full(n, "R"),
+        "RINPERSOONRELATIE": pop.label[target],
+    }
+
+
+def _concat_edges(parts):
+    return {c: np.concatenate([part[c] for part in parts]) for c in parts[0]}
+
+
+def family_network(pop, year):
+    """
+    FAMILIENETWERK of `year` among the persons registered on jan 1: parents (301) and children (304),
+    the other parent of a child (302) and full siblings (306), each sibling linked to the next one.
+    """
+    person, _ = pop.registered(year * 10000 + 101)
+    registered = np.zeros(pop.n_persons, dtype=bool)
+    registered[person] = True
+    parts = []
+    for parent in (pop.mother, pop.father):
+        child = person[(parent[person] >= 0) & registered[np.maximum(parent[person], 0)]]
+        parts += [_edges(pop, child, parent[child], 301), _edges(pop, parent[child], child, 304)]
+
+    both = person[(pop.mother[person] >= 0) & (pop.father[person] >= 0)]
+    both = both[registered[pop.mother[both]] & registered[pop.father[both]]]
+    couples = np.unique(np.stack([pop.mother[both], pop.father[both]], axis=1), axis=0)
+    parts += [_edges(pop, couples[:, 0], couples[:, 1], 302), _edges(pop, couples[:, 1], couples[:, 0], 302)]
+
+    children = both[np.lexsort((both, pop.father[both], pop.mother[both]))]
+    same = (pop.mother[children[1:]] == pop.mother[children[:-1]]) & (pop.father[children[1:]] == pop.father[children[:-1]])
+    a, b = children[:-1][same], children[1:][same]
+    parts += [_edges(pop, a, b, 306), _edges(pop, b, a, 306)]
+    return _concat_edges(parts)
+
+
+def neighbor_network(pop, year):
+    """
+    BURENNETWERK of `year`: the first members of neighbouring households (next in address object
+    order within a buurt) are next-door neighbours (101), in both directions.
+    """
+    person, obj, first = pop.households(year)
+    heads = np.flatnonzero(first == np.arange(len(first)))
+    heads = heads[~pop.object_institution[obj[heads]]]
+    heads = heads[np.lexsort((obj[heads], pop.object_buurt[obj[heads]]))]
+    buurt = pop.object_buurt[obj[heads]]
+    same = buurt[1:] == buurt[:-1]
+    a, b = person[heads[:-1][same]], person[heads[1:][same]]
+    return _concat_edges([_edges(pop, a, b, 101), _edges(pop, b, a, 101)])
+
+
+def inhatab(pop, year):
+    """
+    INHATAB of `year`: one record per household with the oldest member as main earner (RINPERSOONHKW).
+
+    Some households have no record, institutions have a percentile below 1 and some incomes are unknown.
+    """
+    import pandas as pd
+
+    rng = pop.rng
+    person, obj, first = pop.households(year)
+    heads = np.flatnonzero(first == np.arange(len(first)))
+    size = np.diff(np.append(heads, len(person)))
+    heads_obj = obj[heads]
+    keep = rng.random(len(heads)) < 0.96
+    heads, size, heads_obj = heads[keep], size[keep], heads_obj[keep]
+    n = len(heads)
+
+    disposable = np.round(rng.lognormal(np.log(40000), 0.6, n))
+    standardized = np.round(disposable / np.sqrt(size))
+    unknown = rng.random(n) < 0.01
+    standardized[unknown] = 9999999999
+    disposable[unknown] = 9999999999
+    percentile_standardized = _percentile(standardized).astype(float)
+    percentile_disposable = _percentile(disposable).astype(float)
+    institution = pop.object_institution[heads_obj]
+    percentile_standardized[institution] = -1
+    percentile_disposable[institution] = -1
+    return pd.DataFrame({
+        "RINPERSOONSHKW": np.full(n, "R", dtype=object),
+        "RINPERSOONHKW": _rin(pop.label[person[heads]]),
+        "INHAHL": size.astype(float),
+        "INHBESTINKH": disposable,
+        "INHGESTINKH": standardized,
+        "INHP100HBEST": percentile_disposable,
+        "INHP100HGEST": percentile_standardized,
+    })
+
+
+def inpatab(pop, year):
+    """INPATAB of `year`: gross personal income, its percentile and socioeconomic category of persons aged 15+."""
+    import pandas as pd
+
+    rng = pop.rng
+    person, _, _ = pop.households(year)
+    person = person[(year - pop.birth_year[person] >= 15) & (rng.random(len(person)) < 0.97)]
+    n = len(person)
+    gross = np.where(rng.random(n) < 0.2, 0, np.round(rng.lognormal(np.log(35000), 0.8, n)))
+    return pd.DataFrame({
+        "RINPERSOONS": np.full(n, "R", dtype=object),
+        "RINPERSOON": _rin(pop.label[person]),
+        "INPBELI": gross,
+        "INPP100PBRUT": _percentile(gross).astype(float),
+        "INPSECJ": rng.choice(SOCIOECONOMIC_CODES, n).astype(float),
+    })
+
+
+def education_reference(pop, n_codes=200):
+    """
+    SSB reference tables OPLEIDINGSNRREFV34 (OPLNR -> CTO, with a leading header row)
+    and CTOREFV13 (CTO -> OPLNIVSOI2016AGG4HB).
+    """
+    import pandas as pd
+
+    rng = pop.rng
+    oplnr = np.sort(rng.choice(np.arange(1, 100000), n_codes, replace=False))
+    cto = rng.integers(0, n_codes // 2, n_codes)
+    opleidingsnr = pd.DataFrame({
+        "OPLNR": [""] + [str(c).zfill(5) for c in oplnr],
+        "OPLNAAM": ["Opleidingsnaam"] + [f"Opleiding {c}" for c in oplnr],
+        "CTO2016V": [""] + [f"CTO{c:03d}" for c in cto],
+    })
+    cto_ref = pd.DataFrame({
+        "CTO": [f"CTO{c:03d}" for c in range(n_codes // 2)],
+        "OPLNIVSOI2016AGG4HB": list(rng.choice(EDUCATION_CODES, n_codes // 2, p=EDUCATION_CODE_P)),
+    })
+    return opleidingsnr, cto_ref
+
+
+def hoogsteopltab(pop, year, oplnr):
+    """HOOGSTEOPLTAB of `year`: highest education of persons aged 15+, OPLNRHB codes up to 2012."""
+    rng = pop.rng
+    person, _, _ = pop.households(year)
+    person = person[(year - pop.birth_year[person] >= 15) & (rng.random(len(person)) < 0.65)]
+    n = len(person)
+    if year <= 2012:
+        codes = rng.choice(oplnr, n)
+    else:
+        codes = rng.choice(np.array(EDUCATION_CODES), n, p=EDUCATION_CODE_P).astype(np.int64)
+    return {
+        "RINPERSOONS": np.full(n, "R"),
+        "RINPERSOON": pop.label[person],
+        config.EDUCATION_COLUMN[year]: codes,
+        "GEWICHTHOOGSTEOPL": np.round(rng.uniform(0.5, 30, n), 4),
+    }
+
+
+def vslgwbtab(pop, years):
+    """VSLGWBTAB: buurt code of every address object, one bc{year} column per year, NA if unknown."""
+    import pandas as pd
+
+    codes = _strings(pop.buurt_code[pop.object_buurt])
+    codes[pop.object_unknown_buurt] = "NA"
+    df = pd.DataFrame({
+        "SOORTOBJECTNUMMER": pop.object_type,
+        "RINOBJECTNUMMER": pop.object_id.astype(float),
+    })
+    for year in years:
+        df[f"bc{year}"] = codes
+    return df
+
+
+def _gemeente_names(pop):
+    return {code: f"Gemeente {code}" for code in pop.gemeente}
+
+
+def write_gin(pop, year, fn):
+    """GIN file of `year` in the format and with the column names of that year."""
+    import pandas as pd
+
+    names = _gemeente_names(pop)
+    codes = [str(c).zfill(4) for c in pop.gemeente]
+    ext = fn.split(".")[-1]
+    if ext == "sav":
+        df = pd.DataFrame({
+            "gemeente": codes,
+            "landsdeel": pop.gemeente_landsdeel.astype(float),
+            "provincie": pop.gemeente_provincie.astype(float),
+            "coropgebied": pop.gemeente_corop.astype(float),
+            "stedgem": pop.gemeente_stedgem.astype(float),
+        })
+        labels = {
+            "gemeente": {str(c).zfill(4): n for c, n in names.items()},
+            "landsdeel": LANDSDELEN,
+            "provincie": PROVINCIES,
+            "coropgebied": {c: f"COROP {c}" for c in range(1, 41)},
+            "stedgem": STEDELIJKHEID,
+        }
+        if year == 2014:
+            df.columns = [c.upper() for c in df.columns]
+            labels = {c.upper(): v for c, v in labels.items()}
+        write_sav(df, fn, variable_value_labels=labels)
+    elif ext == "dta":
+        df = pd.DataFrame({
+            "gemeentencode": codes,
+            "gemeentenenaam" if year == 2019 else "gemeentennaam": [names[c] for c in pop.gemeente],
+            "landsdelencode": [f"LD{c:02d}" for c in pop.gemeente_landsdeel],
+            "landsdelennaam": [LANDSDELEN[c] for c in pop.gemeente_landsdeel],
+            "provinciescode": [f"PV{c:02d}" for c in pop.gemeente_provincie],
+            "provinciesnaam": [PROVINCIES[c] for c in pop.gemeente_provincie],
+            "coropgebiedencode": [f"CR{c:02d}" for c in pop.gemeente_corop],
+            "coropgebiedennaam": [f"COROP {c}" for c in pop.gemeente_corop],
+            "stedelijkheidcode": pop.gemeente_stedgem,
+            "stedelijkheidomschrijving": [STEDELIJKHEID[c] for c in pop.gemeente_stedgem],
+        })
+        print(f"Writing {fn}...")
+        _makedirs(fn)
+        df.to_stata(fn, write_index=False, version=118)
+    else:
+        df = pd.DataFrame({
+            "gemeenten|Code": pop.gemeente,
+            "gemeenten|naam" if year == 2021 else "gemeenten|Naam": [names[c] for c in pop.gemeente],
+            "Landsdelen|Code": [f"LD{c:02d}" for c in pop.gemeente_landsdeel],
+            "Landsdelen|Naam": [LANDSDELEN[c] for c in pop.gemeente_landsdeel],
+            "Provincies|Code": [f"PV{c:02d}" for c in pop.gemeente_provincie],
+            "Provincies|Naam": [PROVINCIES[c] for c in pop.gemeente_provincie],
+            "COROP-gebieden|Code": [f"CR{c:02d}" for c in pop.gemeente_corop],
+            "COROP-gebieden|Naam": [f"COROP {c}" for c in pop.gemeente_corop],
+            "Stedelijkheid|Code": pop.gemeente_stedgem,
+            "Stedelijkheid|Omschrijving": [STEDELIJKHEID[c] for c in pop.gemeente_stedgem],
+        })
+        print(f"Writing {fn}...")
+        _makedirs(fn)
+        df.to_excel(fn, index=False)
+
+
+def write_buurt_shapefile(pop, year, fn, cell=1000):
+    """Buurt shapefile of `year`: square buurten on a grid in Amersfoort / RD New coordinates."""
+    import geopandas as gpd
+    from shapely.geometry import box
+
+    n = len(pop.buurt_code)
+    side = int(np.ceil(np.sqrt(n)))
+    x = 100000 + (np.arange(n) % side) * cell
+    y = 400000 + (np.arange(n) // side) * cell
+    code_column = "BU_CODE" if os.path.basename(fn).startswith("bu_") else "STATCODE"
+    gdf = gpd.GeoDataFrame(
+        {
+            code_column: ["BU" + str(c).zfill(8) for c in pop.buurt_code],
+            "BU_NAAM": [f"Buurt {c}" for c in pop.buurt_code],
+            "GM_CODE": ["GM" + str(c).zfill(4) for c in pop.gemeente[pop.buurt_gemeente]],
+        },
+        geometry=[box(x0, y0, x0 + cell, y0 + cell) for x0, y0 in zip(x, y)],
+        crs="EPSG:28992",
+    )
+    print(f"Writing {fn}...")
+    _makedirs(fn)
+    gdf.to_file(fn)
+
+
+# ============================================================
+# All source files
+# ============================================================
+
+def source_roots(root):
+    """Folders the G: and K: drives are mapped to below `root`."""
+    return dict(G=os.path.join(root, "G"), K=os.path.join(root, "K"))
+
+
+def parameters_file(root):
+    return os.path.join(root, "synthetic.json")
+
+
+def generate(root, n_persons, start_year, end_year, files_per_year, seed=0):
+    """
+    Write synthetic versions of all source files the pipeline reads for start_year-end_year below `root`.
+
+    The G: and K: drives are mapped to root/G and root/K (see `source_roots`) for the rest of the
+    process, so that the files are written exactly where the stages will read them.
+
+    Parameters
+    ----------
+    root : str
+        Folder to write to.
+    n_persons : int
+        Number of persons ever registered up to end_year, about three quarters of them are registered in a given year.
+    start_year, end_year : int
+    files_per_year : dict
+        Content of files_per_year.json, for the separators and encodings of GBAPERSOONTAB.
+    seed : int
+
+    Returns
+    -------
+    Population
+    """
+    config.set_source_roots(**source_roots(root))
+    years = range(start_year, end_year + 1)
+    print(f"Generating {n_persons} persons for {start_year}-{end_year}...")
+    pop = Population(n_persons, start_year, end_year, seed)
+
+    for year in years:
+        # stage 01: CSV, with the separator and encoding of that year
+        fn = config.persoontab_csv_default_file(year)
+        if str(year) in files_per_year["node_sep"]:
+            write_csv(persoontab(pop, year, sav=False), fn, separator=files_per_year["node_sep"][str(year)])
+        else:
+            print(f"No GBAPERSOONTAB separator for {year} in files_per_year.json, skipping CSV.")
+        # stage 02
+        write_sav(persoontab(pop, year), config.persoontab_file(year))
+        write_sav(addresses(pop, year - 1), config.objectbus_file(year - 1))
+    write_sav(deaths(pop), config.overlijdentab_file())
+    write_sav(kindoudertab(pop), config.kindoudertab_file())
+
+    # stage 03
+    for year in years:
+        if year < config.FIRST_INCOME_YEAR:
+            continue
+        fn, sep = config.household_network_file(year)
+        write_csv(household_network(pop, year), fn, separator=sep)
+        write_sav(inhatab(pop, year), os.path.join(config.source(config.INHATAB_FOLDER), f"INHA{year}TABV2.sav"))
+        write_sav(inpatab(pop, year), os.path.join(config.source(config.INPATAB_FOLDER), f"INPA{year}TABV2.sav"))
+
+    # stage 04
+    opleidingsnr, cto_ref = education_reference(pop)
+    fn_1, fn_2 = config.education_reference_files()
+    write_sav(opleidingsnr, fn_1)
+    write_sav(cto_ref, fn_2)
+    oplnr = opleidingsnr["OPLNR"][1:].astype(int).to_numpy()
+    for year in years:
+        fn, sep = config.education_file(year)
+        write_csv(hoogsteopltab(pop, year, oplnr), fn, separator=sep)
+
+    # stage 05
+    write_csv(addresses(pop, sav=False), config.address_history_file())
+    lookup_years = range(min(start_year, 2009), max(end_year, 2023) + 1)
+    write_sav(vslgwbtab(pop, lookup_years), config.vslgwbtab_file())
+
+    # stages 06 and 07
+    for year in years:
+        write_buurt_shapefile(pop, year, config.buurt_shapefile(year))
+        write_gin(pop, year, config.gin_file(year))
+
+    # stage 10, the household networks are written for stage 03
+    for year in years:
+        write_csv(family_network(pop, year), config.network_source_file("family", year), separator=";")
+        write_csv(neighbor_network(pop, year), config.network_source_file("neighbor", year), separator=";")
+
+    with open(parameters_file(root), "w") as f:
+        json.dump(dict(
+            n_persons=n_persons, start_year=start_year, end_year=end_year, seed=seed,
+            created=datetime.now().isoformat(timespec="seconds")
+        ), f, indent=4)
+    print("Done.")
+    return pop
@@ -0,0 +1,327 @@
+"""
+Author: Eszter Bokanyi, e.bokanyi@liacs.leidenuniv.nl
+Last modified: 2026.10.18
+
+Reading and writing helpers shared by all stages.
+
+Every SPSS read of the pipeline goes through `read_sav`, and every table written to the
+working folder goes through `write_csv_gz` and is read back with `read_csv_gz`, so that reader
+and writer behaviour can be changed in one place. Both enforce the dtypes of `nodefiles.schema`.
+
+Large SPSS files are split into row ranges that are decoded in parallel by a pool of
+READ_PROCESSES worker processes. Each worker converts its rows to polars, so the main process
+only concatenates polars (Arrow) chunks and never holds a pandas copy of the table.
+
+Gzipped CSVs are written by `BlockGzipWriter`: the CSV is streamed in batches of rows and cut into
+blocks that are compressed on a pool of WRITE_THREADS threads (zlib releases the GIL), each block
+as a complete gzip member. A gzip file of several members is a valid gzip file, read by gzip,
+polars and pandas as the concatenation of the members.
+
+In the bounded-memory mode (see `MemoryBudget`), large sources are read chunk by chunk instead:
+every chunk is filtered and projected right after it is read, and the reduced chunks are spilled
+to parquet files until the whole source has been read.
+"""
+
+import gzip
+import io
+import os
+import shutil
+import tempfile
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+import polars as pl
+
+from . import config, schema, staging
+
+# number of processes decoding an SPSS file, 1 reads it in the main process
+READ_PROCESSES = int(os.environ.get("NODEFILES_READ_PROCESSES") or min(os.cpu_count() or 1, 8))
+# files with fewer rows are read in the main process, starting workers is not worth it
+MIN_PARALLEL_ROWS = 1_000_000
+
+# threads compressing the blocks of a gzipped CSV, 1 compresses in the calling thread
+WRITE_THREADS = int(os.environ.get("NODEFILES_WRITE_THREADS") or min(os.cpu_count() or 1, 8))
+# uncompressed size of a gzip member, and rows of a CSV batch handed to the writer at once
+GZIP_BLOCK_SIZE = 4 * 1024 * 1024
+GZIP_LEVEL = 6
+CSV_BATCH_ROWS = 500_000
+
+# share of the memory budget a single decoded chunk may take, the rest is left for the reduced
+# chunks read back from disk and the other tables of the stage
+CHUNK_SHARE = 0.25
+MIN_CHUNK_ROWS = 10_000
+# estimated size of a string value in a decoded chunk: a Python object, a pointer to it and its polars copy
+STRING_OVERHEAD = 80
+
+
+def read_sav(fn, usecols=None, transform=None, budget=None):
+    """
+    Read an SPSS file into a polars DataFrame.
+
+    Categoricals are NOT converted, i.e. values such as gender are kept as their numeric codes
+    instead of their string labels.
+
+    Parameters
+    ----------
+    fn : str
+    usecols : list of str, optional
+        Columns to read, all by default.
+    transform : callable, optional
+        Function of a polars DataFrame that filters and projects the table. With a `budget`,
+        it is applied to every chunk separately, so it must not depend on other rows.
+    budget : MemoryBudget, optional
+        Read chunk by chunk within this memory budget.
+    """
+    fn = staging.local(fn)
+    if budget is not None:
+        return budget.read_sav(fn, usecols, transform)
+    df = read_sav_parallel(fn, usecols)
+    return df if transform is None else transform(df)
+
+
+def _from_pandas(df):
+    return pl.DataFrame({c: df[c].to_numpy() for c in df.columns})
+
+
+def _read_sav_rows(fn, usecols, offset=0, limit=0):
+    """Rows offset to offset+limit (all rows if limit is 0) of an SPSS file as a polars DataFrame."""
+    import pyreadstat
+
+    df, _ = pyreadstat.read_sav(fn, usecols=usecols, row_offset=offset, row_limit=limit)
+    return _from_pandas(df)
+
+
+def read_sav_parallel(fn, usecols=None, processes=None):
+    """
+    Read an SPSS file by decoding row ranges of it in `processes` worker processes.
+
+    Files with fewer than MIN_PARALLEL_ROWS rows (or an unknown number of rows) are read in the
+    main process. On Windows, the worker processes import the main module again, so scripts that
+    read SPSS files must run the pipeline under `if __name__ == "__main__":`.
+    """
+    import pyreadstat
+
+    processes = READ_PROCESSES if processes is None else processes
+    n_rows = pyreadstat.read_sav(fn, metadataonly=True)[1].number_rows
+    if processes <= 1 or n_rows is None or n_rows < MIN_PARALLEL_ROWS:
+        return _read_sav_rows(fn, usecols)
+
+    from concurrent.futures import ProcessPoolExecutor
+
+    limit = -(-n_rows // processes)
+    print(f"\tDecoding {n_rows} rows in {processes} processes...")
+    with ProcessPoolExecutor(processes) as pool:
+        parts = list(pool.map(
+            _read_sav_rows, [fn] * processes, [usecols] * processes, range(0, n_rows, limit), [limit] * processes
+        ))
+    return pl.concat(parts, how="vertical")
+
+
+def read_sav_chunks(fn, usecols=None, chunk_rows=100_000):
+    """Read an SPSS file `chunk_rows` rows at a time, yield polars DataFrames like `read_sav`."""
+    import pyreadstat
+
+    for df, _ in pyreadstat.read_file_in_chunks(pyreadstat.read_sav, fn, chunksize=chunk_rows, usecols=usecols):
+        yield _from_pandas(df)
+
+
+class MemoryBudget:
+    """
+    Bounded-memory reading of large sources.
+
+    Sources are read in chunks that take about CHUNK_SHARE of `max_memory` when decoded. Each chunk is
+    reduced by the transform of the caller (e.g. to the registrations valid on a given date), and the
+    reduced chunks are spilled to parquet files in `spill_folder`, so that only the current chunk is
+    held in memory while the source is read. The spilled chunks are read back together at the end.
+
+    The peak memory of a stage is then bounded by one chunk plus the size of the reduced table and
+    of the output of the stage, independently of the size of the sources.
+
+    Parameters
+    ----------
+    max_memory : int
+        Memory budget in bytes.
+    spill_folder : str
+        Folder for the spilled chunks, they are deleted after each read.
+    """
+
+    def __init__(self, max_memory, spill_folder):
+        self.max_memory = max_memory
+        self.spill_folder = spill_folder
+
+    def chunk_rows(self, fn, usecols=None):
+        """Number of rows of the SPSS file `fn` that fit in the chunk share of the budget."""
+        import pyreadstat
+
+        _, meta = pyreadstat.read_sav(fn, metadataonly=True)
+        columns = usecols if usecols is not None else meta.column_names
+        row_bytes = sum(
+            8 if meta.readstat_variable_types[c] == "double" else STRING_OVERHEAD + meta.variable_storage_width[c]
+            for c in columns
+        )
+        return max(MIN_CHUNK_ROWS, int(self.max_memory * CHUNK_SHARE) // row_bytes)
+
+    def _spill(self):
+        os.makedirs(self.spill_folder, exist_ok=True)
+        return tempfile.mkdtemp(dir=self.spill_folder)
+
+    def read_sav(self, fn, usecols=None, transform=None):
+        """Read an SPSS file chunk by chunk, apply `transform` to every chunk and spill it to disk."""
+        chunk_rows = self.chunk_rows(fn, usecols)
+        print(f"\tReading {fn} in chunks of {chunk_rows} rows...")
+        folder = self._spill()
+        try:
+            parts = []
+            for i, chunk in enumerate(read_sav_chunks(fn, usecols, chunk_rows)):
+                part = os.path.join(folder, f"part_{i:05d}.parquet")
+                (chunk if transform is None else transform(chunk)).write_parquet(part)
+                parts.append(part)
+                del chunk
+            return pl.concat([pl.read_parquet(part) for part in parts], how="vertical")
+        finally:
+            shutil.rmtree(folder, ignore_errors=True)
+
+    def scan_csv(self, fn, transform=None):
+        """
+        Read a CSV file with a streaming scan, `transform` is applied to the LazyFrame of the scan.
+
+        The reduced table is sunk to a parquet file by the streaming engine of polars, so the CSV is
+        never loaded as a whole, and read back from there.
+        """
+        print(f"\tScanning {fn}...")
+        folder = self._spill()
+        try:
+            lf = pl.scan_csv(staging.local(fn), separator=",")
+            part = os.path.join(folder, "scan.parquet")
+            (lf if transform is None else transform(lf)).sink_parquet(part)
+            return pl.read_parquet(part)
+        finally:
+            shutil.rmtree(folder, ignore_errors=True)
+
+
+def to_polars(df):
+    """Convert a pandas DataFrame to polars, leave polars DataFrames untouched."""
+    if isinstance(df, pl.DataFrame):
+        return df
+    return pl.from_pandas(df)
+
+
+class BlockGzipWriter(io.RawIOBase):
+    """
+    Binary file object writing a multi-member gzip file, compressing blocks in parallel.
+
+    Written bytes are cut into blocks of `block_size` bytes, every block is compressed to a gzip
+    member on a thread pool, and the members are written in order. At most two blocks per thread
+    are in flight, so memory stays bounded whatever the size of the file. Members have no file
+    name and modification time, so the same content gives the same file.
+
+    Parameters
+    ----------
+    fn : str
+    threads : int, optional
+        Compression threads, WRITE_THREADS by default.
+    block_size : int
+    level : int
+        zlib compression level.
+    """
+
+    def __init__(self, fn, threads=None, block_size=GZIP_BLOCK_SIZE, level=GZIP_LEVEL):
+        super().__init__()
+        self.threads = WRITE_THREADS if threads is None else threads
+        self.block_size = block_size
+        self.level = level
+        self._file = open(fn, "wb")
+        self._executor = ThreadPoolExecutor(max_workers=self.threads, thread_name_prefix="gzip") if self.threads > 1 else None
+        self._buffer = bytearray()
+        self._pending = deque()
+        self._members = 0
+
+    def writable(self):
+        return True
+
+    def _compress(self, block):
+        return gzip.compress(block, compresslevel=self.level, mtime=0)
+
+    def _submit(self, block):
+        self._members += 1
+        if self._executor is None:
+            self._file.write(self._compress(block))
+            return
+        self._pending.append(self._executor.submit(self._compress, block))
+        while len(self._pending) > 2 * self.threads:
+            self._file.write(self._pending.popleft().result())
+
+    def write(self, data):
+        self._buffer += data
+        while len(self._buffer) >= self.block_size:
+            self._submit(bytes(self._buffer[:self.block_size]))
+            del self._buffer[:self.block_size]
+        return len(data)
+
+    def close(self):
+        if self.closed:
+            return
+        try:
+            # an empty file is one empty member
+            if self._buffer or not self._members:
+                self._submit(bytes(self._buffer))
+            while self._pending:
+                self._file.write(self._pending.popleft().result())
+        finally:
+            if self._executor is not None:
+                self._executor.shutdown(cancel_futures=True)
+            self._file.close()
+            super().close()
+
+
+def write_csv_gz(df, fn):
+    """
+    Write a pandas or polars DataFrame as a gzipped CSV with header and without index.
+
+    Columns are cast to their dtypes in `schema.DTYPES` first. The CSV is written in batches of
+    CSV_BATCH_ROWS rows straight into a `BlockGzipWriter`, never uncompressed to disk. It is written
+    to a temporary file first and renamed when complete, so an interrupted run never leaves a
+    truncated output behind, and removed if writing fails.
+    """
+    df = schema.enforce(df, os.path.basename(fn))
+    os.makedirs(os.path.dirname(fn), exist_ok=True)
+    tmp = config.temporary_file(fn)
+    try:
+        with BlockGzipWriter(tmp) as f:
+            df.head(0).write_csv(f, include_header=True)
+            for batch in df.iter_slices(CSV_BATCH_ROWS):
+                batch.write_csv(f, include_header=False)
+    except BaseException:
+        # e.g. a full disk, or an error of the compression pool raised on close
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+    os.replace(tmp, fn)
+
+
+def write_parquet(df, fn, row_group_size=None):
+    """
+    Write a pandas or polars DataFrame as parquet with the dtypes of `schema.DTYPES`.
+
+    Row groups of `row_group_size` rows carry min/max statistics of every column, so readers can
+    skip row groups that cannot match a filter. Like `write_csv_gz`, the file is renamed into
+    place when complete.
+    """
+    df = schema.enforce(df, os.path.basename(fn))
+    os.makedirs(os.path.dirname(fn), exist_ok=True)
+    tmp = config.temporary_file(fn)
+    try:
+        df.write_parquet(tmp, statistics=True, row_group_size=row_group_size)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+    os.replace(tmp, fn)
+
+
+def read_csv_gz(fn):
+    """Read a gzipped CSV written by `write_csv_gz` into polars, with the dtypes of `schema.DTYPES`."""
+    with gzip.open(fn, "rt", encoding="utf-8") as f:
+        header = f.readline().rstrip("\r\n").split(",")
+    df = pl.read_csv(fn, has_header=True, schema_overrides=schema.dtypes(header))
+    return schema.enforce(df, os.path.basename(fn))
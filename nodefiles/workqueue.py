@@ -0,0 +1,298 @@
+"""
+Author: Eszter Bokanyi, e.bokanyi@liacs.leidenuniv.nl
+Last modified: 2026.10.18
+
+Distributed execution of the stages over several machines sharing the working folder.
+
+Workers (`python -m nodefiles worker`, one or more per machine) take (stage, year) tasks from a
+queue that lives in {working_folder}/queue/ and needs nothing but a shared directory:
+    * queue.json fixes the years of the queue, so that all workers run the same tasks,
+    * a worker claims a task by creating {stage}_{year}.claim exclusively (O_CREAT | O_EXCL), which
+      only one worker can do, and writes {stage}_{year}.done when the stage finished, or
+      {stage}_{year}.failed with the error,
+    * a task is ready when the tasks of the stages it depends on (`Stage.depends`) are done,
+    * while it runs a task, a worker touches its claim every HEARTBEAT_SECONDS. A claim that has not
+      been touched for `timeout` seconds belongs to a dead worker: it is renamed away (an atomic rename,
+      so only one worker succeeds) and the task is claimed again.
+Workers prefer tasks of the year they ran last, so that upstream tables of a year are often still
+in memory, and read them from the working folder otherwise. Stage outputs are written to a
+temporary file and renamed into place, and a task that is reclaimed after its output was written is
+skipped by the build cache.
+
+A worker stops when every task is done, or when the remaining tasks depend on failed tasks. Failed
+tasks are retried after `python -m nodefiles queue reset`.
+
+Usage
+-----
+    # on every machine, as often as memory allows (see `python -m nodefiles plan`)
+    python -m nodefiles worker 2009 2023 /h/ODISSEI_portal_C
+    python -m nodefiles queue status /h/ODISSEI_portal_C
+"""
+
+import json
+import os
+import socket
+import threading
+import time
+import traceback
+import uuid
+from datetime import datetime
+
+from . import config, metrics
+from .pipeline import STAGES, STAGES_BY_NAME, Pipeline
+
+HEARTBEAT_SECONDS = 30
+# seconds between looks at the queue when no task is ready
+POLL_SECONDS = 10
+
+
+def task_name(stage, year=None):
+    return stage if year is None else f"{stage}_{year}"
+
+
+class WorkQueue:
+    """
+    Task states of the stages of a start_year-end_year run, as files in a shared folder.
+
+    Parameters
+    ----------
+    working_folder : str
+    start_year, end_year : int
+    years : iterable of int, optional
+        Years to run, start_year-end_year by default.
+    timeout : int
+        Seconds without heartbeat after which a claim is considered dead.
+    """
+
+    def __init__(self, working_folder, start_year, end_year, years=None, timeout=600):
+        self.folder = config.queue_folder(working_folder)
+        self.timeout = timeout
+        years = list(range(start_year, end_year + 1) if years is None else years)
+        os.makedirs(self.folder, exist_ok=True)
+        self._init_queue(dict(start_year=start_year, end_year=end_year, years=years))
+        self.tasks = [("merged", None)] + [(s.name, y) for y in years for s in STAGES if s.per_year and s.applies(y)]
+
+    def _init_queue(self, settings):
+        fn = os.path.join(self.folder, "queue.json")
+        if not os.path.exists(fn):
+            # workers starting at the same time write the same settings, the last rename wins
+            tmp = config.temporary_file(fn)
+            with open(tmp, "w") as f:
+                json.dump(settings, f)
+            os.replace(tmp, fn)
+        with open(fn) as f:
+            existing = json.load(f)
+        if existing != settings:
+            raise ValueError(
+                f"The queue in {self.folder} is for {existing}, not {settings}. "
+                "Use the same years on all workers, or remove the queue folder when no worker is running."
+            )
+
+    def _file(self, stage, year, state):
+        return os.path.join(self.folder, f"{task_name(stage, year)}.{state}")
+
+    def state(self, stage, year=None):
+        """"done", "failed", "running", "dead" (claimed without heartbeat) or "waiting"."""
+        if os.path.exists(self._file(stage, year, "done")):
+            return "done"
+        if os.path.exists(self._file(stage, year, "failed")):
+            return "failed"
+        try:
+            age = time.time() - os.path.getmtime(self._file(stage, year, "claim"))
+        except OSError:
+            return "waiting"
+        return "dead" if age > self.timeout else "running"
+
+    def dependencies(self, stage, year=None):
+        depends = STAGES_BY_NAME[stage].depends
+        return [(d, None if not STAGES_BY_NAME[d].per_year else year) for d in depends if STAGES_BY_NAME[d].applies(year)]
+
+    def claim(self, stage, year, worker):
+        """Claim a task, taking over a dead claim. True if this worker owns the task now."""
+        claim = self._file(stage, year, "claim")
+        if self.state(stage, year) == "dead":
+            tombstone = f"{claim}.dead-{uuid.uuid4().hex}"
+            try:
+                # only one worker can rename the dead claim away
+                os.replace(claim, tombstone)
+            except OSError:
+                return False
+            if time.time() - os.path.getmtime(tombstone) <= self.timeout:
+                # another worker reclaimed the task in the meantime, and this was its new claim
+                try:
+                    os.link(tombstone, claim)
+                except OSError:
+                    pass
+                os.remove(tombstone)
+                return False
+            os.remove(tombstone)
+            print(f"Reclaiming {task_name(stage, year)} from a worker without heartbeat.")
+        try:
+            fd = os.open(claim, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+        except FileExistsError:
+            return False
+        with os.fdopen(fd, "w") as f:
+            json.dump(dict(worker=worker, claimed=datetime.now().isoformat(timespec="seconds")), f)
+        if self.state(stage, year) == "done":
+            # finished by another worker between looking at the queue and claiming
+            os.remove(claim)
+            return False
+        return True
+
+    def heartbeat(self, stage, year):
+        try:
+            os.utime(self._file(stage, year, "claim"))
+        except OSError:
+            pass
+
+    def finish(self, stage, year, error=None):
+        """Mark a claimed task done, or failed with `error`, and drop the claim."""
+        state = "done" if error is None else "failed"
+        fn = self._file(stage, year, state)
+        tmp = config.temporary_file(fn)
+        with open(tmp, "w") as f:
+            f.write(datetime.now().isoformat(timespec="seconds") + "\n" + (error or ""))
+        os.replace(tmp, fn)
+        try:
+            os.remove(self._file(stage, year, "claim"))
+        except OSError:
+            pass
+
+    def states(self):
+        return {task: self.state(*task) for task in self.tasks}
+
+    def next_task(self, worker, prefer_year=None):
+        """
+        Claim a ready task, preferring `prefer_year`.
+
+        Returns
+        -------
+        (stage, year) of the claimed task, "wait" if tasks are running or waiting for running tasks,
+        or None if there is nothing left to do.
+        """
+        states = self.states()
+        ready = [
+            task for task, state in states.items()
+            if state in ("waiting", "dead") and all(states.get(d) == "done" for d in self.dependencies(*task))
+        ]
+        ready.sort(key=lambda task: task[1] != prefer_year)
+        for stage, year in ready:
+            if self.claim(stage, year, worker):
+                return stage, year
+        blocked = {task for task, state in states.items() if state == "failed"}
+        # tasks depending on failed tasks can never run
+        for task in self.tasks:
+            if any(d in blocked for d in self.dependencies(*task)):
+                blocked.add(task)
+        if any(state in ("waiting", "running", "dead") and task not in blocked for task, state in states.items()):
+            return "wait"
+        return None
+
+    def reset(self):
+        """Forget failed tasks, so that workers retry them and their downstream tasks."""
+        removed = []
+        for stage, year in self.tasks:
+            fn = self._file(stage, year, "failed")
+            if os.path.exists(fn):
+                os.remove(fn)
+                removed.append(task_name(stage, year))
+        return removed
+
+
+class _Heartbeat:
+    """Touch the claim of the running task every HEARTBEAT_SECONDS from a background thread."""
+
+    def __init__(self, queue):
+        self.queue = queue
+        self.task = None
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._beat, daemon=True)
+        self._thread.start()
+
+    def _beat(self):
+        while not self._stop.wait(HEARTBEAT_SECONDS):
+            task = self.task
+            if task is not None:
+                self.queue.heartbeat(*task)
+
+    def stop(self):
+        self._stop.set()
+
+
+def work(working_folder, start_year, end_year, years=None, timeout=600, worker=None, **pipeline_kwargs):
+    """
+    Run tasks of the queue until none are left.
+
+    Parameters
+    ----------
+    working_folder : str
+        Shared working folder.
+    start_year, end_year : int
+    years : iterable of int, optional
+    timeout : int
+        Seconds without heartbeat after which the claim of another worker is taken over.
+    worker : str, optional
+        Name of this worker, host and process id by default.
+    pipeline_kwargs
+        Passed to `Pipeline`, e.g. max_memory.
+
+    Returns
+    -------
+    number of tasks run by this worker
+    """
+    worker = worker or f"{socket.gethostname()}_{os.getpid()}"
+    queue = WorkQueue(working_folder, start_year, end_year, years, timeout)
+    pipeline = Pipeline(working_folder, start_year, end_year, **pipeline_kwargs)
+    for folder in (config.temp_folder, config.codebook_folder, config.yearly_node_folder):
+        os.makedirs(folder(working_folder), exist_ok=True)
+    heartbeat = _Heartbeat(queue)
+    n_tasks = 0
+    last_year = None
+    print(f"Worker {worker} on queue {queue.folder}")
+    try:
+        with metrics.run(working_folder, f"{datetime.now():%Y-%m-%d_%H-%M-%S}_{worker}"):
+            while True:
+                task = queue.next_task(worker, last_year)
+                if task is None:
+                    break
+                if task == "wait":
+                    time.sleep(POLL_SECONDS)
+                    continue
+                stage, year = task
+                if year != last_year and last_year is not None:
+                    pipeline.release(last_year)
+                last_year = year
+                print(f"==============================\n {worker}: {task_name(stage, year)} \n==============================")
+                heartbeat.task = task
+                try:
+                    pipeline.run_stage(stage, year)
+                except Exception:
+                    queue.finish(stage, year, traceback.format_exc())
+                    print(f"{task_name(stage, year)} failed, see {queue._file(stage, year, 'failed')}")
+                else:
+                    queue.finish(stage, year)
+                finally:
+                    heartbeat.task = None
+                n_tasks += 1
+    finally:
+        heartbeat.stop()
+    print(f"Worker {worker} ran {n_tasks} tasks, no tasks left.")
+    return n_tasks
+
+
+def open_queue(working_folder, timeout=600):
+    """The queue of `working_folder`, with the years it was created for."""
+    with open(os.path.join(config.queue_folder(working_folder), "queue.json")) as f:
+        settings = json.load(f)
+    return WorkQueue(working_folder, timeout=timeout, **settings)
+
+
+def status(working_folder):
+    """Table of the task states of the queue in `working_folder`."""
+    rows = [[stage, "-" if year is None else year, state] for (stage, year), state in open_queue(working_folder).states().items()]
+    return ["stage", "year", "state"], rows
+
+
+def reset(working_folder):
+    """Reset the failed tasks of the queue in `working_folder`, returns their names."""
+    return open_queue(working_folder).reset()